@@ -1,22 +1,58 @@
 import spacy
-from typing import Dict, Any, List, Tuple
+from spacy.tokens import Doc
+from contextlib import nullcontext
+from typing import Dict, Any, List, Tuple, Optional
 
 # Import the new modules
 from models.readability_analyzer import ReadabilityPredictor
 from models.sentiment_analyzer import SentimentAnalyzer
-from models.keyword_extractor import KeywordExtractor
+from models.keyword_extractor import KeywordCounts, KeywordExtractor
 from models.topic_modeler import TopicModeler
 from models.language_analyzer import LanguageAnalyzer
 from models.process_text import TextPreprocessor, TextQualityReport, PreprocessingConfig
-from models.document_summarizer import DocumentSummarizerMain, DocumentSummarizerAlt
+from models.document_summarizer import DocumentSummarizerMain, DocumentSummarizerAlt, DocumentSummarizerExtractive
+from models.inference_cache import InferenceCache
+from models.model_registry import ModelRegistry
+from models.cpu_scheduler import CoreScheduler
+from models.corpus_idf import CorpusIDFIndex
+from models.global_topic_model import load_global_topic_model
+from models.near_duplicate_index import NearDuplicateIndex
+from models.document_versions import (
+    DocumentVersionStore, TextBlock, block_encodings, concat_blocks, split_paragraphs
+)
+from models.readability_metrics import ClassicalReadabilityMetrics
+from models.sentence_embeddings import SentenceEmbeddingService
+from models.analysis_context import AnalysisContext
+from models.sentence_index import SentenceIndex
+from models.decoding_profiles import DEFAULT_DECODING_PROFILE
 
 import warnings
 warnings.filterwarnings('ignore') # Suppress warnings, especially from transformers
 
 class NLPAnalyzer:
-    def __init__(self, summarizer_model='alt'):
+    SUMMARY_MODES = ('auto', 'abstractive', 'extractive')
+    # In 'auto' mode documents longer than this go to the extractive tier
+    AUTO_EXTRACTIVE_WORD_THRESHOLD = 1500
+    # Rough CPU cost of the abstractive summarizers, used to check a request's latency budget
+    ABSTRACTIVE_MS_PER_WORD = {'alt': 4.0, 'main': 12.0}
+    SUMMARIZER_MODELS = ('alt', 'main')
+
+    def __init__(self, summarizer_model='alt', sentiment_backend='torch', onnx_threads=None,
+                 cache_max_bytes=64 * 1024 * 1024, cache_spill_path=None, model_memory_cap_bytes=None,
+                 cpu_scheduler: Optional[CoreScheduler] = None, idf_index_path: Optional[str] = None,
+                 topic_model_dir: Optional[str] = None, near_duplicate_threshold: Optional[float] = None,
+                 near_duplicate_index_path: Optional[str] = None, max_versioned_documents: int = 64):
         """Initialize with multiple lightweight models"""
+        if summarizer_model not in self.SUMMARIZER_MODELS:
+            raise ValueError(f"Unknown summarizer '{summarizer_model}', expected one of {self.SUMMARIZER_MODELS}")
         self.summarizer_model = summarizer_model
+
+        # Thread pools are sized before any model is loaded; without a scheduler every runtime uses its defaults
+        self.cpu_scheduler = cpu_scheduler
+        if cpu_scheduler is not None:
+            cpu_scheduler.configure_runtimes()
+            if onnx_threads is None:
+                onnx_threads = cpu_scheduler.cores_per_request
         try:
             self.nlp = spacy.load("en_core_web_md")
         except OSError:
@@ -28,16 +64,57 @@ class NLPAnalyzer:
         # Initialize text preprocessor
         self.preprocessor = TextPreprocessor(preprocessing_config)
 
+        # Per-sentence model outputs are cached across requests (boilerplate repeats a lot)
+        self.inference_cache = InferenceCache(max_bytes=cache_max_bytes, spill_path=cache_spill_path)
+        # Transformer models are loaded on first use and evicted LRU-first beyond the memory cap
+        self.model_registry = ModelRegistry(memory_cap_bytes=model_memory_cap_bytes)
+
         # Initialize refactored components
-        self.sentiment_analyzer = SentimentAnalyzer()
-        self.keyword_extractor = KeywordExtractor()
-        self.topic_modeler = TopicModeler(self.nlp) # Pass spaCy model for topic modeling
-        self.readability_predictor = ReadabilityPredictor()
+        self.sentiment_analyzer = SentimentAnalyzer(
+            backend=sentiment_backend, intra_op_threads=onnx_threads, inference_cache=self.inference_cache,
+            model_registry=self.model_registry
+        )
+        # Sentences are encoded once per request (and cached across requests) for readability, topics and ranking
+        self.embedding_service = SentenceEmbeddingService(
+            model_registry=self.model_registry, inference_cache=self.inference_cache
+        )
+        # Document frequencies over everything analyzed so far (persisted when idf_index_path is set)
+        self.corpus_idf = CorpusIDFIndex(idf_index_path)
+        self.keyword_extractor = KeywordExtractor(corpus_idf=self.corpus_idf)
+        # Pretrained corpus topics (scripts/train_topic_model.py) when available, per-document clustering otherwise
+        core_budget = cpu_scheduler.cores_per_request if cpu_scheduler is not None else None
+        self.global_topic_model = load_global_topic_model(topic_model_dir, core_budget=core_budget)
+        self.topic_modeler = TopicModeler(
+            self.nlp, corpus_idf=self.corpus_idf,  # Pass spaCy model for topic modeling
+            core_budget=core_budget,
+            global_model=self.global_topic_model
+        )
+        self.readability_predictor = ReadabilityPredictor(embedding_service=self.embedding_service)
+        self.readability_metrics = ClassicalReadabilityMetrics()
         # The main summarizer is massively computationally expensive and makes my desktop crash so no thanks for now!
-        self.document_summarizer = DocumentSummarizerAlt() if summarizer_model == 'alt' else DocumentSummarizerMain()
+        # Both are registered, but only the one a request asks for (by default summarizer_model) is ever loaded
+        self.model_registry.register('summarizer:alt', lambda: DocumentSummarizerAlt(inference_cache=self.inference_cache))
+        self.model_registry.register('summarizer:main', lambda: DocumentSummarizerMain(inference_cache=self.inference_cache))
+        # Millisecond-scale extractive tier, picked per request or automatically for long documents
+        self.extractive_summarizer = DocumentSummarizerExtractive()
+
+        # Analyses of earlier documents, reused for near-duplicates (disabled unless a threshold is set)
+        self.near_duplicate_index = (
+            NearDuplicateIndex(near_duplicate_index_path, threshold=near_duplicate_threshold)
+            if near_duplicate_threshold is not None else None
+        )
+
+        # Paragraph blocks of versioned documents, so a new version only reprocesses changed paragraphs
+        self.document_versions = DocumentVersionStore(max_documents=max_versioned_documents)
 
-        # Pass emotion words to language analyzer (as it needs it for objectivity score)
-        self.language_analyzer = LanguageAnalyzer(self.sentiment_analyzer.emotion_words) 
+        # Share the lexicon index with the language analyzer (it needs emotion words for objectivity score)
+        self.lexicon_index = self.sentiment_analyzer.lexicon_index
+        self.language_analyzer = LanguageAnalyzer(self.lexicon_index)
+
+    @property
+    def document_summarizer(self):
+        """The default abstractive summarizer, loaded on first access."""
+        return self.model_registry.get(f"summarizer:{self.summarizer_model}")
 
     def preprocess_text(self, text: str) -> Tuple[str, TextQualityReport]:
         """
@@ -51,21 +128,56 @@ class NLPAnalyzer:
         """
         return self.preprocessor.preprocess(text)
 
-    def analyze_text(self, text: str, standard_readability_metrics : dict[str, float], skip_preprocessing: bool = False) -> Dict[str, Any]:
+    def analyze_text(self, text: str, standard_readability_metrics : Optional[dict[str, float]] = None, skip_preprocessing: bool = False,
+                     summary_mode: str = 'auto', latency_budget_ms: Optional[int] = None,
+                     decoding_profile: str = DEFAULT_DECODING_PROFILE, summarizer: Optional[str] = None,
+                     emotion_model: Optional[str] = None, readability_model: Optional[str] = None,
+                     topic_count: str = 'fixed', topic_representation: str = 'tfidf',
+                     include_sentences: bool = False, allow_approximate: bool = True,
+                     document_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Main analysis function that returns the complete analysis.
         
         Args:
             text: Input text to analyze
+            standard_readability_metrics: Classical readability scores; computed server-side when omitted
+            summary_mode: 'abstractive', 'extractive', or 'auto' (picked by document size and latency budget)
+            latency_budget_ms: Optional time budget used by 'auto' summary mode
+            decoding_profile: Abstractive decoding profile ('greedy-fast', 'balanced', 'quality')
+            summarizer: Abstractive summarizer ('alt' or 'main'); defaults to summarizer_model
+            emotion_model: Emotion classifier, one of SentimentAnalyzer.EMOTION_MODELS
+            readability_model: Sentence encoder shared by readability, topics and ranking, one of
+                               SentenceEmbeddingService.ENCODER_MODELS
+            topic_count: 'fixed' or 'adaptive' (number of topics chosen by silhouette over parallel fits)
+            topic_representation: 'tfidf' or 'embedding' (sentences clustered by their shared sentence embeddings)
+            include_sentences: Add per-sentence sentiment under sentiment_analysis['sentences']
+            allow_approximate: Return the analysis of a near-duplicate document when one is indexed
+                               (marked 'approximate'); False always runs the full analysis
+            document_id: Enables versioning: paragraphs unchanged since the previous version of this
+                         document reuse their parse and per-sentence results (see _parse_versioned)
             skip_preprocessing: If True, skip text preprocessing (not recommended)
             
         Returns:
             Dictionary containing all analysis results
         """
+        lease = self.cpu_scheduler.lease() if self.cpu_scheduler is not None else nullcontext()
+        with lease as core_lease:
+            return self._analyze_text(
+                text, standard_readability_metrics, skip_preprocessing, summary_mode, latency_budget_ms,
+                decoding_profile, summarizer, emotion_model, readability_model, topic_count, topic_representation,
+                include_sentences, allow_approximate, document_id, core_lease
+            )
+
+    def _analyze_text(self, text: str, standard_readability_metrics: Optional[dict[str, float]],
+                      skip_preprocessing: bool, summary_mode: str, latency_budget_ms: Optional[int],
+                      decoding_profile: str, summarizer: Optional[str], emotion_model: Optional[str],
+                      readability_model: Optional[str], topic_count: str, topic_representation: str,
+                      include_sentences: bool, allow_approximate: bool, document_id: Optional[str],
+                      core_lease) -> Dict[str, Any]:
         # Preprocessing step
         quality_report = None
+        original_text = text
         if not skip_preprocessing:
-            original_text = text
             text, quality_report = self.preprocess_text(text)
             
         # Check if text is still viable for analysis
@@ -80,10 +192,52 @@ class NLPAnalyzer:
                 "readability_prediction": None
             }
 
+        cache_stats_before = self.inference_cache.stats()
+        registry_stats_before = self.model_registry.stats()
+
+        # A near-duplicate of an analyzed document (same options) gets that document's analysis
+        options_key = None
+        # A versioned document is analyzed exactly (incrementally) instead
+        if self.near_duplicate_index is not None and document_id is None:
+            options_key = NearDuplicateIndex.options_key(
+                skip_preprocessing=skip_preprocessing, standard_readability_metrics=standard_readability_metrics,
+                summary_mode=summary_mode, latency_budget_ms=latency_budget_ms, decoding_profile=decoding_profile,
+                summarizer=summarizer, emotion_model=emotion_model, readability_model=readability_model,
+                topic_count=topic_count, topic_representation=topic_representation,
+                include_sentences=include_sentences
+            )
+            match = self.near_duplicate_index.find(text, options_key) if allow_approximate else None
+            if match is not None:
+                # This upload's own preprocessing report and text stats (sentences split by regex, as it is not parsed)
+                sentences_count = len(SentenceIndex.from_text(text))
+                results = NearDuplicateIndex.approximate_results(match, exact={
+                    "preprocessing_report": quality_report,
+                    "text_stats": self._text_stats(text, quality_report, sentences_count, len(text.split()))
+                })
+                results["metrics"] = self._collect_metrics(cache_stats_before, registry_stats_before, core_lease)
+                return results
+
         # Process with spaCy
+        blocks = version_report = None
         try:
-            doc = self.nlp(text)
-            sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+            if document_id is not None:
+                doc, blocks, version_report = self._parse_versioned(original_text, text, document_id, skip_preprocessing)
+            else:
+                doc = self.nlp(text)
+            # Offsets into the processed text; a sentence string is only sliced out where it is used
+            sentences = SentenceIndex.from_doc(doc)
+            # Derived artifacts (lowercased text, token arrays, lexicon matches, embeddings, ...) are
+            # computed on first use and shared by every stage below
+            context = AnalysisContext(
+                text, doc, sentences, lexicon_index=self.lexicon_index,
+                embedding_service=self.embedding_service, encoder_model=readability_model
+            )
+            if blocks is not None:
+                version_report["sentences_aligned"] = self._seed_from_blocks(context, blocks, readability_model)
+            with context.stage("readability_metrics"):
+                standard_readability_metrics = self.readability_metrics.resolve(
+                    text, doc, sentences, standard_readability_metrics, context=context
+                )
         except Exception as e:
             return {
                 "error": f"spaCy processing failed: {e}",
@@ -92,15 +246,42 @@ class NLPAnalyzer:
 
         # Run all analyses
         try:
-            sentiment_analysis = self.sentiment_analyzer.analyze_sentiment(text, doc, sentences)
-            keyword_extraction = self.keyword_extractor.extract_keywords(text, doc)
-            topic_modeling = self.topic_modeler.model_topics(text, sentences, doc)
-            language_patterns = self.language_analyzer.analyze_language_patterns(text, sentences, doc)
-            readability_prediction = self.readability_predictor.predict_difficulty(text, standard_readability_metrics)
-            document_summary = self.document_summarizer.summarize_document(text)
+            with context.stage("sentiment"):
+                sentiment_analysis = self.sentiment_analyzer.analyze_sentiment(
+                    text, doc, sentences, emotion_model=emotion_model, context=context,
+                    include_sentences=include_sentences
+                )
+            with context.stage("keywords"):
+                keyword_extraction = self.keyword_extractor.extract_keywords(
+                    text, doc, context.keyword_index, context.keyword_counts
+                )
+            with context.stage("topics"):
+                topic_modeling = self.topic_modeler.model_topics(
+                    text, sentences, doc, topic_count=topic_count, context=context,
+                    representation=topic_representation
+                )
+            with context.stage("language"):
+                language_patterns = self.language_analyzer.analyze_language_patterns(
+                    text, sentences, doc, context=context
+                )
+            with context.stage("readability"):
+                readability_prediction = self.readability_predictor.predict_difficulty(
+                    text, standard_readability_metrics, model_name=readability_model, context=context
+                )
+            with context.stage("summary"):
+                document_summary = self._summarize(
+                    text, doc, sentences, summary_mode, latency_budget_ms, decoding_profile, summarizer, context
+                )
 
             print (sentiment_analysis)
 
+            # Counted after the stages so a document is never weighed against itself (and only
+            # for the first version of a versioned document)
+            if version_report is None or version_report["previous_version"] is None:
+                self.corpus_idf.add_document(context.keyword_counts.terms)
+            if blocks is not None:
+                self._store_version(context, blocks, version_report)
+
             results = {
                 "preprocessing_report": quality_report,
                 "sentiment_analysis": sentiment_analysis,
@@ -109,15 +290,14 @@ class NLPAnalyzer:
                 "language_patterns": language_patterns,
                 "readability_prediction": readability_prediction,
                 "document_summary": document_summary,
-                "text_stats": {
-                    "original_length": quality_report.original_length if quality_report else len(text),
-                    "processed_length": len(text),
-                    "sentences_count": len(sentences),
-                    "words_count": len(text.split()),
-                    "quality_score": quality_report.quality_score.value if quality_report else "unknown",
-                    "processing_report": quality_report
-                }
+                "standard_readability_metrics": standard_readability_metrics,
+                "text_stats": self._text_stats(text, quality_report, len(sentences), context.word_count),
+                "metrics": self._collect_metrics(cache_stats_before, registry_stats_before, core_lease, context)
             }
+            if version_report is not None:
+                results["document_version"] = version_report
+            if options_key is not None:
+                self.near_duplicate_index.add(text, options_key, results)
             return results
         
         except Exception as e:
@@ -126,6 +306,165 @@ class NLPAnalyzer:
                 "preprocessing_report": quality_report
             }
         
+    @staticmethod
+    def _text_stats(text: str, quality_report: Optional[TextQualityReport], sentences_count: int,
+                    words_count: int) -> Dict[str, Any]:
+        return {
+            "original_length": quality_report.original_length if quality_report else len(text),
+            "processed_length": len(text),
+            "sentences_count": sentences_count,
+            "words_count": words_count,
+            # The full report is preprocessing_report; it is not repeated here
+            "quality_score": quality_report.quality_score.value if quality_report else "unknown"
+        }
+
+    def _parse_versioned(self, raw_text: str, text: str, document_id: str,
+                         skip_preprocessing: bool) -> Tuple[Doc, List[TextBlock], Dict[str, Any]]:
+        """
+        Parse a new version of a document, reusing the blocks of unchanged paragraphs.
+
+        Paragraphs are preprocessed one by one; if they rejoin to exactly the processed
+        text they become the blocks, otherwise the whole text is a single block. Only
+        blocks not seen in the previous version are parsed (in one ``nlp.pipe`` batch)
+        and get their partials (per-sentence word counts, content lemmas and sentiment,
+        and keyword counts).
+        The document Doc is assembled from the block Docs, so a sentence never spans two
+        paragraphs.
+
+        Returns:
+            Tuple of (document Doc, blocks, version report)
+        """
+        block_texts = []
+        for paragraph in split_paragraphs(raw_text):
+            block_text = paragraph.strip() if skip_preprocessing else self.preprocess_text(paragraph)[0]
+            if block_text:
+                block_texts.append(block_text)
+        paragraphs_aligned = ' '.join(block_texts) == text
+        if not paragraphs_aligned:
+            block_texts = [text]
+
+        blocks, version_report = self.document_versions.diff(document_id, block_texts)
+        version_report["paragraphs_aligned"] = paragraphs_aligned
+        new_blocks = [block for block in blocks if not block.parsed]
+        for block, block_doc in zip(new_blocks, self.nlp.pipe([block.text for block in new_blocks])):
+            block_context = AnalysisContext(block.text, block_doc, SentenceIndex.from_doc(block_doc))
+            block.sentence_count = len(block_context.sentences)
+            block.sentence_word_counts = block_context.sentence_word_counts
+            block.sentence_lemmas = block_context.sentence_lemmas
+            block.keyword_counts = block_context.keyword_counts
+            block.sentence_sentiment = self.sentiment_analyzer.analyze_sentences(
+                block_context.sentences, block.sentence_word_counts
+            )
+            block.doc = block_doc
+
+        if len(blocks) == 1:
+            doc = blocks[0].doc
+        else:
+            # Blocks are stripped, so this inserts exactly the single space that separates them in the text
+            doc = Doc.from_docs([block.doc for block in blocks], ensure_whitespace=True)
+        return doc, blocks, version_report
+
+    def _seed_from_blocks(self, context: AnalysisContext, blocks: List[TextBlock],
+                          readability_model: Optional[str]) -> bool:
+        """
+        Seed the context with sentence-level artifacts and keyword counts rebuilt from the blocks' partials.
+
+        Returns False (nothing seeded) if the document's sentences do not line up with
+        the blocks' sentences; the stages then compute everything as usual.
+        """
+        if sum(block.sentence_count for block in blocks) != len(context.sentences):
+            return False
+        source = "document_version"
+        context.seed("sentence_word_counts", concat_blocks(blocks, "sentence_word_counts"), source)
+        context.seed("sentence_lemmas", concat_blocks(blocks, "sentence_lemmas"), source)
+        context.seed("sentence_sentiment", concat_blocks(blocks, "sentence_sentiment"), source)
+        context.seed("keyword_counts", KeywordCounts.merge(block.keyword_counts for block in blocks), source)
+        if self.embedding_service is not None:
+            model_name = self.embedding_service.resolve_model(readability_model)
+            # Sentences of new blocks are encoded on first use, the others come from their blocks
+            context.seed("sentence_embeddings", self.embedding_service.for_request(
+                context.sentences, model_name, known=block_encodings(blocks, model_name), text=context.text,
+                sentence_spans=context.sentence_spans, token_offsets=context.token_offsets
+            ), source)
+        return True
+
+    def _store_version(self, context: AnalysisContext, blocks: List[TextBlock], version_report: Dict[str, Any]):
+        """Keep the sentence encodings computed by this version in their blocks, then store the version."""
+        embeddings = context.peek("sentence_embeddings")
+        encodings = embeddings.computed if embeddings is not None else None
+        if encodings and version_report.get("sentences_aligned"):
+            start = 0
+            for block in blocks:
+                block.encodings[embeddings.model_name] = encodings[start:start + block.sentence_count]
+                start += block.sentence_count
+        self.document_versions.commit(version_report["document_id"], blocks, version_report)
+
+    def _select_summarizer(self, word_count: int, summary_mode: str, latency_budget_ms: Optional[int],
+                           summarizer: Optional[str] = None) -> str:
+        """Resolve the summary mode to 'abstractive' or 'extractive'."""
+        if summary_mode not in self.SUMMARY_MODES:
+            raise ValueError(f"Unknown summary mode '{summary_mode}', expected one of {self.SUMMARY_MODES}")
+        if summary_mode != 'auto':
+            return summary_mode
+
+        if word_count > self.AUTO_EXTRACTIVE_WORD_THRESHOLD:
+            return 'extractive'
+        if latency_budget_ms is not None:
+            estimated_ms = word_count * self.ABSTRACTIVE_MS_PER_WORD.get(summarizer or self.summarizer_model, 12.0)
+            if estimated_ms > latency_budget_ms:
+                return 'extractive'
+        return 'abstractive'
+
+    def _summarize(self, text: str, doc, sentences: List[str], summary_mode: str,
+                   latency_budget_ms: Optional[int], decoding_profile: str,
+                   summarizer: Optional[str] = None,
+                   context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        summarizer = summarizer or self.summarizer_model
+        if summarizer not in self.SUMMARIZER_MODELS:
+            raise ValueError(f"Unknown summarizer '{summarizer}', expected one of {self.SUMMARIZER_MODELS}")
+
+        word_count = context.word_count if context is not None else len(text.split())
+        mode = self._select_summarizer(word_count, summary_mode, latency_budget_ms, summarizer)
+        if mode == 'abstractive':
+            try:
+                abstractive_summarizer = self.model_registry.get(f"summarizer:{summarizer}")
+            except Exception as e:
+                print(f"Warning: Could not load summarizer '{summarizer}', using extractive summary: {e}")
+            else:
+                return abstractive_summarizer.summarize_document(text, decoding_profile)
+        return self.extractive_summarizer.summarize_document(text, doc, sentences, context)
+
+    def _collect_metrics(self, cache_stats_before: Dict[str, Any], registry_stats_before: Dict[str, Any],
+                         core_lease=None, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        """Runtime metrics for the current request and the process lifetime."""
+        cache_stats = self.inference_cache.stats()
+        registry_stats = self.model_registry.stats()
+        metrics = {
+            "inference_cache": {
+                "request": InferenceCache.stats_delta(cache_stats_before, cache_stats),
+                "lifetime": cache_stats
+            },
+            "model_registry": {
+                "request": ModelRegistry.stats_delta(registry_stats_before, registry_stats),
+                "lifetime": registry_stats
+            }
+        }
+        metrics["corpus_idf"] = self.corpus_idf.stats()
+        if context is not None:
+            # Which derived artifacts each stage computed or reused, and what they cost
+            metrics["analysis_context"] = context.report()
+        if self.global_topic_model is not None:
+            metrics["global_topic_model"] = self.global_topic_model.stats()
+        if self.near_duplicate_index is not None:
+            metrics["near_duplicate_index"] = self.near_duplicate_index.stats()
+        metrics["document_versions"] = self.document_versions.stats()
+        if self.cpu_scheduler is not None:
+            metrics["cpu_scheduler"] = {
+                "request": core_lease.to_dict() if core_lease is not None else None,
+                "lifetime": self.cpu_scheduler.stats()
+            }
+        return metrics
+
     def batch_analyze(self, texts: List[str], skip_preprocessing: bool = False) -> List[Dict[str, Any]]:
         """
         Analyze multiple texts efficiently.
@@ -140,7 +479,7 @@ class NLPAnalyzer:
         results = []
         for i, text in enumerate(texts):
             try:
-                result = self.analyze_text(text, skip_preprocessing)
+                result = self.analyze_text(text, skip_preprocessing=skip_preprocessing)
                 result['batch_index'] = i
                 results.append(result)
             except Exception as e:
@@ -1,22 +1,96 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from analysis import NLPAnalyzer
+from models.cpu_scheduler import CoreScheduler
+from models.response_encoding import ResponseEncoder
 from pydantic import BaseModel
+from typing import Literal, Optional
 import uvicorn
+import os
 
 class TextRequest(BaseModel):
     text: str
-    standard_readability_metrics: dict[str, float]
+    # Optional: the service computes Flesch, FK grade, SMOG, ARI and Dale-Chall itself when omitted
+    standard_readability_metrics: Optional[dict[str, float]] = None
+    # 'auto' picks the extractive summarizer for long documents or tight latency budgets
+    summary_mode: Literal['auto', 'abstractive', 'extractive'] = 'auto'
+    latency_budget_ms: Optional[int] = None
+    # Abstractive decoding settings; all profiles are deterministic
+    decoding_profile: Literal['greedy-fast', 'balanced', 'quality'] = 'balanced'
+    # Per-request model choices; each is loaded on first use and may be evicted under the memory cap
+    summarizer: Optional[Literal['alt', 'main']] = None
+    emotion_model: Optional[Literal[
+        'j-hartmann/emotion-english-distilroberta-base', 'bhadresh-savani/distilbert-base-uncased-emotion'
+    ]] = None
+    readability_model: Optional[Literal[
+        'sentence-transformers/paraphrase-MiniLM-L6-v2', 'sentence-transformers/all-MiniLM-L6-v2'
+    ]] = None
+    # 'adaptive' picks the number of topics by silhouette (extra latency is reported in topic_selection)
+    topic_count: Literal['fixed', 'adaptive'] = 'fixed'
+    # 'embedding' clusters sentences by meaning, reusing the readability encoder's sentence vectors
+    topic_representation: Literal['tfidf', 'embedding'] = 'tfidf'
+    # Adds per-sentence sentiment (sentiment_analysis.sentences)
+    include_sentences: bool = False
+    # 'columnar' sends every list of records as {"$columnar": {field: [values]}}
+    response_layout: Literal['rows', 'columnar'] = 'rows'
+    # False skips the near-duplicate lookup and always runs the full analysis
+    allow_approximate: bool = True
+    # Versioning mode: re-uploads with the same id only reprocess the paragraphs that changed
+    document_id: Optional[str] = None
 
 app = FastAPI()
 
+# Models and lexicon indexes are built once at startup and shared across requests
+# NLP_SENTIMENT_BACKEND=onnx switches the sentiment/emotion classifiers to quantized ONNX Runtime
+# NLP_MODEL_MEMORY_CAP_MB bounds the resident transformer models (unbounded when unset)
+# NLP_IDF_INDEX_PATH persists the corpus document-frequency index (memory-mapped, shared by workers)
+# NLP_TOPIC_MODEL_DIR loads a pretrained global topic model (see scripts/train_topic_model.py)
+# NLP_NEAR_DUPLICATE_THRESHOLD (e.g. 0.9) reuses the analysis of a near-duplicate document, marked 'approximate'.
+# NLP_NEAR_DUPLICATE_PATH persists that index (SQLite, in memory when unset)
+# NLP_MAX_VERSIONED_DOCUMENTS bounds the documents kept for incremental re-analysis (64 by default)
+# NLP_CORES_PER_REQUEST sets each request's thread budget (a quarter of the cores by default); requests
+# beyond cores / budget wait for a slot. NLP_CPU_AFFINITY=1 also pins request threads to their cores.
+nlp = NLPAnalyzer(
+    sentiment_backend=os.environ.get("NLP_SENTIMENT_BACKEND", "torch"),
+    onnx_threads=int(os.environ["NLP_ONNX_THREADS"]) if os.environ.get("NLP_ONNX_THREADS") else None,
+    cache_max_bytes=int(os.environ.get("NLP_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    cache_spill_path=os.environ.get("NLP_CACHE_SPILL_PATH"),
+    model_memory_cap_bytes=(int(os.environ["NLP_MODEL_MEMORY_CAP_MB"]) * 1024 * 1024
+                            if os.environ.get("NLP_MODEL_MEMORY_CAP_MB") else None),
+    idf_index_path=os.environ.get("NLP_IDF_INDEX_PATH"),
+    topic_model_dir=os.environ.get("NLP_TOPIC_MODEL_DIR"),
+    near_duplicate_threshold=(float(os.environ["NLP_NEAR_DUPLICATE_THRESHOLD"])
+                              if os.environ.get("NLP_NEAR_DUPLICATE_THRESHOLD") else None),
+    near_duplicate_index_path=os.environ.get("NLP_NEAR_DUPLICATE_PATH"),
+    max_versioned_documents=int(os.environ.get("NLP_MAX_VERSIONED_DOCUMENTS", "64")),
+    cpu_scheduler=CoreScheduler(
+        cores_per_request=int(os.environ["NLP_CORES_PER_REQUEST"]) if os.environ.get("NLP_CORES_PER_REQUEST") else None,
+        pin_affinity=os.environ.get("NLP_CPU_AFFINITY") == "1"
+    )
+)
+
+# Responses are JSON or MessagePack (by Accept), compressed with br/gzip (by Accept-Encoding)
+# once they reach NLP_COMPRESS_MIN_BYTES
+response_encoder = ResponseEncoder(compress_min_bytes=int(os.environ.get("NLP_COMPRESS_MIN_BYTES", "1024")))
+
 @app.post("/analyze")
-def analyze_text(req: TextRequest):
+def analyze_text(req: TextRequest, request: Request):
     if len(req.text) < 100:
         raise HTTPException(status_code=400, detail="File too short for NLP analysis (minimum 100 words).")
     
-    nlp = NLPAnalyzer()
-    results = nlp.analyze_text(req.text, req.standard_readability_metrics)
-    return results
+    results = nlp.analyze_text(
+        req.text, req.standard_readability_metrics,
+        summary_mode=req.summary_mode, latency_budget_ms=req.latency_budget_ms,
+        decoding_profile=req.decoding_profile, summarizer=req.summarizer,
+        emotion_model=req.emotion_model, readability_model=req.readability_model,
+        topic_count=req.topic_count, topic_representation=req.topic_representation,
+        include_sentences=req.include_sentences, allow_approximate=req.allow_approximate,
+        document_id=req.document_id
+    )
+    encoded = response_encoder.encode(
+        results, accept=request.headers.get("accept"), accept_encoding=request.headers.get("accept-encoding"),
+        columnar=req.response_layout == 'columnar'
+    )
+    return Response(content=encoded.body, media_type=encoded.media_type, headers=encoded.headers)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
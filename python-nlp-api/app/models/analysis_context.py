@@ -0,0 +1,224 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from spacy.attrs import DEP, HEAD, IS_ALPHA, IS_PUNCT, LEMMA, LENGTH, LOWER, POS
+
+from models.keyword_extractor import KeywordCounts, KeywordIndex
+from models.lexicon_index import LexiconIndex, LexiconMatches
+from models.readability_metrics import count_syllables
+from models.sentence_embeddings import SentenceEmbeddingService, RequestEmbeddings
+from models.sentence_index import SentenceIndex
+
+# Column layout of the per-token feature matrix built with Doc.to_array
+TOKEN_FEATURE_ATTRS = [IS_ALPHA, IS_PUNCT, POS, DEP, HEAD, LEMMA, LOWER, LENGTH]
+F_IS_ALPHA, F_IS_PUNCT, F_POS, F_DEP, F_HEAD, F_LEMMA, F_LOWER, F_LENGTH = range(len(TOKEN_FEATURE_ATTRS))
+
+
+def is_content_token(token) -> bool:
+    """Alphabetic, not a stop word, longer than two characters: the words keywords and topics are built from."""
+    return not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2
+
+
+class artifact:
+    """Memoized property of an AnalysisContext whose reads are recorded per stage."""
+
+    def __init__(self, compute: Callable[["AnalysisContext"], Any]):
+        self.compute = compute
+        self.name = compute.__name__
+        self.__doc__ = compute.__doc__
+
+    def __get__(self, context, owner=None):
+        if context is None:
+            return self
+        return context.read(self.name, lambda: self.compute(context))
+
+
+class AnalysisContext:
+    """
+    Everything derived from one request's text, computed at most once.
+
+    Built by ``NLPAnalyzer.analyze_text`` after parsing and handed to every analyzer.
+    Artifacts (lowercased text, word counts, filtered tokens, the token feature matrix,
+    lexicon matches, tokenizer encodings, sentence embeddings, ...) are computed on
+    first access and reused by later stages. Work done inside ``stage(name)`` is timed,
+    and every artifact read is recorded as computed or reused by that stage, so
+    ``report()`` shows what each stage consumed and what it cost.
+    """
+
+    def __init__(self, text: str, doc, sentences: Sequence[str], lexicon_index: Optional[LexiconIndex] = None,
+                 embedding_service: Optional[SentenceEmbeddingService] = None, encoder_model: Optional[str] = None):
+        """
+        Args:
+            text: Processed document text
+            doc: spaCy Doc of ``text``
+            sentences: Non-empty, stripped sentences of ``doc``, ideally as a SentenceIndex
+            lexicon_index: Shared lexicon automata (needed for ``lexicon_matches``)
+            embedding_service: Sentence encoder service (needed for ``sentence_embeddings``)
+            encoder_model: Sentence encoder the request asked for (service default when None)
+        """
+        self.text = text
+        self.doc = doc
+        self.sentences = sentences
+        self.lexicon_index = lexicon_index
+        self.embedding_service = embedding_service
+        self.encoder_model = encoder_model
+
+        self._values: Dict[str, Any] = {}
+        self._artifacts: Dict[str, Dict[str, Any]] = {}
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._stage = "setup"
+
+    def read(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Value of artifact ``name``, computed on the first read."""
+        consumed = self._stages.setdefault(self._stage, {"ms": 0.0, "artifacts": {}})["artifacts"]
+        if name in self._values:
+            self._artifacts[name]["reads"] += 1
+            consumed.setdefault(name, "reused")
+            return self._values[name]
+
+        start = time.perf_counter()
+        value = compute()
+        self._values[name] = value
+        self._artifacts[name] = {
+            "computed_by": self._stage,
+            "compute_ms": round((time.perf_counter() - start) * 1000, 2),
+            "reads": 1
+        }
+        consumed[name] = "computed"
+        return value
+
+    def seed(self, name: str, value: Any, source: str):
+        """Provide artifact ``name`` up front (e.g. rebuilt from cached partials), so it is never computed."""
+        self._values[name] = value
+        self._artifacts[name] = {"computed_by": source, "compute_ms": 0.0, "reads": 0}
+
+    def peek(self, name: str) -> Any:
+        """Value of artifact ``name`` if it was computed or seeded, else None; not recorded as a read."""
+        return self._values.get(name)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute the artifact reads and the time spent inside the block to stage ``name``."""
+        previous, self._stage = self._stage, name
+        entry = self._stages.setdefault(name, {"ms": 0.0, "artifacts": {}})
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            entry["ms"] = round(entry["ms"] + (time.perf_counter() - start) * 1000, 2)
+            self._stage = previous
+
+    def report(self) -> Dict[str, Any]:
+        """Per-stage time and artifacts consumed, plus the cost and reuse count of each artifact."""
+        return {
+            "stages": {name: {"ms": entry["ms"], "artifacts": dict(entry["artifacts"])}
+                       for name, entry in self._stages.items()},
+            "artifacts": {name: dict(stats) for name, stats in self._artifacts.items()}
+        }
+
+    # Text
+
+    @artifact
+    def lower_text(self) -> str:
+        return self.text.lower()
+
+    @artifact
+    def words(self) -> List[str]:
+        """Whitespace-separated words of the text."""
+        return self.text.split()
+
+    @artifact
+    def word_count(self) -> int:
+        return len(self.words)
+
+    @artifact
+    def sentence_index(self) -> SentenceIndex:
+        """Offsets of ``sentences`` (built from the Doc when they were passed as plain strings)."""
+        if isinstance(self.sentences, SentenceIndex):
+            return self.sentences
+        return SentenceIndex.from_doc(self.doc)
+
+    @artifact
+    def sentence_word_counts(self) -> List[int]:
+        return self.sentence_index.word_counts().tolist()
+
+    # Tokens
+
+    @artifact
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        """(start_char, end_char) of every sentence, whitespace-stripped."""
+        return self.sentence_index.spans()
+
+    @artifact
+    def token_features(self) -> np.ndarray:
+        """(n_tokens, len(TOKEN_FEATURE_ATTRS)) matrix from ``Doc.to_array``; columns are the F_* constants."""
+        return self.doc.to_array(TOKEN_FEATURE_ATTRS)
+
+    @artifact
+    def word_mask(self) -> np.ndarray:
+        """Alphabetic tokens (never punctuation), i.e. the words counted by the readability formulas."""
+        features = self.token_features
+        return (features[:, F_IS_ALPHA] == 1) & (features[:, F_IS_PUNCT] == 0)
+
+    @artifact
+    def word_syllables(self) -> np.ndarray:
+        """Syllable count of each word token (counted once per distinct lowercase form)."""
+        unique_lower, inverse = np.unique(self.token_features[self.word_mask, F_LOWER], return_inverse=True)
+        strings = self.doc.vocab.strings
+        unique_syllables = np.fromiter(
+            (count_syllables(strings[int(lower_id)]) for lower_id in unique_lower),
+            dtype=np.int64, count=len(unique_lower)
+        )
+        return unique_syllables[inverse]
+
+    @artifact
+    def word_lengths(self) -> np.ndarray:
+        """Character length of each word token."""
+        return self.token_features[self.word_mask, F_LENGTH]
+
+    @artifact
+    def sentence_lemmas(self) -> List[List[str]]:
+        """Content lemmas (see is_content_token) of each non-empty sentence, aligned with ``sentences``."""
+        doc = self.doc
+        return [[token.lemma_.lower() for token in doc[start:end] if is_content_token(token)]
+                for start, end in self.sentence_index.token_spans()]
+
+    @artifact
+    def lexicon_matches(self) -> LexiconMatches:
+        return self.lexicon_index.scan_doc(self.doc)
+
+    @artifact
+    def keyword_index(self) -> KeywordIndex:
+        return KeywordIndex(self.doc, lower_text=self.lower_text, sentences=self.sentence_index)
+
+    @artifact
+    def keyword_counts(self) -> KeywordCounts:
+        """Lemma frequencies, POS scores and corpus IDF terms (mergeable across paragraphs)."""
+        return KeywordCounts.from_index(self.keyword_index)
+
+    def token_offsets(self, tokenizer) -> List[Tuple[int, int]]:
+        """Character offsets of ``tokenizer``'s tokens over the text (no special tokens), per tokenizer."""
+        return self.read(f"token_offsets:{tokenizer.name_or_path}", lambda: tokenizer(
+            self.text, add_special_tokens=False, return_offsets_mapping=True,
+            return_attention_mask=False, verbose=False
+        )['offset_mapping'])
+
+    # Sentence embeddings
+
+    @artifact
+    def sentence_embeddings(self) -> Optional[RequestEmbeddings]:
+        """Lazily encoded sentence (and chunk) embeddings, or None without an embedding service."""
+        if self.embedding_service is None:
+            return None
+        return self.embedding_service.for_request(
+            self.sentences, self.encoder_model, text=self.text, sentence_spans=self.sentence_spans,
+            token_offsets=self.token_offsets
+        )
+
+    @artifact
+    def sentence_vectors(self) -> Optional[np.ndarray]:
+        """(n_sentences, dim) unit-length sentence embeddings, or None if unavailable."""
+        embeddings = self.sentence_embeddings
+        return embeddings.vectors if embeddings is not None else None
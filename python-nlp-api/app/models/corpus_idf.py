@@ -0,0 +1,109 @@
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+import numpy as np
+from sklearn.utils import murmurhash3_32
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+
+class CorpusIDFIndex:
+    """
+    Document frequencies over every document analyzed so far, for background-aware IDF.
+
+    Terms are hashed (MurmurHash3, as in scikit-learn's HashingVectorizer) into a fixed
+    number of buckets, so the vocabulary never has to be stored and a lookup is one
+    hash plus one array read. Counts live in a flat uint32 array, memory-mapped from
+    ``path`` when given so they survive restarts and are shared by every worker
+    process mapping the same file. Slot 0 holds the number of documents.
+
+    Readers never lock: counts only grow, so a concurrent read sees either the old or
+    the new count of a bucket. Writers are serialized with a thread lock and, across
+    processes, an exclusive ``flock`` on ``path + '.lock'``.
+    """
+
+    def __init__(self, path: Optional[str] = None, n_buckets: int = 2 ** 20, flush_every: int = 32):
+        """
+        Args:
+            path: File backing the counts (in memory only when None); reused if it exists
+            n_buckets: Number of hash buckets for a new index (4 bytes each)
+            flush_every: Write dirty pages back to ``path`` every this many added documents
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._unflushed = 0
+
+        if path is None:
+            self._counts = np.zeros(n_buckets + 1, dtype=np.uint32)
+        else:
+            if not os.path.exists(path):
+                np.zeros(n_buckets + 1, dtype=np.uint32).tofile(path)
+            self._counts = np.memmap(path, dtype=np.uint32, mode='r+')
+        self.n_buckets = len(self._counts) - 1
+
+    @property
+    def n_documents(self) -> int:
+        return int(self._counts[0])
+
+    def _bucket(self, term: str) -> int:
+        return 1 + murmurhash3_32(term, positive=True) % self.n_buckets
+
+    def buckets(self, terms: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._bucket(term) for term in terms), dtype=np.int64)
+
+    def document_frequency(self, term: str) -> int:
+        return int(self._counts[self._bucket(term)])
+
+    def idf(self, term: str) -> float:
+        """Smoothed IDF, ln((1 + N) / (1 + df)) + 1; exactly 1.0 while the corpus is empty."""
+        return math.log((1 + self.n_documents) / (1 + self.document_frequency(term))) + 1
+
+    def idf_vector(self, terms: Iterable[str]) -> np.ndarray:
+        """Smoothed IDF of each term, in order."""
+        df = self._counts[self.buckets(terms)].astype(np.float64)
+        return np.log((1 + self.n_documents) / (1 + df)) + 1
+
+    def add_document(self, terms: Iterable[str]):
+        """Count one document containing ``terms`` (duplicates are counted once)."""
+        buckets = np.unique(self.buckets(set(terms)))
+        if not len(buckets):
+            return
+        with self._write_lock():
+            self._counts[buckets] += 1
+            self._counts[0] += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        if isinstance(self._counts, np.memmap):
+            self._counts.flush()
+        self._unflushed = 0
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if self.path is None or fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        return {
+            'documents': self.n_documents,
+            'buckets': self.n_buckets,
+            'occupied_buckets': int(np.count_nonzero(self._counts[1:])),
+            'persistent': self.path is not None
+        }
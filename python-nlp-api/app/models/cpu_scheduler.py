@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from threadpoolctl import threadpool_limits
+
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on (honours cgroup/taskset restrictions on Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CoreLease:
+    """Cores granted to one in-flight request."""
+
+    __slots__ = ('cores', 'wait_seconds')
+
+    def __init__(self, cores: List[int], wait_seconds: float):
+        self.cores = cores
+        self.wait_seconds = wait_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'cores': len(self.cores), 'queue_wait_ms': round(self.wait_seconds * 1000, 1)}
+
+
+class CoreScheduler:
+    """
+    Partitions the machine's cores between concurrent requests.
+
+    Every runtime that keeps its own thread pool (torch intra-op, OpenMP/BLAS used by
+    NumPy and scikit-learn, ONNX Runtime sessions) is sized to ``cores_per_request``
+    once at startup, and at most ``total // cores_per_request`` requests run at a
+    time; the rest wait for a slot. Together that keeps the number of busy threads at
+    or below the number of cores instead of every request spawning a thread per core.
+    With ``pin_affinity`` each request thread (and threads it starts) is also pinned to
+    the cores of its lease.
+    """
+
+    def __init__(self, cores: Optional[List[int]] = None, cores_per_request: Optional[int] = None,
+                 pin_affinity: bool = False):
+        """
+        Args:
+            cores: CPU ids to schedule on (defaults to every core available to the process)
+            cores_per_request: Thread budget of one request (defaults to a quarter of the cores)
+            pin_affinity: Pin request threads to their leased cores (Linux only)
+        """
+        self.cores = list(cores) if cores else available_cores()
+        self.cores_per_request = max(1, min(len(self.cores), cores_per_request or len(self.cores) // 4))
+        self.slots = max(1, len(self.cores) // self.cores_per_request)
+        self.pin_affinity = pin_affinity and hasattr(os, 'sched_setaffinity')
+
+        self._free = list(self.cores[:self.slots * self.cores_per_request])
+        self._condition = threading.Condition()
+        self._stats = {'leases': 0, 'queued': 0, 'queue_wait_seconds': 0.0}
+        self._active = 0
+        self._blas_limits = None
+
+    def configure_runtimes(self):
+        """Size the torch and OpenMP/BLAS thread pools to one request's budget."""
+        threads = self.cores_per_request
+        # Process-wide limit for OpenBLAS/MKL/OpenMP (NumPy, scikit-learn's KMeans, ...)
+        self._blas_limits = threadpool_limits(limits=threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+            try:
+                # Stages run one after another within a request, so inter-op parallelism only adds threads
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass  # Can only be set before torch runs its first parallel op
+        except ImportError:
+            pass
+
+    @contextmanager
+    def lease(self):
+        """Hold ``cores_per_request`` cores for the duration of the block, waiting for a free slot."""
+        start = time.perf_counter()
+        with self._condition:
+            queued = len(self._free) < self.cores_per_request
+            while len(self._free) < self.cores_per_request:
+                self._condition.wait()
+            cores = self._free[:self.cores_per_request]
+            del self._free[:self.cores_per_request]
+            self._active += 1
+            wait = time.perf_counter() - start
+            self._stats['leases'] += 1
+            self._stats['queued'] += int(queued)
+            self._stats['queue_wait_seconds'] += wait
+
+        previous_affinity = None
+        if self.pin_affinity:
+            previous_affinity = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, cores)
+        try:
+            yield CoreLease(cores, wait)
+        finally:
+            if previous_affinity is not None:
+                os.sched_setaffinity(0, previous_affinity)
+            with self._condition:
+                self._free.extend(cores)
+                self._active -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats)
+            stats['active_requests'] = self._active
+        stats['queue_wait_seconds'] = round(stats['queue_wait_seconds'], 3)
+        stats['cores'] = len(self.cores)
+        stats['cores_per_request'] = self.cores_per_request
+        stats['slots'] = self.slots
+        stats['pin_affinity'] = self.pin_affinity
+        return stats
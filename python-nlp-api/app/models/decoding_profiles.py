@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass(frozen=True)
+class DecodingProfile:
+    """Named generation settings for the abstractive summarizers."""
+    name: str
+    num_beams: int
+    length_penalty: float
+    no_repeat_ngram_size: int
+    repetition_penalty: float
+
+    # Output length as a fraction of the input length (in tokens), clamped to absolute bounds
+    min_length_ratio: float
+    max_length_ratio: float
+    min_new_tokens: int
+    max_new_tokens: int
+
+    def generation_kwargs(self, input_tokens: int) -> Dict[str, Any]:
+        """
+        ``generate()`` keyword arguments for an input of ``input_tokens`` tokens.
+
+        Decoding is always deterministic (no sampling) so outputs are cacheable. The
+        KV cache is kept on and beam search stops as soon as every beam is finished, so
+        short inputs with short length targets stop decoding early.
+        """
+        max_new_tokens = max(self.min_new_tokens, min(self.max_new_tokens, int(input_tokens * self.max_length_ratio)))
+        min_new_tokens = min(max_new_tokens - 1, max(1, int(input_tokens * self.min_length_ratio)))
+        return {
+            'do_sample': False,
+            'num_beams': self.num_beams,
+            'early_stopping': self.num_beams > 1,
+            'use_cache': True,
+            'max_new_tokens': max_new_tokens,
+            'min_new_tokens': min_new_tokens,
+            'length_penalty': self.length_penalty,
+            'no_repeat_ngram_size': self.no_repeat_ngram_size,
+            'repetition_penalty': self.repetition_penalty
+        }
+
+
+DECODING_PROFILES: Dict[str, DecodingProfile] = {
+    'greedy-fast': DecodingProfile(
+        name='greedy-fast', num_beams=1, length_penalty=1.0, no_repeat_ngram_size=3, repetition_penalty=1.2,
+        min_length_ratio=0.05, max_length_ratio=0.15, min_new_tokens=16, max_new_tokens=64
+    ),
+    'balanced': DecodingProfile(
+        name='balanced', num_beams=2, length_penalty=1.0, no_repeat_ngram_size=3, repetition_penalty=1.1,
+        min_length_ratio=0.08, max_length_ratio=0.25, min_new_tokens=24, max_new_tokens=128
+    ),
+    'quality': DecodingProfile(
+        name='quality', num_beams=4, length_penalty=2.0, no_repeat_ngram_size=3, repetition_penalty=1.0,
+        min_length_ratio=0.1, max_length_ratio=0.35, min_new_tokens=30, max_new_tokens=200
+    ),
+}
+
+DEFAULT_DECODING_PROFILE = 'balanced'
+
+
+def get_decoding_profile(name: str) -> DecodingProfile:
+    if name not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}', expected one of {tuple(DECODING_PROFILES)}")
+    return DECODING_PROFILES[name]
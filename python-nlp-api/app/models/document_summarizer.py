@@ -1,28 +1,112 @@
 import torch 
-from transformers import PegasusTokenizer, PegasusForConditionalGeneration
-from typing import Dict, Any, List 
+from transformers import PegasusTokenizerFast, PegasusForConditionalGeneration
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from transformers import pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 import warnings 
+from concurrent.futures import ThreadPoolExecutor
+from models.text_chunker import TokenBudgetChunker
+from models.inference_cache import InferenceCache
+from models.decoding_profiles import DecodingProfile, get_decoding_profile, DEFAULT_DECODING_PROFILE
+from models.analysis_context import AnalysisContext
 
 warnings.filterwarnings('ignore')
 
+
+class ChunkMapReducer:
+    """
+    Hierarchical (map-reduce) summarization of documents longer than one model window.
+
+    Map: chunk summaries are generated as padded batches, with batches spread over a
+    worker pool. Reduce: the joined summaries are re-chunked and summarized again until
+    they fit a single window. Chunk summaries are cached by chunk hash and chunks use
+    content-defined boundaries, so editing one section only regenerates that section.
+    """
+
+    def __init__(self, chunker: TokenBudgetChunker, generate_batch: Callable[[List[str], DecodingProfile], List[str]],
+                 cache_namespace: str, inference_cache: Optional[InferenceCache] = None,
+                 batch_size: int = 4, max_workers: int = 2, max_depth: int = 3):
+        """
+        Args:
+            chunker: Token-budget chunker for the summarization model's window
+            generate_batch: Summarizes a list of texts with a decoding profile in one padded batch
+            cache_namespace: Identifies the model in the cache (the decoding profile is appended)
+            inference_cache: Shared cache for chunk summaries (a private one is created otherwise)
+            batch_size: Chunks per generate call
+            max_workers: Generate calls that may run concurrently
+            max_depth: Maximum number of reduce levels before falling back to truncation
+        """
+        self.chunker = chunker
+        self.generate_batch = generate_batch
+        self.cache_namespace = cache_namespace
+        self.inference_cache = inference_cache or InferenceCache(max_bytes=16 * 1024 * 1024)
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-map")
+
+    def _map(self, chunks: List[str], profile: DecodingProfile) -> List[str]:
+        """Summarize every chunk, generating only those not already cached."""
+        # Profiles decode deterministically, so a (model, profile, chunk) key always maps to one summary
+        namespace = f"{self.cache_namespace}:{profile.name}"
+        summaries = [self.inference_cache.get(namespace, chunk) for chunk in chunks]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        futures = [
+            (batch, self.executor.submit(self.generate_batch, [chunks[i] for i in batch], profile))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for i, summary in zip(batch, future.result()):
+                summaries[i] = summary
+                self.inference_cache.put(namespace, chunks[i], summary)
+
+        return summaries
+
+    def summarize(self, text: str, profile: DecodingProfile) -> Tuple[str, int, int]:
+        """
+        Returns:
+            Tuple of (summary, chunks_processed, reduce_levels)
+        """
+        combined = text
+        chunks = self.chunker.chunk(combined, content_defined=True)
+        chunks_processed = 0
+        level = 0
+        while len(chunks) > 1 and level < self.max_depth:
+            level += 1
+            summaries = self._map(chunks, profile)
+            chunks_processed += len(chunks)
+            combined = ' '.join(summary for summary in summaries if summary)
+            chunks = self.chunker.chunk(combined, content_defined=True)
+
+        # Final reduce over a single window (truncated if max_depth was reached); short texts only get this pass
+        return self._map([combined], profile)[0], chunks_processed + 1, level
+
 class DocumentSummarizerMain: 
-    def __init__(self, model_name : str = "google/pegasus-xsum"):
+    def __init__(self, model_name : str = "google/pegasus-xsum", hierarchical: bool = True,
+                 inference_cache: Optional[InferenceCache] = None):
         """
         Initialize the pegasus summarizer
 
         Args:
             model_name: Hugging Face model identifier
+            hierarchical: Summarize long documents with batched map-reduce instead of a sequential chunk loop
+            inference_cache: Shared cache for chunk summaries
         """
         self.model_name = model_name
+        self.hierarchical = hierarchical
 
         try:
-            self.tokenizer = PegasusTokenizer.from_pretrained(model_name)
+            # The fast (Rust) tokenizer gives the chunker its offsets in a single pass
+            self.tokenizer = PegasusTokenizerFast.from_pretrained(model_name)
+            self.chunker = TokenBudgetChunker(self.tokenizer, max_tokens=512)
             self.model = PegasusForConditionalGeneration.from_pretrained(model_name)
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             self.model.to(self.device)
+            self.map_reducer = ChunkMapReducer(
+                self.chunker, self._generate_summaries, f"summary:{model_name}", inference_cache
+            )
             print(f"DocumentSummarizer initialized with {model_name} on {self.device}")
 
         except Exception as e:
@@ -30,66 +114,39 @@ class DocumentSummarizerMain:
             self.model = None
             raise Exception(f"Failed to load summarization model: {e}")
         
-    def _chunk_text_for_summarization(self, text: str, max_tokens: int = 512) -> List[str]:
+    def _chunk_text_for_summarization(self, text: str) -> List[str]:
         """
         Split text into chunks suitable for Pegasus (max 512 tokens).
-        Preserves sentence boundaries when possible.
+        Preserves sentence boundaries; over-long sentences are cut at token boundaries.
         """
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            test_chunk = current_chunk + sentence + ". "
-            tokens = self.tokenizer.encode(test_chunk, add_special_tokens=True, truncation=False)
-            
-            if len(tokens) <= max_tokens:
-                current_chunk = test_chunk
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = sentence + ". "
-                else:
-                    # Single sentence is too long, truncate it
-                    truncated = self.tokenizer.decode(
-                        self.tokenizer.encode(sentence, max_length=max_tokens-2, truncation=True)
-                    )
-                    chunks.append(truncated + ".")
-                    current_chunk = ""
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
+        return self.chunker.chunk(text)
 
-    def _generate_summary(self, text: str) -> str:
+    def _generate_summary(self, text: str, profile: Optional[DecodingProfile] = None) -> str:
         """Generate summary for a single text chunk."""
+        return self._generate_summaries([text], profile)[0]
+
+    def _generate_summaries(self, texts: List[str], profile: Optional[DecodingProfile] = None) -> List[str]:
+        """Generate summaries for several chunks in one padded batch."""
+        profile = profile or get_decoding_profile(DEFAULT_DECODING_PROFILE)
         # Tokenize input
-        inputs = self.tokenizer.encode(
-            text,
+        inputs = self.tokenizer(
+            texts,
             return_tensors="pt",
             max_length=512,
             truncation=True,
             padding=True
         ).to(self.device)
         
-        # Generate summary
+        # Generate summary, with output length scaled to the longest input in the batch
+        input_tokens = int(inputs['attention_mask'].sum(dim=1).max())
         with torch.no_grad():
-            summary_ids = self.model.generate(
-                inputs,
-                max_length=150,          # Pegasus-XSum typically generates shorter summaries
-                min_length=30,
-                length_penalty=2.0,      # Encourage concise summaries
-                num_beams=4,             # Beam search for better quality
-                early_stopping=True,
-                no_repeat_ngram_size=3  # Avoid repetition
-            )
+            summary_ids = self.model.generate(**inputs, **profile.generation_kwargs(input_tokens))
         
-        # Decode summary
-        summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        return summary.strip()
+        # Decode summaries
+        summaries = self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        return [summary.strip() for summary in summaries]
 
-    def _combine_chunk_summaries(self, summaries: List[str]) -> str:
+    def _combine_chunk_summaries(self, summaries: List[str], profile: Optional[DecodingProfile] = None) -> str:
         """
         Combine multiple chunk summaries into a single coherent paragraph.
         For very long documents with multiple chunks.
@@ -106,18 +163,19 @@ class DocumentSummarizerMain:
         
         # Otherwise, summarize the summaries
         try:
-            final_summary = self._generate_summary(combined_text)
+            final_summary = self._generate_summary(combined_text, profile)
             return final_summary
         except:
             # Fallback: return first summary if re-summarization fails
             return summaries[0]
 
-    def summarize_document(self, text: str) -> Dict[str, Any]:
+    def summarize_document(self, text: str, decoding_profile: str = DEFAULT_DECODING_PROFILE) -> Dict[str, Any]:
         """
         Generate a document summary with metadata.
         
         Args:
             text: Input text to summarize
+            decoding_profile: 'greedy-fast', 'balanced' or 'quality'
             
         Returns:
             Dictionary containing summary and metadata
@@ -150,29 +208,33 @@ class DocumentSummarizerMain:
             }
 
         try:
-            # Determine chunking strategy
-            tokens = self.tokenizer.encode(text, add_special_tokens=True, truncation=False)
-            
-            if len(tokens) <= 512:
-                # Single chunk processing
-                summary = self._generate_summary(text)
-                chunks_processed = 1
+            profile = get_decoding_profile(decoding_profile)
+            if self.hierarchical:
+                summary, chunks_processed, _ = self.map_reducer.summarize(text, profile)
             else:
-                # Multi-chunk processing
+                # Determine chunking strategy (short texts come back as a single chunk)
                 chunks = self._chunk_text_for_summarization(text)
-                chunk_summaries = []
-                
-                for chunk in chunks:
-                    if chunk.strip():
-                        chunk_summary = self._generate_summary(chunk)
-                        chunk_summaries.append(chunk_summary)
                 
-                summary = self._combine_chunk_summaries(chunk_summaries)
-                chunks_processed = len(chunk_summaries)
+                if len(chunks) <= 1:
+                    # Single chunk processing
+                    summary = self._generate_summary(text, profile)
+                    chunks_processed = 1
+                else:
+                    # Multi-chunk processing
+                    chunk_summaries = []
+                    
+                    for chunk in chunks:
+                        if chunk.strip():
+                            chunk_summary = self._generate_summary(chunk, profile)
+                            chunk_summaries.append(chunk_summary)
+                    
+                    summary = self._combine_chunk_summaries(chunk_summaries, profile)
+                    chunks_processed = len(chunk_summaries)
 
             return {
                 'summary': summary,
                 'method': 'pegasus-xsum',
+                'decoding_profile': profile.name,
                 'confidence': 0.85,  # Pegasus-XSum generally produces reliable summaries
                 'chunks_processed': chunks_processed,
                 'original_word_count': word_count,
@@ -191,15 +253,36 @@ class DocumentSummarizerMain:
 
 
 # adding a second, simpler document summarizer model
-from transformers import pipeline
-from typing import Dict, Any
 
 
 class DocumentSummarizerAlt:
-    def __init__(self):
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-xsum")
+    def __init__(self, model_name: str = "facebook/bart-large-xsum", hierarchical: bool = True,
+                 inference_cache: Optional[InferenceCache] = None):
+        """
+        Args:
+            model_name: Hugging Face model identifier
+            hierarchical: Map-reduce documents longer than BART's window instead of truncating them
+            inference_cache: Shared cache for chunk summaries
+        """
+        self.model_name = model_name
+        self.hierarchical = hierarchical
+        self.summarizer = pipeline("summarization", model=model_name)
+        self.model = self.summarizer.model
+        self.chunker = TokenBudgetChunker(self.summarizer.tokenizer, max_tokens=1024)
+        self.map_reducer = ChunkMapReducer(
+            self.chunker, self._generate_summaries, f"summary:{model_name}", inference_cache
+        )
+
+    def _generate_summaries(self, texts: List[str], profile: DecodingProfile) -> List[str]:
+        """Summarize several chunks; the pipeline pads them into one batch."""
+        # Output length is scaled to the longest input in the batch
+        input_tokens = min(self.chunker.max_tokens, max(self.chunker.count_tokens(text) for text in texts))
+        results = self.summarizer(
+            texts, batch_size=len(texts), truncation=True, **profile.generation_kwargs(input_tokens)
+        )
+        return [result['summary_text'] for result in results]
     
-    def summarize_document(self, text: str) -> Dict[str, Any]:
+    def summarize_document(self, text: str, decoding_profile: str = DEFAULT_DECODING_PROFILE) -> Dict[str, Any]:
         """Generate document summary with metadata."""
         if not text.strip():
             return {
@@ -224,25 +307,25 @@ class DocumentSummarizerAlt:
             }
         
         try:
-            result = self.summarizer(text,
-                                    max_length=200,
-                                    min_length=70,
-                                    do_sample=True,
-                                    truncation=True,
-                                    early_stopping=False,
-                                    length_penalty=0.8,
-                                    repetition_penalty=1.1) 
+            profile = get_decoding_profile(decoding_profile)
+            if self.hierarchical:
+                summary, chunks_processed, _ = self.map_reducer.summarize(text, profile)
+            else:
+                summary = self._generate_summaries([text], profile)[0]
+                chunks_processed = 1
             
             original_word_count = len(text.split())
-            summary_word_count = len(result[0]['summary_text'].split())
+            summary_word_count = len(summary.split())
             
             # Fixed compression ratio calculation
             compression_ratio = round(summary_word_count / original_word_count, 2) if original_word_count > 0 else 0.0
             
             return {
-                'summary': result[0]['summary_text'],
+                'summary': summary,
                 'method': 'abstractive',
-                'confidence': result[0].get('score', 0.8),
+                'decoding_profile': profile.name,
+                'confidence': 0.8,
+                'chunks_processed': chunks_processed,
                 'original_word_count': original_word_count,
                 'summary_word_count': summary_word_count,
                 'compression_ratio': compression_ratio
@@ -257,3 +340,133 @@ class DocumentSummarizerAlt:
                 'summary_word_count': 0,
                 'compression_ratio': 0.0
             }
+
+
+# fast extractive tier: ranks existing sentences instead of generating text
+class DocumentSummarizerExtractive:
+    """Graph-based (TextRank) extractive summarizer over transformer, spaCy or TF-IDF sentence vectors."""
+
+    def __init__(self, max_sentences: int = 3, max_words: int = 120, damping: float = 0.85):
+        self.max_sentences = max_sentences
+        self.max_words = max_words
+        self.damping = damping
+
+    def _sentence_vectors(self, sentences: List[str], doc=None, embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reuse the request's sentence embeddings when given, else spaCy sentence vectors when the
+        model has them, otherwise fit TF-IDF over the sentences.
+        """
+        if embeddings is not None and len(embeddings) == len(sentences):
+            return embeddings
+        if doc is not None and doc.has_vector:
+            spans = [sent for sent in doc.sents if sent.text.strip()]
+            if len(spans) == len(sentences):
+                return np.vstack([sent.vector for sent in spans])
+        return TfidfVectorizer(stop_words='english').fit_transform(sentences).toarray()
+
+    def _rank_sentences(self, vectors: np.ndarray, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+        """PageRank over the cosine-similarity graph of sentences."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = vectors / np.maximum(norms, 1e-10)
+        similarity = np.clip(unit @ unit.T, 0.0, None)
+        np.fill_diagonal(similarity, 0.0)
+
+        # Row-normalize into a transition matrix; isolated sentences jump uniformly
+        n = len(vectors)
+        row_sums = similarity.sum(axis=1, keepdims=True)
+        transition = np.where(row_sums > 0, similarity / np.maximum(row_sums, 1e-10), 1.0 / n)
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            updated = (1 - self.damping) / n + self.damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < tol:
+                scores = updated
+                break
+            scores = updated
+        return scores
+
+    def summarize_document(self, text: str, doc=None, sentences: Optional[List[str]] = None,
+                           context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        """
+        Generate document summary with metadata.
+
+        Args:
+            context: The request's AnalysisContext (word counts and sentence embeddings are reused);
+                     ``doc`` and ``sentences`` are taken from it when given
+        """
+        if not text.strip():
+            return {
+                'summary': 'No text provided for summarization',
+                'method': 'empty',
+                'confidence': 0.0,
+                'original_word_count': 0,
+                'summary_word_count': 0,
+                'compression_ratio': 0.0
+            }
+
+        embeddings = None
+        if context is not None:
+            doc, sentences = context.doc, context.sentences
+            word_count = context.word_count
+            sentence_word_counts = context.sentence_word_counts
+            embeddings = context.sentence_vectors
+        else:
+            word_count = len(text.split())
+        if sentences is None:
+            if doc is not None:
+                sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+            else:
+                sentences = [text[start:end].strip() for start, end in TokenBudgetChunker.sentence_spans(text)]
+        if context is None:
+            sentence_word_counts = [len(sentence.split()) for sentence in sentences]
+
+        if word_count < 50 or len(sentences) <= self.max_sentences:
+            return {
+                'summary': text[:500] + "..." if len(text) > 500 else text,
+                'method': 'passthrough',
+                'confidence': 1.0,
+                'original_word_count': word_count,
+                'summary_word_count': word_count,
+                'compression_ratio': 1.0
+            }
+
+        try:
+            scores = self._rank_sentences(self._sentence_vectors(sentences, doc, embeddings))
+
+            # Take the best-ranked sentences within the word budget, then restore document order
+            selected = []
+            selected_words = 0
+            for index in np.argsort(-scores):
+                sentence_words = sentence_word_counts[index]
+                if selected and selected_words + sentence_words > self.max_words:
+                    continue
+                selected.append(index)
+                selected_words += sentence_words
+                if len(selected) >= self.max_sentences:
+                    break
+
+            summary = ' '.join(sentences[index] for index in sorted(selected))
+            summary_word_count = len(summary.split())
+
+            # Centrality of the chosen sentences relative to an average sentence, squashed to 0-0.95
+            centrality = float(scores[selected].mean()) * len(sentences)
+            confidence = round(min(0.95, 0.5 + 0.15 * centrality), 3)
+
+            return {
+                'summary': summary,
+                'method': 'extractive',
+                'confidence': confidence,
+                'original_word_count': word_count,
+                'summary_word_count': summary_word_count,
+                'compression_ratio': round(summary_word_count / word_count, 2)
+            }
+
+        except Exception as e:
+            return {
+                'summary': f"Error generating summary: {str(e)}",
+                'method': 'error',
+                'confidence': 0.0,
+                'original_word_count': word_count,
+                'summary_word_count': 0,
+                'compression_ratio': 0.0
+            }
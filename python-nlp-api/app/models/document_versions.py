@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Raw paragraphs of ``text`` (separated by blank lines), unstripped and possibly empty."""
+    return _PARAGRAPH_BREAK.split(text)
+
+
+class TextBlock:
+    """
+    One paragraph of a versioned document and the partial results computed from it.
+
+    Everything here depends only on the paragraph's text, so a block is reused as is by
+    any later version containing a paragraph with the same hash. Sentence-level lists
+    are aligned with the sentences of ``doc``; ``keyword_counts`` (a KeywordCounts) is
+    merged over the blocks into the document's counts.
+    """
+
+    __slots__ = ('text', 'hash', 'doc', 'sentence_count', 'sentence_word_counts', 'sentence_lemmas',
+                 'sentence_sentiment', 'keyword_counts', 'encodings')
+
+    def __init__(self, text: str, block_hash: str):
+        self.text = text
+        self.hash = block_hash
+        self.doc = None
+        self.sentence_count = 0
+        self.sentence_word_counts: List[int] = []
+        self.sentence_lemmas: List[List[str]] = []
+        self.sentence_sentiment: List[Dict[str, Any]] = []
+        self.keyword_counts = None
+        # Sentence encodings per encoder model, filled once a version has encoded them
+        self.encodings: Dict[str, List[Any]] = {}
+
+    @property
+    def parsed(self) -> bool:
+        return self.doc is not None
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class DocumentVersionStore:
+    """
+    Latest version of each versioned document, as a list of paragraph blocks.
+
+    ``diff`` matches the blocks of a new version against the previous one by content
+    hash: unchanged (or moved) paragraphs keep their parsed Doc and partial results,
+    and only new ones are left to compute. Documents are kept in memory, least recently
+    analyzed evicted first beyond ``max_documents``.
+    """
+
+    def __init__(self, max_documents: int = 64):
+        """
+        Args:
+            max_documents: Versioned documents kept (each holds the parsed Docs of its paragraphs)
+        """
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, Tuple[int, List[TextBlock]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'versions': 0, 'reused_blocks': 0, 'new_blocks': 0, 'evictions': 0}
+
+    def diff(self, document_id: str, block_texts: List[str]) -> Tuple[List[TextBlock], Dict[str, Any]]:
+        """
+        Blocks of a new version of ``document_id`` and a summary of what changed.
+
+        Returns:
+            Tuple of (blocks in document order, change report); blocks that are not
+            ``parsed`` still need their partial results computed
+        """
+        with self._lock:
+            version, previous_blocks = self._documents.get(document_id, (0, []))
+        previous = {block.hash: block for block in previous_blocks}
+
+        blocks = []
+        for text in block_texts:
+            block_hash = TextBlock.content_hash(text)
+            block = previous.get(block_hash)
+            blocks.append(block if block is not None else TextBlock(text, block_hash))
+
+        current_hashes = {block.hash for block in blocks}
+        reused = sum(1 for block in blocks if block.hash in previous)
+        return blocks, {
+            "document_id": document_id,
+            "version": version + 1,
+            "previous_version": version or None,
+            "blocks": len(blocks),
+            "reused_blocks": reused,
+            "new_blocks": len(blocks) - reused,
+            "removed_blocks": sum(1 for block_hash in previous if block_hash not in current_hashes)
+        }
+
+    def commit(self, document_id: str, blocks: List[TextBlock], report: Dict[str, Any]):
+        """Store fully computed ``blocks`` as the version described by ``report`` (from ``diff``)."""
+        with self._lock:
+            self._documents[document_id] = (report["version"], blocks)
+            self._documents.move_to_end(document_id)
+            self._stats['versions'] += 1
+            self._stats['reused_blocks'] += report["reused_blocks"]
+            self._stats['new_blocks'] += report["new_blocks"]
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['documents'] = len(self._documents)
+        return stats
+
+
+def concat_blocks(blocks: List[TextBlock], field: str) -> List[Any]:
+    """Sentence-level list ``field`` of the whole document, from its blocks in order."""
+    return [item for block in blocks for item in getattr(block, field)]
+
+
+def block_encodings(blocks: List[TextBlock], model_name: str) -> List[Optional[Any]]:
+    """Known sentence encodings of the document for ``model_name``; None for sentences of blocks never encoded."""
+    known = []
+    for block in blocks:
+        encodings = block.encodings.get(model_name)
+        known.extend(encodings if encodings is not None else [None] * block.sentence_count)
+    return known
@@ -0,0 +1,314 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import joblib
+import numpy as np
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+from threadpoolctl import threadpool_limits
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only serialized within the process
+    fcntl = None
+
+MODEL_FILE = "lda.joblib"
+META_FILE = "meta.json"
+TERMS_FILE = "terms.json"
+LOCK_FILE = "refresh.lock"
+# Sentences per training passage when the model directory does not record it
+SENTENCES_PER_PASSAGE = 5
+
+
+def _tmp_path(path: str) -> str:
+    # Unique per process and thread, so concurrent writers never share a temporary file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _save_json(path: str, data):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class GlobalTopicModel:
+    """
+    Corpus-level online LDA over hashed lemma counts, shared by every request.
+
+    Trained offline (scripts/train_topic_model.py) and saved uncompressed with joblib,
+    so at startup the large topic-word arrays are memory-mapped read-only instead of
+    loaded. A request costs one ``transform`` over its passages, and topic ids are the
+    same for every document. Documents seen in production are buffered and folded in
+    with ``partial_fit`` every ``refresh_every`` passages: a writable copy is updated in
+    a background thread, saved, and swapped in atomically for new requests. Observed
+    documents are cut into passages of as many sentences as the training passages, so
+    online updates are made on the unit the model was trained on.
+
+    Worker processes sharing ``model_dir`` serialize refreshes with an exclusive
+    ``flock`` on its ``refresh.lock``; each refresh starts from the latest model on disk,
+    so the passages every worker observed end up in the same model. Every worker checks
+    the mtime of ``meta.json`` before inferring and maps the refreshed model as soon as
+    one is written, so all of them assign the same topics.
+    """
+
+    def __init__(self, model_dir: str, refresh_every: int = 200, core_budget: Optional[int] = None):
+        """
+        Args:
+            model_dir: Directory written by ``train``
+            refresh_every: Fold buffered passages into the model after this many (0 disables updates)
+            core_budget: OpenMP/BLAS threads a refresh may use (the process-wide limit when omitted)
+        """
+        self.model_dir = model_dir
+        self.refresh_every = refresh_every
+        self.core_budget = core_budget
+        self._loaded_mtime: Optional[int] = None
+        self._load()
+        self.vectorizer = self._vectorizer(self.meta["n_features"])
+        self.n_topics = self.lda.n_components
+
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._refreshing = False
+        self.refreshes = 0
+        self.reloads = 0
+
+    def _meta_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.model_dir, META_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """Map the model currently on disk (read-only) with its metadata."""
+        # Taken first: a refresh written meanwhile is picked up by the next _sync
+        mtime = self._meta_mtime()
+        with open(os.path.join(self.model_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.lda = joblib.load(os.path.join(self.model_dir, MODEL_FILE), mmap_mode="r")
+        self.meta = meta
+        self._loaded_mtime = mtime
+
+    def _sync(self):
+        """Swap in the model if another worker refreshed it since this one loaded it (one stat per call)."""
+        mtime = self._meta_mtime()
+        if mtime is None or mtime == self._loaded_mtime or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            with self._refresh_lock(shared=True, blocking=False) as locked:
+                # While a refresh is being written, keep the current model until the next call
+                if locked:
+                    self._load()
+                    self.reloads += 1
+        except Exception as e:
+            print(f"Warning: Could not reload the refreshed global topic model: {e}")
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _vectorizer(n_features: int) -> HashingVectorizer:
+        # Raw non-negative counts, as LDA expects
+        return HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+
+    @staticmethod
+    def _bucket(term: str, n_features: int) -> int:
+        # Same index HashingVectorizer assigns to a token
+        return abs(murmurhash3_32(term, seed=0)) % n_features
+
+    @staticmethod
+    def split_passages(sentence_lemmas: List[List[str]],
+                       sentences_per_passage: int = SENTENCES_PER_PASSAGE) -> List[str]:
+        """Space-joined lemmas of each run of ``sentences_per_passage`` sentences (empty runs skipped)."""
+        passages = []
+        for start in range(0, len(sentence_lemmas), sentences_per_passage):
+            passage = [lemma for lemmas in sentence_lemmas[start:start + sentences_per_passage] for lemma in lemmas]
+            if passage:
+                passages.append(" ".join(passage))
+        return passages
+
+    def passages(self, sentence_lemmas: List[List[str]]) -> List[str]:
+        """A document's sentence lemmas cut into passages like the ones the model was trained on."""
+        return self.split_passages(sentence_lemmas, self.meta.get("sentences_per_passage", SENTENCES_PER_PASSAGE))
+
+    @classmethod
+    def train(cls, passages: Iterable[str], model_dir: str, n_topics: int = 20, n_features: int = 2 ** 18,
+              batch_size: int = 256, passes: int = 1, top_terms: int = 50,
+              sentences_per_passage: int = SENTENCES_PER_PASSAGE) -> "GlobalTopicModel":
+        """
+        Fit the model on passages of space-joined lemmas and save it to ``model_dir``.
+
+        Passages are hashed and fed to ``partial_fit`` one batch at a time, so only the
+        lemma strings (never a full document-term matrix) are held in memory. A bucket ->
+        term table is kept so topics can be named despite the hashed vocabulary.
+        ``sentences_per_passage`` (how the passages were cut, see ``split_passages``) is
+        recorded so observed documents are cut the same way.
+        """
+        os.makedirs(model_dir, exist_ok=True)
+        vectorizer = cls._vectorizer(n_features)
+        analyzer = vectorizer.build_analyzer()
+        passages = list(passages)
+        # total_samples scales each online update; later refreshes keep the same scale. Most hashed
+        # buckets are empty, so the default topic-word prior (1 / n_topics per bucket) would swamp the counts.
+        lda = LatentDirichletAllocation(
+            n_components=n_topics, learning_method="online", total_samples=max(1, len(passages)),
+            topic_word_prior=0.01, random_state=42
+        )
+        term_counts = Counter()
+        n_documents = 0
+
+        for pass_index in range(passes):
+            batch = []
+            for passage in passages:
+                batch.append(passage)
+                if pass_index == 0:
+                    term_counts.update(analyzer(passage))
+                    n_documents += 1
+                if len(batch) == batch_size:
+                    lda.partial_fit(vectorizer.transform(batch))
+                    batch = []
+            if batch:
+                lda.partial_fit(vectorizer.transform(batch))
+
+        # Most frequent term per bucket names that bucket
+        bucket_terms: Dict[int, str] = {}
+        for term, _ in term_counts.most_common():
+            bucket_terms.setdefault(cls._bucket(term, n_features), term)
+
+        joblib.dump(lda, os.path.join(model_dir, MODEL_FILE))
+        _save_json(os.path.join(model_dir, TERMS_FILE), {str(k): v for k, v in bucket_terms.items()})
+        _save_json(os.path.join(model_dir, META_FILE), {
+            "n_features": n_features,
+            "n_topics": n_topics,
+            "documents": n_documents,
+            "trained_at": round(time.time()),
+            "top_terms": top_terms,
+            "sentences_per_passage": sentences_per_passage,
+            "topic_terms": cls._topic_terms(lda, bucket_terms, top_terms)
+        })
+        return cls(model_dir)
+
+    @staticmethod
+    def _topic_terms(lda, bucket_terms: Dict[int, str], top_terms: int) -> List[List[str]]:
+        topics = []
+        for row in lda.components_:
+            # Over-fetch: hashed buckets never seen in training have no name
+            n_candidates = min(len(row), top_terms * 2)
+            candidates = np.argpartition(row, -n_candidates)[-n_candidates:]
+            ordered = candidates[np.argsort(row[candidates])[::-1]]
+            topics.append([bucket_terms[int(b)] for b in ordered if int(b) in bucket_terms][:top_terms])
+        return topics
+
+    def topic_terms(self, topic_id: int, n: int = 8) -> List[str]:
+        return self.meta["topic_terms"][topic_id][:n]
+
+    def transform(self, passages: List[str]) -> np.ndarray:
+        """Topic distribution of each passage (rows sum to 1), in one call."""
+        self._sync()
+        return self.lda.transform(self.vectorizer.transform(passages))
+
+    def observe(self, passages: List[str]):
+        """Buffer analyzed passages; once ``refresh_every`` are pending, refresh in the background."""
+        if not self.refresh_every:
+            return
+        with self._lock:
+            self._pending.extend(passages)
+            if len(self._pending) < self.refresh_every or self._refreshing:
+                return
+            batch, self._pending = self._pending, []
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(batch,), daemon=True).start()
+
+    @contextmanager
+    def _refresh_lock(self, shared: bool = False, blocking: bool = True):
+        """Cross-process lock on the model files (exclusive to write them, shared to load them); yields if held."""
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.model_dir, LOCK_FILE), "a") as lock_file:
+            try:
+                operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                fcntl.flock(lock_file, operation if blocking else operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self, passages: List[str]):
+        try:
+            with self._refresh_lock():
+                self._refresh_locked(passages)
+        except Exception as e:
+            print(f"Warning: Global topic model refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh_locked(self, passages: List[str]):
+        # Another worker may have refreshed since this one loaded the model: start from the files on disk
+        with open(os.path.join(self.model_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        # Writable in-memory copy; requests keep using the memory-mapped model meanwhile
+        lda = joblib.load(os.path.join(self.model_dir, MODEL_FILE))
+        # Refreshes run beside requests, so they get one request's share of the cores
+        with threadpool_limits(limits=self.core_budget):
+            lda.partial_fit(self.vectorizer.transform(passages))
+
+        with open(os.path.join(self.model_dir, TERMS_FILE), encoding="utf-8") as f:
+            bucket_terms = {int(k): v for k, v in json.load(f).items()}
+        new_terms = defaultdict(Counter)
+        analyzer = self.vectorizer.build_analyzer()
+        for passage in passages:
+            for term in analyzer(passage):
+                new_terms[self._bucket(term, meta["n_features"])][term] += 1
+        for bucket, counts in new_terms.items():
+            bucket_terms.setdefault(bucket, counts.most_common(1)[0][0])
+
+        meta["documents"] = meta.get("documents", 0) + len(passages)
+        meta["refreshed_at"] = round(time.time())
+        meta["topic_terms"] = self._topic_terms(lda, bucket_terms, meta["top_terms"])
+
+        model_path = os.path.join(self.model_dir, MODEL_FILE)
+        tmp_path = _tmp_path(model_path)
+        joblib.dump(lda, tmp_path)
+        os.replace(tmp_path, model_path)
+        _save_json(os.path.join(self.model_dir, TERMS_FILE), {str(k): v for k, v in bucket_terms.items()})
+        _save_json(os.path.join(self.model_dir, META_FILE), meta)
+
+        # Swap in the refreshed, memory-mapped model for new requests
+        self.lda = joblib.load(model_path, mmap_mode="r")
+        self.meta = meta
+        self._loaded_mtime = self._meta_mtime()
+        self.refreshes += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "topics": self.n_topics,
+            "documents": self.meta.get("documents", 0),
+            "refreshes": self.refreshes,
+            "reloads": self.reloads,
+            "pending_documents": pending
+        }
+
+
+def load_global_topic_model(model_dir: Optional[str], refresh_every: int = 200,
+                            core_budget: Optional[int] = None) -> Optional[GlobalTopicModel]:
+    """Load the global topic model if ``model_dir`` holds one, else None (per-document topics are used)."""
+    if not model_dir:
+        return None
+    try:
+        return GlobalTopicModel(model_dir, refresh_every=refresh_every, core_budget=core_budget)
+    except Exception as e:
+        print(f"Warning: Could not load global topic model from {model_dir}, using per-document topics: {e}")
+        return None
@@ -0,0 +1,116 @@
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class InferenceCache:
+    """
+    Memory-bounded LRU cache for per-sentence model outputs, shared across requests.
+
+    Entries are keyed by a hash of ``namespace`` (model identity) and the normalized
+    text. When the in-memory budget is exceeded the least recently used entries are
+    evicted, and written to an SQLite file first if ``spill_path`` is set so they can
+    be promoted back on a later hit.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, spill_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'spilled': 0}
+
+        self._disk = None
+        if spill_path:
+            self._disk = sqlite3.connect(spill_path, check_same_thread=False)
+            self._disk.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB)")
+            self._disk.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+    def make_key(self, namespace: str, text: str) -> str:
+        digest = hashlib.blake2b(self.normalize(text).encode('utf-8'), digest_size=16).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def get(self, namespace: str, text: str) -> Optional[Any]:
+        key = self.make_key(namespace, text)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return pickle.loads(payload)
+
+            if self._disk is not None:
+                row = self._disk.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._stats['hits'] += 1
+                    self._stats['disk_hits'] += 1
+                    self._insert(key, row[0])
+                    return pickle.loads(row[0])
+
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, namespace: str, text: str, value: Any):
+        key = self.make_key(namespace, text)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._insert(key, payload)
+
+    def _insert(self, key: str, payload: bytes):
+        """Insert under the lock, evicting (and spilling) LRU entries over budget."""
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = payload
+        self._bytes += len(payload)
+
+        spilled = []
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old_payload = self._entries.popitem(last=False)
+            self._bytes -= len(old_payload)
+            self._stats['evictions'] += 1
+            if self._disk is not None:
+                spilled.append((old_key, old_payload))
+
+        if spilled:
+            self._disk.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", spilled)
+            self._disk.commit()
+            self._stats['spilled'] += len(spilled)
+
+    def clear(self):
+        """Drop all in-memory entries (the spill file is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['memory_bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """Hit/miss counts and hit rate between two ``stats()`` snapshots (e.g. for one request)."""
+        hits = after['hits'] - before['hits']
+        misses = after['misses'] - before['misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
@@ -1,20 +1,157 @@
 import re
 import math
 from collections import Counter, defaultdict
-from typing import List, Dict, Any
-import yake
+from typing import List, Dict, Any, Iterable, Optional, Set
+from models.yake_scorer import YakeKeywordScorer
+from models.corpus_idf import CorpusIDFIndex
+from models.sentence_index import SentenceIndex
+
+
+class KeywordIndex:
+    """
+    Per-request index of the Doc used by every keyword stage.
+
+    Built in one pass over the tokens plus one over sentences and noun chunks, so the
+    stages below look words, phrases and sentence contexts up instead of re-walking
+    the Doc or re-scanning the text.
+    """
+
+    def __init__(self, doc, lower_text: Optional[str] = None, sentences: Optional[SentenceIndex] = None):
+        self.doc = doc
+        self.text = doc.text
+        self.lower_text = lower_text if lower_text is not None else self.text.lower()
+        self.noun_chunks = list(doc.noun_chunks)
+
+        # Lowercase forms of the non-space tokens, and where each form occurs in that sequence
+        self.lowers: List[str] = []
+        self.lower_positions: Dict[str, List[int]] = defaultdict(list)
+        # Content words (alphabetic, not stop words, longer than two characters) grouped by lemma
+        self.lemma_positions: Dict[str, List[int]] = defaultdict(list)
+        # Adjacent content lemmas within a sentence, joined as "first second" (TfidfVectorizer's bigram form)
+        self.lemma_bigrams: Set[str] = set()
+        self.content_tokens = 0
+        previous_lemma = None
+        for token in doc:
+            if token.is_sent_start:
+                previous_lemma = None
+            if token.is_space:
+                continue
+            self.lower_positions[token.lower_].append(len(self.lowers))
+            self.lowers.append(token.lower_)
+            if not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2:
+                lemma = token.lemma_.lower()
+                self.lemma_positions[lemma].append(token.i)
+                self.content_tokens += 1
+                if previous_lemma is not None:
+                    self.lemma_bigrams.add(f"{previous_lemma} {lemma}")
+                previous_lemma = lemma
+
+        # Sentence bounds as offsets; sentence text is only sliced for reported contexts
+        self.sentences = sentences if sentences is not None else SentenceIndex.from_doc(doc)
+
+    def phrase_frequency(self, phrase: str) -> int:
+        """Occurrences of a lowercase phrase as a run of whole tokens."""
+        words = phrase.split()
+        if not words or any(word not in self.lower_positions for word in words):
+            # Phrases split differently by the tokenizer (hyphens, apostrophes) fall back to a word-boundary scan
+            return len(re.findall(r'\b' + re.escape(phrase) + r'\b', self.lower_text))
+        count = 0
+        for position in self.lower_positions[words[0]]:
+            if self.lowers[position:position + len(words)] == words:
+                count += 1
+        return count
+
+    def terms(self) -> Set[str]:
+        """Content lemmas and lemma bigrams of the document, as counted by the corpus IDF index."""
+        return set(self.lemma_positions) | self.lemma_bigrams
+
+    def sentence_index(self, token_index: int) -> int:
+        """Index of the sentence containing the token at ``token_index``."""
+        return int(self.sentences.token_starts.searchsorted(token_index, side='right')) - 1
+
+    def sentence_text(self, sentence_index: int, max_chars: Optional[int] = None) -> str:
+        """Text of a sentence, or only its first ``max_chars`` characters."""
+        start, end = int(self.sentences.starts[sentence_index]), int(self.sentences.ends[sentence_index])
+        if max_chars is not None:
+            end = min(end, start + max_chars)
+        return self.text[start:end]
+
+
+class KeywordCounts:
+    """
+    Additive keyword statistics of a text: content lemma frequencies, their POS scores,
+    and the terms counted by the corpus IDF index.
+
+    None of them depends on token positions, so the counts of a document's paragraphs
+    merge into the counts of the document (bigrams never cross a sentence, hence never
+    a paragraph).
+    """
+
+    __slots__ = ('lemma_frequency', 'pos_scores', 'content_tokens', 'terms')
+
+    def __init__(self, lemma_frequency: Counter, pos_scores: Counter, content_tokens: int, terms: Set[str]):
+        self.lemma_frequency = lemma_frequency
+        self.pos_scores = pos_scores
+        self.content_tokens = content_tokens
+        self.terms = terms
+
+    @classmethod
+    def from_index(cls, index: KeywordIndex) -> "KeywordCounts":
+        pos_scores = Counter()
+        for lemma, positions in index.lemma_positions.items():
+            for position in positions:
+                token = index.doc[position]
+                if token.pos_ in ['NOUN', 'PROPN']: pos_scores[lemma] += 3.0
+                elif token.pos_ == 'ADJ': pos_scores[lemma] += 2.0
+                elif token.pos_ == 'VERB': pos_scores[lemma] += 1.5
+                else: pos_scores[lemma] += 1.0
+                if len(token.text) > 7: pos_scores[lemma] += 0.5
+        lemma_frequency = Counter({lemma: len(positions) for lemma, positions in index.lemma_positions.items()})
+        return cls(lemma_frequency, pos_scores, index.content_tokens, index.terms())
+
+    @classmethod
+    def merge(cls, parts: Iterable["KeywordCounts"]) -> "KeywordCounts":
+        """Counts of the concatenation of the texts ``parts`` were computed from."""
+        lemma_frequency, pos_scores, content_tokens, terms = Counter(), Counter(), 0, set()
+        for part in parts:
+            lemma_frequency.update(part.lemma_frequency)
+            pos_scores.update(part.pos_scores)
+            content_tokens += part.content_tokens
+            terms |= part.terms
+        return cls(lemma_frequency, pos_scores, content_tokens, terms)
+
 
 class KeywordExtractor:
-    def __init__(self):
-        self.yake_extractor = yake.KeywordExtractor(
-            lan="en", n=3, dedupLim=0.7, top=20
-        )
-
-    def extract_keywords(self, text: str, doc) -> Dict[str, Any]:
-        spacy_keywords = self._extract_spacy_keywords(doc)
-        yake_keywords = self._extract_yake_keywords(text)
-        enhanced_entities = self._extract_enhanced_entities(doc)
-        advanced_phrases = self._extract_dependency_phrases(doc)
+    YAKE_BACKENDS = ('native', 'library')
+
+    def __init__(self, yake_backend: str = 'native', corpus_idf: Optional[CorpusIDFIndex] = None):
+        """
+        Args:
+            yake_backend: 'native' scores YAKE keywords on the spaCy Doc; 'library' runs the yake
+                          package over the raw text (optional dependency, kept for comparison)
+            corpus_idf: Document frequencies of previously analyzed documents; words common across
+                        the corpus are down-weighted (no weighting when omitted)
+        """
+        self.corpus_idf = corpus_idf
+        if yake_backend not in self.YAKE_BACKENDS:
+            raise ValueError(f"Unknown YAKE backend '{yake_backend}', expected one of {self.YAKE_BACKENDS}")
+        self.yake_backend = yake_backend
+        if yake_backend == 'library':
+            import yake
+            self.yake_extractor = yake.KeywordExtractor(
+                lan="en", n=3, dedupLim=0.7, top=20
+            )
+        else:
+            self.yake_extractor = YakeKeywordScorer(n=3, dedup_lim=0.7, top=20)
+
+    def extract_keywords(self, text: str, doc, index: Optional[KeywordIndex] = None,
+                         counts: Optional[KeywordCounts] = None) -> Dict[str, Any]:
+        index = index or KeywordIndex(doc)
+        counts = counts or KeywordCounts.from_index(index)
+        spacy_keywords = self._extract_spacy_keywords(counts)
+        yake_keywords = self._extract_yake_keywords(text, doc, index)
+        enhanced_entities = self._extract_enhanced_entities(doc, index)
+        advanced_phrases = self._extract_dependency_phrases(doc, index)
         combined_keywords = self._combine_keyword_results(spacy_keywords, yake_keywords)
         
         return {
@@ -23,31 +160,33 @@ class KeywordExtractor:
             "named_entities": enhanced_entities[:10]
         }
     
-    def _extract_spacy_keywords(self, doc) -> List[Dict[str, Any]]:
-        tokens = [token for token in doc if not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2]
-        word_freq = Counter()
-        word_pos_scores = defaultdict(float)
-        for token in tokens:
-            lemma = token.lemma_.lower()
-            word_freq[lemma] += 1
-            if token.pos_ in ['NOUN', 'PROPN']: word_pos_scores[lemma] += 3.0
-            elif token.pos_ == 'ADJ': word_pos_scores[lemma] += 2.0
-            elif token.pos_ == 'VERB': word_pos_scores[lemma] += 1.5
-            else: word_pos_scores[lemma] += 1.0
-            if len(token.text) > 7: word_pos_scores[lemma] += 0.5
+    def _extract_spacy_keywords(self, counts: KeywordCounts) -> List[Dict[str, Any]]:
+        word_freq = counts.lemma_frequency
+        word_pos_scores = counts.pos_scores
+        lemmas = list(word_freq)
+        if self.corpus_idf is not None:
+            idf = dict(zip(lemmas, self.corpus_idf.idf_vector(lemmas).tolist()))
+        else:
+            idf = dict.fromkeys(lemmas, 1.0)
+        # Relative to the document's mean IDF, so weights stay on the same scale as the YAKE ones they are merged with
+        mean_idf = sum(idf.values()) / len(idf) if idf else 1.0
+        idf_weight = {lemma: value / mean_idf for lemma, value in idf.items()}
         keywords = []
-        for word, freq in word_freq.most_common(20):
-            relevance = (freq * word_pos_scores[word]) / len(tokens)
+        # Ranked by TF-IDF against the corpus seen so far (plain frequency while it is empty)
+        for word in sorted(lemmas, key=lambda lemma: word_freq[lemma] * idf[lemma], reverse=True)[:20]:
+            freq = word_freq[word]
+            relevance = (freq * word_pos_scores[word] * idf_weight[word]) / counts.content_tokens
             keywords.append({
                 "word": word, "frequency": freq, "relevance": round(relevance, 4),
-                "weight": round(math.log(freq + 1) * word_pos_scores[word], 3),
-                "pos_score": round(word_pos_scores[word], 2)
+                "weight": round(math.log(freq + 1) * word_pos_scores[word] * idf_weight[word], 3),
+                "pos_score": round(word_pos_scores[word], 2),
+                "idf": round(idf[word], 3)
             })
         return keywords
     
-    def _extract_yake_keywords(self, text: str) -> List[Dict[str, Any]]:
+    def _extract_yake_keywords(self, text: str, doc, index: KeywordIndex) -> List[Dict[str, Any]]:
         try:
-            yake_results = self.yake_extractor.extract_keywords(text)
+            yake_results = self.yake_extractor.extract_keywords(doc if self.yake_backend == 'native' else text)
 
             keywords = []
             for keyword, score in yake_results[:15]:
@@ -57,7 +196,7 @@ class KeywordExtractor:
 
                 relevance = 1 / (1 + score)
                 word = keyword.lower()
-                freq = len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', text.lower()))
+                freq = index.phrase_frequency(word)
                 
                 keywords.append({
                     "word": word,
@@ -76,7 +215,8 @@ class KeywordExtractor:
         for kw in spacy_keywords:
             word = kw['word']
             combined[word] = {"word": word, "frequency": kw['frequency'], "relevance": kw['relevance'],
-                            "weight": kw['weight'], "sources": ['spacy'], "spacy_score": kw['relevance']}
+                            "weight": kw['weight'], "sources": ['spacy'], "spacy_score": kw['relevance'],
+                            "idf": kw['idf']}
         for kw in yake_keywords:
             word = kw['word']
             if word in combined:
@@ -96,12 +236,15 @@ class KeywordExtractor:
             item['sources'] = ', '.join(item['sources'])
             if 'spacy_score' not in item: item['spacy_score'] = 0
             if 'yake_score' not in item: item['yake_score'] = 0
+            # YAKE terms are surface n-grams, not the lemmas counted in the corpus index: neutral weight
+            if 'idf' not in item: item['idf'] = 1.0
         return result
     
-    def _extract_dependency_phrases(self, doc) -> List[Dict[str, Any]]:
+    def _extract_dependency_phrases(self, doc, index: KeywordIndex) -> List[Dict[str, Any]]:
         phrases = []
         phrase_freq = Counter()
-        for chunk in doc.noun_chunks:
+        n_chunks = len(index.noun_chunks)
+        for chunk in index.noun_chunks:
             if len(chunk.text.split()) >= 2 and not all(token.is_stop for token in chunk):
                 phrase = chunk.text.lower().strip()
                 if phrase and len(phrase) > 4: phrase_freq[phrase] += 1
@@ -117,18 +260,20 @@ class KeywordExtractor:
         for phrase, freq in phrase_freq.most_common(10):
             phrases.append({
                 "phrase": phrase, "frequency": freq,
-                "relevance": round(freq / len(list(doc.noun_chunks)), 4) if list(doc.noun_chunks) else 0,
+                "relevance": round(freq / n_chunks, 4) if n_chunks else 0,
                 "type": "compound" if len(phrase.split()) > 2 else "simple"
             })
         return phrases
     
-    def _extract_enhanced_entities(self, doc) -> List[Dict[str, Any]]:
+    def _extract_enhanced_entities(self, doc, index: KeywordIndex) -> List[Dict[str, Any]]:
         entities = []
         entity_freq = Counter()
-        entity_contexts = defaultdict(list)
+        # Sentence indices of the first two mentions; context text is only sliced for reported entities
+        entity_sentences = defaultdict(list)
         for ent in doc.ents:
             entity_freq[(ent.text, ent.label_)] += 1
-            entity_contexts[ent.text].append(ent.sent.text[:100] + "...")
+            if len(entity_sentences[ent.text]) < 2:
+                entity_sentences[ent.text].append(index.sentence_index(ent.start))
         for (entity, label), freq in entity_freq.most_common(15):
             confidence = 0.5 + min(0.3, freq * 0.1)
             if label in ['PERSON', 'ORG', 'GPE']: confidence += 0.2
@@ -137,6 +282,6 @@ class KeywordExtractor:
             entities.append({
                 "entity": entity, "type": label, "frequency": freq,
                 "confidence": round(min(0.95, confidence), 3),
-                "contexts": entity_contexts[entity][:2]
+                "contexts": [index.sentence_text(i, max_chars=100) + "..." for i in entity_sentences[entity]]
             })
         return entities
\ No newline at end of file
@@ -1,48 +1,68 @@
-import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from spacy.strings import hash_string
+from spacy.symbols import PRON, PROPN, VERB
+
+from models.lexicon_index import LexiconIndex
+from models.analysis_context import AnalysisContext, F_DEP, F_HEAD, F_LEMMA, F_LENGTH, F_POS
+
 
 class LanguageAnalyzer:
-    def __init__(self, emotion_words):
-        self.emotion_words = emotion_words
+    FORMAL_INDICATORS = {'therefore', 'however', 'moreover', 'furthermore', 'consequently', 'nevertheless', 'nonetheless'}
+    ACADEMIC_INDICATORS = {'research', 'study', 'analysis', 'data', 'findings', 'conclusion', 'hypothesis', 'methodology'}
+    PERSONAL_PRONOUNS = {'i', 'me', 'my', 'we', 'us', 'our'}
+
+    def __init__(self, lexicon_index: LexiconIndex):
+        # Register the style lexicons on the shared index (emotion lexicons come from SentimentAnalyzer)
+        self.lexicon_index = lexicon_index
+        self.lexicon_index.add('style:formal', self.FORMAL_INDICATORS, field='lemma')
+        self.lexicon_index.add('style:academic', self.ACADEMIC_INDICATORS, field='lemma')
+        self.lexicon_index.compile()
 
-    def analyze_language_patterns(self, text: str, sentences: List[str], doc) -> Dict[str, Any]:
+        # Hash IDs for membership tests on the LEMMA and DEP columns (lemmas are matched case-insensitively)
+        self._pronoun_lemma_ids = np.array(sorted({
+            hash_string(variant) for word in self.PERSONAL_PRONOUNS
+            for variant in (word, word.capitalize(), word.upper())
+        }), dtype=np.uint64)
+        self._auxpass_id = np.uint64(hash_string('auxpass'))
+        self._agent_id = np.uint64(hash_string('agent'))
+
+    def analyze_language_patterns(self, text: str, sentences: List[str], doc,
+                                  context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        context = context or AnalysisContext(text, doc, sentences, lexicon_index=self.lexicon_index)
+        lexicon_matches = context.lexicon_matches
     
-        words = [token for token in doc if token.is_alpha and not token.is_punct]
-        num_words = len(words)
+        # One (n_tokens, n_attrs) matrix; every metric below is a reduction over its columns
+        features = context.token_features
+        is_word = context.word_mask
+        pos = features[:, F_POS]
+        dep = features[:, F_DEP]
+        num_words = int(is_word.sum())
         num_sentences = len(sentences) if len(sentences) > 0 else 1 # Avoid division by zero
-        
-        def count_syllables_simple(word):
-            word = word.lower()
-            if not word: return 0
-            count = 0
-            vowels = "aeiouy"
-            word = re.sub(r"([aeiouy])e\b", r"\1", word)
-            word = re.sub(r"[^aeiouy]+", "#", word)
-            word = re.sub(r"[aeiouy]{2,}", "!", word)
-            count = len(word.replace("#", ""))
-            return max(1, count)
-        
-        syllable_counts = [count_syllables_simple(token.text) for token in words]
-        avg_syllables_per_word = sum(syllable_counts) / num_words if num_words else 0
-        polysyllabic_words = sum(1 for count in syllable_counts if count >= 3)
-        
-        technical_terms = sum(1 for token in words if len(token.text) > 7 or token.pos_ in ['PROPN'])
-        
-        passive_count = sum(1 for token in doc if token.dep_ == 'auxpass' or (token.dep_ == 'agent' and token.head.pos_ == 'VERB'))
+
+        # Syllables are counted once per distinct lowercase word (shared with the readability formulas)
+        syllable_counts = context.word_syllables
+        avg_syllables_per_word = float(syllable_counts.mean()) if num_words else 0
+        polysyllabic_words = int((syllable_counts >= 3).sum())
+
+        technical_terms = int((is_word & ((features[:, F_LENGTH] > 7) | (pos == PROPN))).sum())
+
+        # HEAD holds the signed offset to the head token
+        head_index = np.arange(len(doc)) + features[:, F_HEAD].view(np.int64)
+        passive = (dep == self._auxpass_id) | ((dep == self._agent_id) & (pos[head_index] == VERB))
+        passive_count = int(passive.sum())
         passive_percentage = (passive_count / num_sentences) * 100 if num_sentences else 0
         
-        formal_indicators = {'therefore', 'however', 'moreover', 'furthermore', 'consequently', 'nevertheless', 'nonetheless'}
-        academic_indicators = {'research', 'study', 'analysis', 'data', 'findings', 'conclusion', 'hypothesis', 'methodology'}
-        
-        formal_count = sum(1 for token in doc if token.lemma_.lower() in formal_indicators)
-        academic_count = sum(1 for token in doc if token.lemma_.lower() in academic_indicators)
+        formal_count = lexicon_matches.count('style:formal')
+        academic_count = lexicon_matches.count('style:academic')
         
         formal_score = formal_count / num_words if num_words else 0
         academic_score = academic_count / num_words if num_words else 0
         
-        personal_pronouns = sum(1 for token in doc if token.pos_ == 'PRON' and token.lemma_.lower() in ['i', 'me', 'my', 'we', 'us', 'our'])
+        personal_pronouns = int(((pos == PRON) & np.isin(features[:, F_LEMMA], self._pronoun_lemma_ids)).sum())
         
-        emotional_words_count = sum(1 for token in doc for emotion_set in self.emotion_words.values() if token.lemma_.lower() in emotion_set)
+        emotional_words_count = lexicon_matches.total('emotion:')
         
         subjectivity_indicators = personal_pronouns + emotional_words_count
         objectivity_score = max(0, 1 - (subjectivity_indicators / num_words)) if num_words else 0
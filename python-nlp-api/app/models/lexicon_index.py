@@ -0,0 +1,144 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class _PhraseAutomaton:
+    """Token-level Aho-Corasick automaton over multi-word phrases.
+
+    Transitions are keyed on whole words rather than characters, so every match
+    is word-boundary correct by construction ("mad" never matches inside "made").
+    """
+
+    __slots__ = ('_goto', '_fail', '_output')
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, int]]] = [[]]
+
+    def add(self, phrase: str, category: str):
+        words = phrase.lower().split()
+        if not words:
+            return
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((category, len(words)))
+
+    def compile(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            current = queue.popleft()
+            for word, child in self._goto[current].items():
+                queue.append(child)
+                fallback = self._fail[current]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def step(self, state: int, word: str) -> int:
+        goto = self._goto
+        while state and word not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(word, 0)
+
+    def outputs(self, state: int) -> List[Tuple[str, int]]:
+        return self._output[state]
+
+
+class LexiconMatches:
+    """Per-category match counts and character spans from a single document scan."""
+
+    __slots__ = ('positions',)
+
+    def __init__(self):
+        self.positions: Dict[str, List[Tuple[int, int]]] = {}
+
+    def count(self, category: str) -> int:
+        return len(self.positions.get(category, ()))
+
+    def total(self, prefix: str) -> int:
+        """Sum of counts over every category whose name starts with ``prefix``."""
+        return sum(len(spans) for category, spans in self.positions.items() if category.startswith(prefix))
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return {category: len(spans) for category, spans in self.positions.items()}
+
+
+class LexiconIndex:
+    """Precompiled multi-pattern index over every lexicon used by the analyzers.
+
+    Each category is matched against one token field: ``'lower'`` (the lowercased
+    surface form) or ``'lemma'`` (the lowercased lemma). A category may be registered
+    on both fields; a span matched by both then counts once. A call to ``scan_doc`` walks
+    the spaCy ``Doc`` once and advances one automaton per field in lockstep.
+    """
+
+    FIELDS = ('lower', 'lemma')
+
+    def __init__(self):
+        self._lexicons: Dict[str, Dict[str, Tuple[str, ...]]] = {field: {} for field in self.FIELDS}
+        self._automata: Dict[str, _PhraseAutomaton] = {}
+        self._compiled = False
+
+    def add(self, category: str, phrases: Iterable[str], field: str = 'lower'):
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown lexicon field '{field}', expected one of {self.FIELDS}")
+        self._lexicons[field][category] = tuple(phrases)
+        self._compiled = False
+
+    def compile(self):
+        """Build the automata. Called at startup; ``scan_doc`` compiles lazily otherwise."""
+        self._automata = {}
+        for field, lexicons in self._lexicons.items():
+            if not lexicons:
+                continue
+            automaton = _PhraseAutomaton()
+            for category, phrases in lexicons.items():
+                for phrase in phrases:
+                    automaton.add(phrase, category)
+            automaton.compile()
+            self._automata[field] = automaton
+        self._compiled = True
+
+    def scan_doc(self, doc) -> LexiconMatches:
+        """Match every lexicon against ``doc`` in one pass over its tokens."""
+        if not self._compiled:
+            self.compile()
+
+        matches = LexiconMatches()
+        positions = matches.positions
+        automata = list(self._automata.items())
+        states = {field: 0 for field, _ in automata}
+        # Character spans of the tokens fed so far, used to recover phrase starts
+        spans: List[Tuple[int, int]] = []
+
+        for token in doc:
+            if token.is_space:
+                continue
+            spans.append((token.idx, token.idx + len(token.text)))
+            end_index = len(spans) - 1
+            for field, automaton in automata:
+                word = token.lower_ if field == 'lower' else token.lemma_.lower()
+                state = automaton.step(states[field], word)
+                states[field] = state
+                for category, length in automaton.outputs(state):
+                    span = (spans[end_index - length + 1][0], spans[end_index][1])
+                    category_spans = positions.setdefault(category, [])
+                    # Fields are stepped per token, so a span matched on both fields is the last one added
+                    if not category_spans or category_spans[-1] != span:
+                        category_spans.append(span)
+
+        return matches
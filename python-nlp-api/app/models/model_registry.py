@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def estimate_model_bytes(obj: Any) -> int:
+    """
+    Approximate resident size of a loaded model.
+
+    Understands torch modules (parameters + buffers), ONNX Runtime models (size of the
+    model file), pipelines/summarizers (via their ``.model``) and tuples or dicts of those.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_bytes(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_model_bytes(item) for item in obj.values())
+
+    model_path = getattr(obj, 'model_path', None)
+    if model_path is not None and os.path.isfile(str(model_path)):
+        return os.path.getsize(str(model_path))
+
+    if callable(getattr(obj, 'parameters', None)) and callable(getattr(obj, 'buffers', None)):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    if hasattr(obj, 'model'):
+        return estimate_model_bytes(obj.model)
+    return 0
+
+
+class ModelUnavailableError(RuntimeError):
+    """A model's last load failed and it is not retried until its backoff expires."""
+
+
+class ModelRegistry:
+    """
+    Loads models on demand and keeps the resident set under a memory cap.
+
+    Models are registered with a loader and only built on the first ``get``. After each
+    load, least recently used models are evicted until the estimated resident size fits
+    ``memory_cap_bytes``. Callers that still hold a reference to an evicted model can
+    finish with it; the registry just stops keeping it alive.
+
+    A failed load is remembered: until ``retry_after_seconds`` have passed (forever when
+    None), ``get`` raises ModelUnavailableError at once instead of calling the loader
+    again, so an offline or broken model costs one hub timeout, not one per access.
+    """
+
+    def __init__(self, memory_cap_bytes: Optional[int] = None, max_events: int = 100,
+                 retry_after_seconds: Optional[float] = 300.0):
+        """
+        Args:
+            memory_cap_bytes: Estimated resident size to stay under (unbounded when None)
+            max_events: Load/evict events kept for ``stats``
+            retry_after_seconds: Backoff before a model whose load failed is tried again (None: never)
+        """
+        self.memory_cap_bytes = memory_cap_bytes
+        self.retry_after_seconds = retry_after_seconds
+        # key -> (time of the failed load, error message)
+        self._failures: Dict[str, Tuple[float, str]] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._size_fns: Dict[str, Callable[[Any], int]] = {}
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {'loads': 0, 'evictions': 0, 'load_failures': 0, 'load_seconds': 0.0}
+        self._events = deque(maxlen=max_events)
+
+    def register(self, key: str, loader: Callable[[], Any], size_fn: Optional[Callable[[Any], int]] = None):
+        """Register a loader under ``key``. Re-registering an existing key is a no-op."""
+        with self._lock:
+            if key in self._loaders:
+                return
+            self._loaders[key] = loader
+            self._size_fns[key] = size_fn or estimate_model_bytes
+            self._load_locks[key] = threading.Lock()
+
+    def is_registered(self, key: str) -> bool:
+        return key in self._loaders
+
+    def get(self, key: str) -> Any:
+        """
+        Return the model for ``key``, loading it (and evicting others) if needed.
+
+        Raises:
+            ModelUnavailableError: The last load of ``key`` failed and its backoff has not expired
+        """
+        with self._lock:
+            if key not in self._loaders:
+                raise KeyError(f"Model '{key}' is not registered")
+            if key in self._resident:
+                self._resident.move_to_end(key)
+                return self._resident[key]
+            self._check_failure(key)
+            load_lock = self._load_locks[key]
+
+        # Load outside the registry lock so other models stay available meanwhile
+        with load_lock:
+            with self._lock:
+                if key in self._resident:
+                    self._resident.move_to_end(key)
+                    return self._resident[key]
+                # A concurrent caller may have just failed to load it
+                self._check_failure(key)
+
+            start = time.perf_counter()
+            try:
+                model = self._loaders[key]()
+            except Exception as e:
+                with self._lock:
+                    self._failures[key] = (time.monotonic(), str(e))
+                    self._stats['load_failures'] += 1
+                    self._record('load_failed', key)
+                raise
+            elapsed = time.perf_counter() - start
+            size = self._size_fns[key](model)
+
+            with self._lock:
+                self._failures.pop(key, None)
+                self._resident[key] = model
+                self._sizes[key] = size
+                self._stats['loads'] += 1
+                self._stats['load_seconds'] += elapsed
+                self._record('load', key, size, elapsed)
+                self._evict_over_cap(keep=key)
+            return model
+
+    def _check_failure(self, key: str):
+        """Raise ModelUnavailableError if ``key`` failed to load within the backoff (under the lock)."""
+        failure = self._failures.get(key)
+        if failure is None:
+            return
+        failed_at, error = failure
+        if self.retry_after_seconds is None or time.monotonic() - failed_at < self.retry_after_seconds:
+            raise ModelUnavailableError(f"Model '{key}' is unavailable (last load failed: {error})")
+        del self._failures[key]
+
+    def evict(self, key: str):
+        with self._lock:
+            if key in self._resident:
+                self._drop(key)
+
+    def _evict_over_cap(self, keep: str):
+        if self.memory_cap_bytes is None:
+            return
+        for candidate in list(self._resident):
+            if self.resident_bytes() <= self.memory_cap_bytes:
+                break
+            if candidate != keep:
+                self._drop(candidate)
+
+    def _drop(self, key: str):
+        self._resident.pop(key)
+        size = self._sizes.pop(key, 0)
+        self._stats['evictions'] += 1
+        self._record('evict', key, size)
+
+    def _record(self, event: str, key: str, size: int = 0, seconds: float = 0.0):
+        self._events.append({
+            'event': event, 'model': key, 'bytes': size,
+            'seconds': round(seconds, 3), 'timestamp': round(time.time(), 3)
+        })
+
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['load_seconds'] = round(stats['load_seconds'], 3)
+            stats['resident_models'] = dict(self._sizes)
+            stats['resident_bytes'] = self.resident_bytes()
+            stats['memory_cap_bytes'] = self.memory_cap_bytes
+            stats['unavailable_models'] = sorted(self._failures)
+            stats['recent_events'] = list(self._events)
+        return stats
+
+    @staticmethod
+    def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """Loads and evictions between two ``stats()`` snapshots (e.g. for one request)."""
+        return {
+            'loads': after['loads'] - before['loads'],
+            'evictions': after['evictions'] - before['evictions'],
+            'load_seconds': round(after['load_seconds'] - before['load_seconds'], 3)
+        }
@@ -0,0 +1,206 @@
+import copy
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sklearn.utils import murmurhash3_32
+
+_WORD = re.compile(r'\w+')
+# Largest prime below 2**32: hash values stay within uint32 and (a * x + b) within uint64
+_PRIME = np.uint64(4294967291)
+# Shingles hashed at a time, so every (num_perm x block) temporary stays small on long documents
+_SIGNATURE_BLOCK = 8192
+
+
+class NearDuplicateMatch(NamedTuple):
+    document_id: int
+    similarity: float
+    analyzed_at: int
+    results: Dict[str, Any]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index of analyzed documents, for reusing the analysis of near-duplicates.
+
+    A document is reduced to the set of its word ``shingle_size``-grams (lowercased),
+    and that set to ``num_perm`` MinHash values whose agreement rate estimates the
+    Jaccard similarity of two documents. Signatures are split into ``bands`` bands;
+    documents sharing any band hash are candidates, and a candidate whose estimated
+    similarity reaches ``threshold`` is a match. A new date line or a few fixed typos
+    only change the shingles around them, so such edits still match.
+
+    Signatures, band hashes and pickled results live in SQLite (``path``, or in memory
+    when None). Results are only reused for the same analysis options (``options_key``),
+    and the oldest documents are dropped beyond ``max_documents``.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 5, max_documents: int = 10000):
+        """
+        Args:
+            path: SQLite file holding the index (in memory only when None); reused if it exists
+            threshold: Minimum estimated Jaccard similarity of shingle sets to reuse an analysis
+            num_perm: MinHash values per document
+            bands: LSH bands (``num_perm`` must be a multiple); more bands find less similar candidates
+            shingle_size: Words per shingle
+            max_documents: Documents kept before the oldest are evicted
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_documents = max_documents
+
+        # Fixed seed, so signatures stay comparable across restarts
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=num_perm, dtype=np.int64).astype(np.uint64)
+
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'matches': 0, 'added': 0, 'evicted': 0}
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY, options_key TEXT, signature BLOB, results BLOB, analyzed_at INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS bands (band INTEGER, hash INTEGER, document_id INTEGER);
+            CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, hash);
+            CREATE INDEX IF NOT EXISTS bands_document ON bands (document_id);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def options_key(**options) -> str:
+        """Stable key of the request options an analysis depends on."""
+        return hashlib.blake2b(repr(sorted(options.items())).encode('utf-8'), digest_size=16).hexdigest()
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Distinct hashes of the word shingles of ``text`` (the whole text when it is shorter than one)."""
+        words = _WORD.findall(text.lower())
+        k = self.shingle_size
+        grams = [' '.join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))]
+        return np.unique(np.fromiter((murmurhash3_32(gram, positive=True) for gram in grams),
+                                     dtype=np.uint64, count=len(grams)))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of the shingle set of ``text``."""
+        shingles = self.shingles(text)
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        # One universal hash (a * x + b) mod p per permutation, minimized over the shingles block by block
+        for start in range(0, len(shingles), _SIGNATURE_BLOCK):
+            hashed = self._a[:, None] * shingles[None, start:start + _SIGNATURE_BLOCK]
+            hashed += self._b[:, None]
+            hashed %= _PRIME
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_hashes(self, signature: np.ndarray) -> List[int]:
+        return [
+            int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+            for band in signature.reshape(self.bands, self.rows)
+        ]
+
+    def find(self, text: str, options_key: str) -> Optional[NearDuplicateMatch]:
+        """The most similar indexed document analyzed with the same options, if it reaches the threshold."""
+        signature = self.signature(text)
+        band_hashes = self._band_hashes(signature)
+        with self._lock:
+            self._stats['lookups'] += 1
+            rows = self._db.execute(
+                "SELECT DISTINCT d.id, d.signature FROM bands b JOIN documents d ON d.id = b.document_id "
+                "WHERE d.options_key = ? AND (" + " OR ".join(["(b.band = ? AND b.hash = ?)"] * self.bands) + ")",
+                [options_key] + [value for band, band_hash in enumerate(band_hashes) for value in (band, band_hash)]
+            ).fetchall()
+            if not rows:
+                return None
+
+            candidates = np.vstack([np.frombuffer(blob, dtype=np.uint32) for _, blob in rows])
+            similarities = (candidates == signature).mean(axis=1)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            document_id = rows[best][0]
+            results_blob, analyzed_at = self._db.execute(
+                "SELECT results, analyzed_at FROM documents WHERE id = ?", (document_id,)
+            ).fetchone()
+            self._stats['matches'] += 1
+        return NearDuplicateMatch(document_id, round(float(similarities[best]), 3), analyzed_at,
+                                  pickle.loads(results_blob))
+
+    def add(self, text: str, options_key: str, results: Dict[str, Any]) -> int:
+        """Index ``text`` with its analysis results; returns the new document id."""
+        signature = self.signature(text)
+        band_hashes = self._band_hashes(signature)
+        payload = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO documents (options_key, signature, results, analyzed_at) VALUES (?, ?, ?, ?)",
+                (options_key, signature.tobytes(), payload, round(time.time()))
+            )
+            document_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO bands (band, hash, document_id) VALUES (?, ?, ?)",
+                [(band, band_hash, document_id) for band, band_hash in enumerate(band_hashes)]
+            )
+            self._stats['added'] += 1
+            self._evict()
+            self._db.commit()
+        return document_id
+
+    def _evict(self):
+        """Drop the oldest documents beyond max_documents (under the lock)."""
+        (count,) = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+        excess = count - self.max_documents
+        if excess <= 0:
+            return
+        oldest = [row[0] for row in self._db.execute(
+            "SELECT id FROM documents ORDER BY id LIMIT ?", (excess,)
+        )]
+        placeholders = ",".join("?" * len(oldest))
+        self._db.execute(f"DELETE FROM bands WHERE document_id IN ({placeholders})", oldest)
+        self._db.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", oldest)
+        self._stats['evicted'] += len(oldest)
+
+    @staticmethod
+    def approximate_results(match: NearDuplicateMatch, exact: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Copy of a matched document's results, marked as approximate for the current document.
+
+        Args:
+            match: The near-duplicate found by ``find``
+            exact: Sections already computed for the current document (e.g. its preprocessing
+                   report and text stats); they replace the matched document's, and only the
+                   remaining analysis sections are listed as approximate
+        """
+        results = copy.deepcopy(match.results)
+        results.update(exact or {})
+        results["approximate"] = True
+        results["near_duplicate"] = {
+            "document_id": match.document_id,
+            "similarity": match.similarity,
+            "analyzed_at": match.analyzed_at,
+            "approximate_sections": sorted(
+                key for key, value in match.results.items()
+                if isinstance(value, dict) and key not in (exact or {}) and key != "metrics"
+            )
+        }
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            (stats['documents'],) = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+        stats['threshold'] = self.threshold
+        stats['persistent'] = self.path is not None
+        return stats
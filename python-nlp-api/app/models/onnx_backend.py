@@ -0,0 +1,79 @@
+import os
+from typing import Optional
+
+from transformers import AutoTokenizer, pipeline
+
+# Exported and quantized models are written here once and reused on later startups
+DEFAULT_ONNX_CACHE_DIR = os.environ.get(
+    "NLP_ONNX_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".onnx_cache")
+)
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+
+def _model_dir(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def export_quantized_model(model_name: str, cache_dir: str = DEFAULT_ONNX_CACHE_DIR) -> str:
+    """
+    Export a sequence-classification model to ONNX and apply dynamic int8 quantization.
+
+    The export is skipped when a quantized model already exists in ``cache_dir``.
+
+    Returns:
+        Directory containing the quantized model and its tokenizer files
+    """
+    # Optional dependency: only needed when the ONNX backend is selected
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    output_dir = _model_dir(cache_dir, model_name)
+    if os.path.exists(os.path.join(output_dir, QUANTIZED_FILE_NAME)):
+        return output_dir
+
+    export_dir = os.path.join(output_dir, "fp32")
+    ort_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    ort_model.save_pretrained(export_dir)
+
+    # Dynamic quantization needs no calibration data: weights are int8, activations quantized at runtime
+    quantizer = ORTQuantizer.from_pretrained(export_dir)
+    quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config)
+
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    return output_dir
+
+
+def load_onnx_pipeline(task: str, model_name: str, intra_op_threads: Optional[int] = None,
+                       cache_dir: str = DEFAULT_ONNX_CACHE_DIR, **pipeline_kwargs):
+    """
+    Build a transformers pipeline backed by a quantized ONNX Runtime session.
+
+    Args:
+        task: Pipeline task, e.g. "sentiment-analysis" or "text-classification"
+        model_name: Hugging Face model identifier
+        intra_op_threads: Threads ONNX Runtime may use inside one operator (None = runtime default)
+        cache_dir: Where exported models are stored
+
+    Returns:
+        A pipeline with the same call signature and output format as the PyTorch one
+    """
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    model_dir = export_quantized_model(model_name, cache_dir)
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_threads:
+        session_options.intra_op_num_threads = intra_op_threads
+
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir,
+        file_name=QUANTIZED_FILE_NAME,
+        session_options=session_options,
+        provider="CPUExecutionProvider"
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline(task, model=model, tokenizer=tokenizer, **pipeline_kwargs)
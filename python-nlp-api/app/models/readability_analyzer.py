@@ -1,108 +1,94 @@
-import torch
-from transformers import AutoTokenizer, AutoModel
 import numpy as np
 import warnings
 from typing import Dict, List, Any, Optional
+from models.model_registry import ModelRegistry
+from models.sentence_embeddings import SentenceEmbeddingService, SentenceEncoding
+from models.sentence_index import SentenceIndex
+from models.analysis_context import AnalysisContext
 
 warnings.filterwarnings('ignore')
 
+
 class ReadabilityPredictor:
     """Analyzes text complexity using Transformer embeddings combined with traditional readability metrics."""
+
+    # Sentence encoders that may be selected per request
+    ENCODER_MODELS = SentenceEmbeddingService.ENCODER_MODELS
     
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/paraphrase-MiniLM-L6-v2",
+                 model_registry: Optional[ModelRegistry] = None,
+                 embedding_service: Optional[SentenceEmbeddingService] = None):
+        """
+        Args:
+            model_name: Default sentence encoder
+            model_registry: Shared registry that loads the encoders on demand (when no service is given)
+            embedding_service: Shared sentence-embedding service; its sentence-aligned chunks of up
+                               to MAX_TOKENS tokens are scored separately, from the same forward pass
+                               that yields the request's sentence vectors
+        """
         self.model_name = model_name
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModel.from_pretrained(model_name)
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            self.model.to(self.device)
-        except Exception as e:
-            self.tokenizer = None
-            self.model = None
-            raise Exception(f"Failed to load model {model_name}: {e}")
+        self.embedding_service = embedding_service or SentenceEmbeddingService(
+            model_registry=model_registry, default_model=model_name
+        )
 
-    def _mean_pooling(self, model_output, attention_mask):
-        """Apply mean pooling to get sentence embeddings."""
-        token_embeddings = model_output[0]
-        input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-        return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+    def _extract_embedding_features_batch(self, encodings: List[SentenceEncoding]) -> List[Dict[str, float]]:
+        """
+        Embedding features of each chunk, from the encoding of the whole chunk.
 
-    def _chunk_text(self, text: str, max_tokens: int = 450) -> List[str]:
-        """Split text into chunks preserving sentence boundaries."""
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            test_chunk = current_chunk + sentence + ". "
-            tokens = self.tokenizer.encode(test_chunk, add_special_tokens=True)
-            
-            if len(tokens) <= max_tokens:
-                current_chunk = test_chunk
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
+        Every chunk went through the encoder in one contextual forward pass, so its token
+        statistics (variance, windowed token similarity) cover all of its tokens, across
+        sentence boundaries, exactly as a direct pass over the chunk would.
+        """
+        token_sums = np.vstack([e.token_sum for e in encodings])
+        token_sq_sums = np.vstack([e.token_sq_sum for e in encodings])
+        n_tokens = np.maximum([e.n_tokens for e in encodings], 1)[:, None]
+        similarity = np.array([[e.similarity_sum, e.similarity_sq_sum, e.similarity_count] for e in encodings],
+                              dtype=np.float64)
 
-    def _extract_embedding_features(self, text: str) -> Dict[str, float]:
-        """Extract various features from text embeddings."""
-        encoded_input = self.tokenizer(
-            text, 
-            padding=True, 
-            truncation=True, 
-            return_tensors='pt', 
-            max_length=512
-        ).to(self.device)
+        token_means = token_sums / n_tokens
+        chunk_embeddings = np.vstack([e.vector for e in encodings]).astype(np.float64)
+        embedding_std = chunk_embeddings.std(axis=1)
+        embedding_magnitude = np.linalg.norm(chunk_embeddings, axis=1)
+        token_variance = np.maximum(token_sq_sums / n_tokens - token_means ** 2, 0.0).mean(axis=1)
+        entropy = self._calculate_entropy(chunk_embeddings)
+        pair_counts = np.maximum(similarity[:, 2], 1)
+        similarity_mean = similarity[:, 0] / pair_counts
+        similarity_variance = np.where(
+            similarity[:, 2] > 0, np.maximum(similarity[:, 1] / pair_counts - similarity_mean ** 2, 0.0), 0.0
+        )
 
-        with torch.no_grad():
-            model_output = self.model(**encoded_input)
+        return [{
+            'embedding_std': float(embedding_std[i]),
+            'embedding_mean_magnitude': float(embedding_magnitude[i]),
+            'token_embedding_variance': float(token_variance[i]),
+            'embedding_entropy': float(entropy[i]),
+            'token_similarity_variance': float(similarity_variance[i])
+        } for i in range(len(encodings))]
 
-        # Get sentence embedding
-        sentence_embedding = self._mean_pooling(model_output, encoded_input['attention_mask'])
-        sentence_embedding = torch.nn.functional.normalize(sentence_embedding, p=2, dim=1)
-        
-        # Get token-level embeddings for more detailed analysis
-        token_embeddings = model_output[0].cpu().numpy().squeeze()
-        sentence_emb_np = sentence_embedding.cpu().numpy().squeeze()
-        
-        # Calculate various complexity features
-        features = {
-            'embedding_std': sentence_emb_np.std(),
-            'embedding_mean_magnitude': np.linalg.norm(sentence_emb_np),
-            'token_embedding_variance': np.var(token_embeddings, axis=0).mean(),
-            'embedding_entropy': self._calculate_entropy(sentence_emb_np),
-            'token_similarity_variance': self._calculate_token_similarity_variance(token_embeddings)
-        }
-        
-        return features
+    def _calculate_entropy(self, embeddings: np.ndarray, bins: int = 50) -> np.ndarray:
+        """Calculate entropy of each embedding row as a complexity measure."""
+        # Discretize each row over its own range exactly as np.histogram(row, bins=50, density=True) does
+        n_rows, n_values = embeddings.shape
+        low = embeddings.min(axis=1)
+        high = embeddings.max(axis=1)
+        degenerate = low == high
+        low = np.where(degenerate, low - 0.5, low)
+        high = np.where(degenerate, high + 0.5, high)
+        edges = np.linspace(low, high, bins + 1, axis=1)
 
-    def _calculate_entropy(self, embedding: np.ndarray) -> float:
-        """Calculate entropy of embedding as a complexity measure."""
-        # Discretize embedding values for entropy calculation
-        hist, _ = np.histogram(embedding, bins=50, density=True)
-        hist = hist[hist > 0]  # Remove zero bins
-        return -np.sum(hist * np.log2(hist + 1e-10))
+        indices = ((embeddings - low[:, None]) * (bins / (high - low))[:, None]).astype(np.intp)
+        indices[indices == bins] -= 1
+        indices[embeddings < np.take_along_axis(edges, indices, axis=1)] -= 1
+        increment = (embeddings >= np.take_along_axis(edges, indices + 1, axis=1)) & (indices != bins - 1)
+        indices[increment] += 1
 
-    def _calculate_token_similarity_variance(self, token_embeddings: np.ndarray) -> float:
-        """Calculate variance in token similarity as complexity measure."""
-        if len(token_embeddings) < 2:
-            return 0.0
-        
-        # Calculate pairwise cosine similarities
-        similarities = []
-        for i in range(len(token_embeddings) - 1):
-            for j in range(i + 1, min(i + 10, len(token_embeddings))):  # Limit comparisons for efficiency
-                sim = np.dot(token_embeddings[i], token_embeddings[j]) / (
-                    np.linalg.norm(token_embeddings[i]) * np.linalg.norm(token_embeddings[j]) + 1e-10
-                )
-                similarities.append(sim)
-        
-        return np.var(similarities) if similarities else 0.0
+        flat_indices = (indices + np.arange(n_rows)[:, None] * bins).ravel()
+        counts = np.bincount(flat_indices, minlength=n_rows * bins).reshape(n_rows, bins)
+        hist = counts / (n_values * np.diff(edges, axis=1))
+
+        # Zero bins contribute nothing
+        terms = np.where(hist > 0, hist * np.log2(hist + 1e-10), 0.0)
+        return -terms.sum(axis=1)
 
     def _normalize_metric_score(self, score: float, metric_name: str) -> float:
         """Normalize traditional readability scores to 0-100 scale."""
@@ -186,8 +172,11 @@ class ReadabilityPredictor:
         for metric_name in metrics_to_use:
             if metric_name in readability_metrics:
                 metric_data = readability_metrics[metric_name]
-                if isinstance(metric_data, dict) and 'score' in metric_data:
-                    normalized_score = self._normalize_metric_score(metric_data['score'], metric_name)
+                # Accept both plain scores (API payload / server-side metrics) and {'score': ...} objects
+                if isinstance(metric_data, dict):
+                    metric_data = metric_data.get('score')
+                if isinstance(metric_data, (int, float)):
+                    normalized_score = self._normalize_metric_score(metric_data, metric_name)
                     traditional_scores.append(normalized_score)
                     traditional_weights.append(1.0)
         
@@ -218,7 +207,9 @@ class ReadabilityPredictor:
         else:
             return "Extremely difficult (academic/professional)"
 
-    def predict_difficulty(self, text: str, readability_metrics: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    def predict_difficulty(self, text: str, readability_metrics: Optional[Dict[str, int]] = None,
+                           model_name: Optional[str] = None,
+                           context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
         """
         Predict readability difficulty of text using both embeddings and traditional metrics.
         
@@ -226,17 +217,13 @@ class ReadabilityPredictor:
             text: Input text to analyze
             readability_metrics: Optional dictionary containing traditional readability metrics
                                 Format should match ReadabilityMetrics interface
+            model_name: Sentence encoder to use (defaults to the one given at construction)
+            context: The request's AnalysisContext, whose chunk pass is shared with the sentence
+                     vectors of topics and ranking (regex sentences are used when omitted)
         
         Returns:
             Dictionary with difficulty score, description, and processing details
         """
-        if not self.model or not self.tokenizer:
-            return {
-                'difficulty_score': 50.0,
-                'description': 'Model unavailable - using fallback',
-                'method': 'Fallback',
-            }
-
         if not text.strip():
             return {
                 'difficulty_score': 0.0,
@@ -244,20 +231,26 @@ class ReadabilityPredictor:
                 'method': 'Empty',
             }
 
-        # Determine if chunking is needed
-        tokens = self.tokenizer.encode(text, add_special_tokens=True)
-        
-        if len(tokens) <= 512:
-            embedding_features = self._extract_embedding_features(text)
-            chunk_scores = [self._combine_features(embedding_features, readability_metrics)]
-        else:
-            chunks = self._chunk_text(text)
-            chunk_scores = []
-            for chunk in chunks:
-                if chunk.strip():
-                    embedding_features = self._extract_embedding_features(chunk)
-                    score = self._combine_features(embedding_features, readability_metrics)
-                    chunk_scores.append(score)
+        model_name = self.embedding_service.resolve_model(model_name or self.model_name)
+        embeddings = context.sentence_embeddings if context is not None and context.text == text else None
+        if embeddings is None or embeddings.model_name != model_name:
+            sentences = SentenceIndex.from_text(text)
+            embeddings = self.embedding_service.for_request(
+                sentences, model_name, text=text, sentence_spans=sentences.spans()
+            )
+        # Texts that fit the window are a single chunk
+        encodings = embeddings.chunk_encodings
+        if encodings is None:
+            return {
+                'difficulty_score': 50.0,
+                'description': 'Model unavailable - using fallback',
+                'method': 'Fallback',
+            }
+
+        chunk_scores = [
+            self._combine_features(embedding_features, readability_metrics)
+            for embedding_features in (self._extract_embedding_features_batch(encodings) if encodings else [])
+        ]
 
         # Aggregate scores with slight preference for later chunks (conclusion bias)
         if chunk_scores:
@@ -279,5 +272,5 @@ class ReadabilityPredictor:
         return {
             'difficulty_score': round(final_score, 2),
             'description': self._get_description(final_score),
-            'method': f'Enhanced Transformer + Traditional Metrics ({self.model_name})',
+            'method': f'Enhanced Transformer + Traditional Metrics ({model_name})',
         }
\ No newline at end of file
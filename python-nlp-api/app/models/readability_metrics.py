@@ -0,0 +1,96 @@
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+import textstat
+
+# Bounded memo table: documents reuse a small vocabulary, so syllable cost is ~constant per distinct word
+SYLLABLE_CACHE_SIZE = 65536
+
+_SILENT_E = re.compile(r"([aeiouy])e\b")
+_CONSONANT_RUNS = re.compile(r"[^aeiouy]+")
+_VOWEL_RUNS = re.compile(r"[aeiouy]{2,}")
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def _count_syllables_lower(word: str) -> int:
+    if not word:
+        return 0
+    word = _SILENT_E.sub(r"\1", word)
+    word = _CONSONANT_RUNS.sub("#", word)
+    word = _VOWEL_RUNS.sub("!", word)
+    return max(1, len(word.replace("#", "")))
+
+
+def count_syllables(word: str) -> int:
+    """Approximate syllable count of a word (memoized on its lowercase form)."""
+    return _count_syllables_lower(word.lower())
+
+
+class ClassicalReadabilityMetrics:
+    """
+    Computes the standard readability formulas server-side from the spaCy parse.
+
+    Produces the same metric names and rounding as the Next.js readibilityScores.ts,
+    so callers no longer need to send ``standard_readability_metrics``.
+    """
+
+    # readibilityScores.ts caps ARI at the top of its description scale
+    ARI_CAP = 14
+
+    def compute(self, text: str, doc, sentences: List[str], context=None) -> Dict[str, float]:
+        """
+        Args:
+            text: Processed text (used for Dale-Chall's easy-word list lookup)
+            doc: spaCy Doc of ``text``
+            sentences: Sentence strings from ``doc``
+            context: The request's AnalysisContext; its word syllable and length arrays are
+                     shared with the language analyzer
+
+        Returns:
+            Dictionary of metric name -> score
+        """
+        if context is not None:
+            syllable_counts = context.word_syllables
+            word_lengths = context.word_lengths
+        else:
+            words = [token.text for token in doc if token.is_alpha]
+            syllable_counts = np.array([count_syllables(word) for word in words], dtype=np.int64)
+            word_lengths = np.array([len(word) for word in words], dtype=np.int64)
+        num_words = len(syllable_counts)
+        num_sentences = max(1, len(sentences))
+        if num_words == 0:
+            return {}
+
+        num_syllables = int(syllable_counts.sum())
+        polysyllables = int((syllable_counts >= 3).sum())
+        num_letters = int(word_lengths.sum())
+
+        words_per_sentence = num_words / num_sentences
+        syllables_per_word = num_syllables / num_words
+
+        flesch_reading_ease = 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+        flesch_kincaid_grade = 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59
+        # SMOG is only defined from three sentences up
+        smog_index = 1.043 * math.sqrt(polysyllables * (30 / num_sentences)) + 3.1291 if len(sentences) >= 3 else 0.0
+        automated_readability_index = min(
+            4.71 * (num_letters / num_words) + 0.5 * words_per_sentence - 21.43, self.ARI_CAP
+        )
+        dale_chall_formula = textstat.dale_chall_readability_score(text)
+
+        return {
+            'flesch_reading_ease': round(flesch_reading_ease, 1),
+            'flesch_kincaid_grade': round(flesch_kincaid_grade, 1),
+            'smog_index': round(smog_index, 1),
+            'automated_readability_index': round(automated_readability_index, 1),
+            'dale_chall_formula': round(dale_chall_formula, 1)
+        }
+
+    def resolve(self, text: str, doc, sentences: List[str],
+                provided: Optional[Dict[str, float]] = None, context=None) -> Dict[str, float]:
+        """Use caller-provided metrics when present, otherwise compute them."""
+        if provided:
+            return provided
+        return self.compute(text, doc, sentences, context)
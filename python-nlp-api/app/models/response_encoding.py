@@ -0,0 +1,168 @@
+import dataclasses
+import gzip
+import json
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Optional fast paths: orjson for JSON, msgpack for the binary format, brotli for 'br'
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+# Key of an object holding a list of records as one array per field
+COLUMNAR_KEY = "$columnar"
+
+
+def to_builtin(value: Any) -> Any:
+    """
+    JSON-compatible form of the non-builtin values found in analysis results.
+
+    Used as the ``default`` hook of every encoder: dataclasses (e.g. TextQualityReport),
+    enums, NumPy scalars and arrays, sets and tuples.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def to_columnar(value: Any, min_rows: int = 2) -> Any:
+    """
+    Copy of ``value`` with every list of same-shaped records stored column by column.
+
+    A list of at least ``min_rows`` dicts that all have the same keys becomes
+    ``{"$columnar": {key: [value, ...]}}`` (per-sentence outputs, topic evolution,
+    keywords, ...), so field names are written once per list instead of once per row.
+    """
+    if isinstance(value, dict):
+        return {key: to_columnar(item, min_rows) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) >= min_rows and all(isinstance(row, dict) for row in value):
+            keys = list(value[0])
+            if all(len(row) == len(keys) and all(key in row for key in keys) for row in value):
+                return {COLUMNAR_KEY: {key: [to_columnar(row[key], min_rows) for row in value] for key in keys}}
+        return [to_columnar(item, min_rows) for item in value]
+    return value
+
+
+def _parse_header(header: Optional[str]) -> Dict[str, float]:
+    """``{token: q}`` for an Accept or Accept-Encoding header (q defaults to 1)."""
+    preferences = {}
+    for part in (header or "").split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        preferences[token.lower()] = max(q, preferences.get(token.lower(), 0.0))
+    return preferences
+
+
+class EncodedResponse(NamedTuple):
+    body: bytes
+    media_type: str
+    headers: Dict[str, str]
+
+
+class ResponseEncoder:
+    """
+    Serializes analysis results for the HTTP layer.
+
+    The media type is negotiated from ``Accept``: JSON (written by orjson when installed,
+    the standard library otherwise) or MessagePack when the client prefers it and msgpack
+    is installed. Bodies of at least ``compress_min_bytes`` are compressed with brotli or
+    gzip, whichever the client's ``Accept-Encoding`` allows (brotli only when installed).
+    """
+
+    def __init__(self, compress_min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        """
+        Args:
+            compress_min_bytes: Smaller bodies are sent uncompressed (0 compresses everything)
+            gzip_level: zlib compression level for 'gzip'
+            brotli_quality: Brotli quality for 'br' (0-11; mid values keep latency low)
+        """
+        self.compress_min_bytes = compress_min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def media_type(self, accept: Optional[str]) -> str:
+        """MessagePack if the client ranks it above JSON and it can be produced, else JSON."""
+        preferences = _parse_header(accept)
+        if msgpack is None or preferences.get(MSGPACK, 0.0) <= 0.0:
+            return JSON
+        json_q = max(preferences.get(JSON, 0.0), preferences.get("application/*", 0.0), preferences.get("*/*", 0.0))
+        return MSGPACK if preferences[MSGPACK] >= json_q else JSON
+
+    def content_encoding(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """'br' or 'gzip' (in that order of preference) if the client accepts it, else None."""
+        preferences = _parse_header(accept_encoding)
+        wildcard = preferences.get("*", 0.0)
+        candidates: List[Tuple[float, str]] = []
+        if brotli is not None:
+            candidates.append((preferences.get("br", wildcard), "br"))
+        candidates.append((preferences.get("gzip", wildcard), "gzip"))
+        q, encoding = max(candidates, key=lambda candidate: candidate[0])
+        return encoding if q > 0.0 else None
+
+    def serialize(self, payload: Any, media_type: str = JSON) -> bytes:
+        if media_type == MSGPACK:
+            return msgpack.packb(payload, default=to_builtin, use_bin_type=True)
+        if orjson is not None:
+            return orjson.dumps(
+                payload, default=to_builtin, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(payload, default=to_builtin, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def encode(self, payload: Any, accept: Optional[str] = None, accept_encoding: Optional[str] = None,
+               columnar: bool = False) -> EncodedResponse:
+        """
+        Body, media type and headers for ``payload``.
+
+        Args:
+            payload: Analysis results
+            accept: The request's Accept header
+            accept_encoding: The request's Accept-Encoding header
+            columnar: Store lists of records column by column (see to_columnar)
+        """
+        if columnar:
+            payload = to_columnar(payload)
+        media_type = self.media_type(accept)
+        body = self.serialize(payload, media_type)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if len(body) >= self.compress_min_bytes:
+            encoding = self.content_encoding(accept_encoding)
+            if encoding is not None:
+                body = self.compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+        return EncodedResponse(body, media_type, headers)
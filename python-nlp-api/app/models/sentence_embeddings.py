@@ -0,0 +1,454 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from models.inference_cache import InferenceCache
+from models.model_registry import ModelRegistry, ModelUnavailableError
+from models.text_chunker import TokenBudgetChunker
+
+
+class SentenceEncoder(NamedTuple):
+    """A loaded sentence encoder with its tokenizer."""
+    tokenizer: Any
+    model: Any
+
+
+class SentenceEncoding(NamedTuple):
+    """
+    One text (usually a sentence) as seen by the encoder.
+
+    Besides the pooled vector it keeps additive token statistics, so token-level
+    features (e.g. those of a readability chunk) need no token tensor to outlive the
+    forward pass.
+    """
+    vector: np.ndarray          # L2-normalized mean-pooled embedding (float32)
+    token_sum: np.ndarray       # Sum of token embeddings
+    token_sq_sum: np.ndarray    # Sum of squared token embeddings
+    n_tokens: int
+    similarity_sum: float       # Cosine similarities of tokens within SIMILARITY_WINDOW of each other
+    similarity_sq_sum: float
+    similarity_count: int
+
+
+class DocumentEncodings(NamedTuple):
+    """Encodings of a document's chunks and of its sentences, from one forward pass per chunk."""
+    chunks: List[SentenceEncoding]
+    sentences: List[SentenceEncoding]
+
+
+class SentenceEmbeddingService:
+    """
+    Encodes sentences once for every stage that needs them.
+
+    Owns the sentence encoders (loaded through the model registry) and runs the
+    batched forward passes. A document is encoded as sentence-aligned chunks that fill
+    the encoder window (``encode_document``): each chunk goes through the model once,
+    and its sentences are pooled from their own tokens within that contextual pass.
+    Encodings are cached across requests in the shared inference cache, keyed by model
+    and sentence (or chunk) text, and within a request by ``RequestEmbeddings``.
+    """
+
+    ENCODER_MODELS = ("sentence-transformers/paraphrase-MiniLM-L6-v2", "sentence-transformers/all-MiniLM-L6-v2")
+    # Token pairs up to this far apart contribute to the similarity statistics
+    SIMILARITY_WINDOW = 10
+    MAX_TOKENS = 512
+    # Chunks per forward pass (each is up to MAX_TOKENS tokens long)
+    CHUNK_BATCH_SIZE = 8
+
+    def __init__(self, model_registry: Optional[ModelRegistry] = None, inference_cache: Optional[InferenceCache] = None,
+                 default_model: str = "sentence-transformers/paraphrase-MiniLM-L6-v2", batch_size: int = 64):
+        """
+        Args:
+            model_registry: Shared registry that loads the encoders on demand and evicts idle ones
+            inference_cache: Cross-request cache of encodings (only per-request reuse when omitted)
+            default_model: Encoder used when a request does not pick one
+            batch_size: Sentences per forward pass
+        """
+        self.model_registry = model_registry or ModelRegistry()
+        self.inference_cache = inference_cache
+        self.default_model = default_model
+        self.batch_size = batch_size
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self._chunkers: Dict[str, TokenBudgetChunker] = {}
+        for model_name in set(self.ENCODER_MODELS) | {default_model}:
+            self.model_registry.register(
+                self._encoder_key(model_name),
+                lambda model_name=model_name: self._load_encoder(model_name)
+            )
+
+    def _encoder_key(self, model_name: str) -> str:
+        return f"encoder:{model_name}"
+
+    def _load_encoder(self, model_name: str) -> SentenceEncoder:
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModel.from_pretrained(model_name)
+            model.to(self.device)
+            model.eval()
+        except Exception as e:
+            raise Exception(f"Failed to load model {model_name}: {e}")
+        return SentenceEncoder(tokenizer, model)
+
+    def resolve_model(self, model_name: Optional[str] = None) -> str:
+        model_name = model_name or self.default_model
+        if model_name not in self.ENCODER_MODELS and model_name != self.default_model:
+            raise ValueError(f"Unknown sentence encoder '{model_name}', expected one of {self.ENCODER_MODELS}")
+        return model_name
+
+    def get_encoder(self, model_name: Optional[str] = None) -> Optional[SentenceEncoder]:
+        """Fetch an encoder from the registry, or None if it cannot be loaded."""
+        try:
+            return self.model_registry.get(self._encoder_key(self.resolve_model(model_name)))
+        except ValueError:
+            raise
+        except ModelUnavailableError:
+            # Already reported when the load failed
+            return None
+        except Exception as e:
+            print(f"Warning: {e}")
+            return None
+
+    def chunker(self, model_name: Optional[str] = None) -> Optional[TokenBudgetChunker]:
+        """Chunker over the encoder's tokenizer and window, or None if the encoder cannot be loaded."""
+        model_name = self.resolve_model(model_name)
+        chunker = self._chunkers.get(model_name)
+        if chunker is None:
+            encoder = self.get_encoder(model_name)
+            if encoder is None:
+                return None
+            # Tokenizers outlive evictions of the encoder itself
+            chunker = self._chunkers[model_name] = TokenBudgetChunker(encoder.tokenizer, max_tokens=self.MAX_TOKENS)
+        return chunker
+
+    def _cached(self, namespace: str, key: str) -> Optional[SentenceEncoding]:
+        return self.inference_cache.get(namespace, key) if self.inference_cache is not None else None
+
+    def encode(self, sentences: List[str], model_name: Optional[str] = None) -> Optional[List[SentenceEncoding]]:
+        """
+        Encodings of ``sentences`` each encoded on its own, in order; None if the encoder is unavailable.
+
+        Repeated sentences are encoded once, cached ones not at all. The remaining
+        sentences are batched in length order so each batch pads to similar lengths.
+        """
+        model_name = self.resolve_model(model_name)
+        namespace = f"embedding:{model_name}"
+        encodings: Dict[str, SentenceEncoding] = {}
+        missing = []
+        for sentence in dict.fromkeys(sentences):
+            cached = self.inference_cache.get(namespace, sentence) if self.inference_cache is not None else None
+            if cached is not None:
+                encodings[sentence] = cached
+            else:
+                missing.append(sentence)
+
+        if missing:
+            encoder = self.get_encoder(model_name)
+            if encoder is None:
+                return None
+            missing.sort(key=len)
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                for sentence, encoding in zip(batch, self._encode_batch(batch, encoder)):
+                    encodings[sentence] = encoding
+                    if self.inference_cache is not None:
+                        self.inference_cache.put(namespace, sentence, encoding)
+
+        return [encodings[sentence] for sentence in sentences]
+
+    def encode_document(self, text: str, sentence_spans: Sequence[Tuple[int, int]], model_name: Optional[str] = None,
+                        token_offsets: Optional[Callable[[Any], Sequence[Tuple[int, int]]]] = None,
+                        known: Optional[List[Optional[SentenceEncoding]]] = None) -> Optional[DocumentEncodings]:
+        """
+        Encodings of the chunks of ``text`` and of its sentences, from one forward pass per chunk.
+
+        The text is cut into sentence-aligned chunks of up to MAX_TOKENS tokens. A chunk's
+        encoding covers all of its tokens, special ones included (chunk-level features such
+        as readability); a sentence's is pooled from its own tokens within the chunk's
+        contextual pass (over several chunks for a sentence longer than the window).
+        Sentences are cached under ``embedding:<model>``, chunks under
+        ``embedding-chunk:<model>``; a chunk is only run if it or one of its sentences is
+        missing.
+
+        Args:
+            text: Document text
+            sentence_spans: Whitespace-stripped (start_char, end_char) of the sentences of ``text``
+            model_name: Sentence encoder (service default when None)
+            token_offsets: Returns a tokenizer's token offsets over ``text`` (e.g. AnalysisContext.token_offsets);
+                           the text is tokenized here when omitted
+            known: Sentence encodings already available, aligned with ``sentence_spans`` (None entries are encoded)
+
+        Returns:
+            DocumentEncodings, or None if the encoder is unavailable
+        """
+        model_name = self.resolve_model(model_name)
+        chunker = self.chunker(model_name)
+        if chunker is None:
+            return None
+        offsets = token_offsets(chunker.tokenizer) if token_offsets is not None else None
+        chunk_spans = chunker.chunk_spans(text, sentence_spans, offsets=offsets)
+        if not chunk_spans and text.strip():
+            chunk_spans = [(0, len(text))]
+
+        sentence_namespace, chunk_namespace = f"embedding:{model_name}", f"embedding-chunk:{model_name}"
+        sentences = [text[start:end] for start, end in sentence_spans]
+        sentence_encodings = list(known) if known is not None else [None] * len(sentences)
+        for i, encoding in enumerate(sentence_encodings):
+            if encoding is None:
+                sentence_encodings[i] = self._cached(sentence_namespace, sentences[i])
+        chunk_texts = [text[start:end] for start, end in chunk_spans]
+        chunk_encodings = [self._cached(chunk_namespace, chunk) for chunk in chunk_texts]
+
+        # Sentences overlapping each chunk (both are sorted and non-overlapping)
+        sentence_starts = np.array([start for start, _ in sentence_spans], dtype=np.int64)
+        sentence_ends = np.array([end for _, end in sentence_spans], dtype=np.int64)
+        chunk_sentences = [
+            range(int(np.searchsorted(sentence_ends, start, side='right')),
+                  int(np.searchsorted(sentence_starts, end, side='left')))
+            for start, end in chunk_spans
+        ]
+        pending = [i for i, encoding in enumerate(chunk_encodings)
+                   if encoding is None or any(sentence_encodings[j] is None for j in chunk_sentences[i])]
+
+        if pending:
+            encoder = self.get_encoder(model_name)
+            if encoder is None:
+                return None
+            # Token statistics of the missing sentences, summed over the chunks they appear in
+            partial: Dict[int, List[Any]] = {}
+            pending.sort(key=lambda i: len(chunk_texts[i]))
+            for start in range(0, len(pending), self.CHUNK_BATCH_SIZE):
+                batch = pending[start:start + self.CHUNK_BATCH_SIZE]
+                token_embeddings, token_mask, batch_offsets = self._forward(
+                    [chunk_texts[i] for i in batch], encoder, return_offsets=True
+                )
+                for row, i in enumerate(batch):
+                    missing = [j for j in chunk_sentences[i] if sentence_encodings[j] is None]
+                    # Sentence bounds relative to the chunk; a token belongs to the sentence it starts in
+                    chunk_start = chunk_spans[i][0]
+                    token_starts, token_ends = batch_offsets[row, :, 0], batch_offsets[row, :, 1]
+                    real_tokens = token_mask[row] & (token_ends > token_starts)
+                    masks = np.vstack([token_mask[row][None, :]] + [
+                        (real_tokens & (token_starts >= sentence_starts[j] - chunk_start)
+                         & (token_starts < sentence_ends[j] - chunk_start))[None, :]
+                        for j in missing
+                    ])
+                    stats = self._token_stats(token_embeddings[row], masks)
+                    chunk_encodings[i] = self._encoding(*[values[0] for values in stats])
+                    if self.inference_cache is not None:
+                        self.inference_cache.put(chunk_namespace, chunk_texts[i], chunk_encodings[i])
+                    for k, j in enumerate(missing, start=1):
+                        values = [stat[k] for stat in stats]
+                        if j in partial:
+                            partial[j] = [total + value for total, value in zip(partial[j], values)]
+                        else:
+                            partial[j] = values
+
+            for j, values in partial.items():
+                if values[2] > 0:
+                    sentence_encodings[j] = self._encoding(*values)
+                    if self.inference_cache is not None:
+                        self.inference_cache.put(sentence_namespace, sentences[j], sentence_encodings[j])
+
+        # Sentences the chunks did not cover (no tokens of their own) are encoded on their own
+        leftover = [j for j, encoding in enumerate(sentence_encodings) if encoding is None]
+        if leftover:
+            encoded = self.encode([sentences[j] for j in leftover], model_name)
+            if encoded is None:
+                return None
+            for j, encoding in zip(leftover, encoded):
+                sentence_encodings[j] = encoding
+        return DocumentEncodings(chunk_encodings, sentence_encodings)
+
+    def _forward(self, batch: List[str], encoder: SentenceEncoder, return_offsets: bool = False):
+        """Token embeddings (float64), attention mask and, if asked, character offsets of a padded batch."""
+        encoded_input = encoder.tokenizer(
+            batch, padding=True, truncation=True, return_tensors='pt', max_length=self.MAX_TOKENS,
+            return_offsets_mapping=return_offsets
+        )
+        offsets = encoded_input.pop('offset_mapping').numpy() if return_offsets else None
+        encoded_input = encoded_input.to(self.device)
+        with torch.no_grad():
+            model_output = encoder.model(**encoded_input)
+
+        token_embeddings = model_output[0].cpu().numpy().astype(np.float64)
+        token_mask = encoded_input['attention_mask'].cpu().numpy().astype(bool)
+        return token_embeddings, token_mask, offsets
+
+    def _token_stats(self, token_embeddings: np.ndarray, masks: np.ndarray):
+        """
+        Additive statistics of the tokens selected by each row of ``masks`` in one sequence.
+
+        Returns:
+            Tuple of per-row arrays (token_sum, token_sq_sum, n_tokens, similarity_sum,
+            similarity_sq_sum, similarity_count), as used by SentenceEncoding
+        """
+        weights = masks.astype(np.float64)
+        token_sum = weights @ token_embeddings
+        token_sq_sum = weights @ token_embeddings ** 2
+        n_tokens = masks.sum(axis=1)
+
+        total = np.zeros(len(masks))
+        sq_total = np.zeros(len(masks))
+        count = np.zeros(len(masks), dtype=np.int64)
+        # Similarities along one diagonal band are computed once and shared by every mask
+        norms = np.linalg.norm(token_embeddings, axis=1)
+        for offset in range(1, min(self.SIMILARITY_WINDOW, len(token_embeddings))):
+            dots = np.einsum('lh,lh->l', token_embeddings[:-offset], token_embeddings[offset:])
+            similarities = dots / (norms[:-offset] * norms[offset:] + 1e-10)
+            valid = (masks[:, :-offset] & masks[:, offset:]).astype(np.float64)
+            total += valid @ similarities
+            sq_total += valid @ similarities ** 2
+            count += valid.sum(axis=1).astype(np.int64)
+        return token_sum, token_sq_sum, n_tokens, total, sq_total, count
+
+    @staticmethod
+    def _encoding(token_sum: np.ndarray, token_sq_sum: np.ndarray, n_tokens, similarity_sum, similarity_sq_sum,
+                  similarity_count) -> SentenceEncoding:
+        # Mean pooling over the selected tokens, then unit length
+        pooled = token_sum / max(int(n_tokens), 1)
+        vector = pooled / max(float(np.linalg.norm(pooled)), 1e-12)
+        return SentenceEncoding(
+            vector=vector.astype(np.float32),
+            token_sum=token_sum,
+            token_sq_sum=token_sq_sum,
+            n_tokens=int(n_tokens),
+            similarity_sum=float(similarity_sum),
+            similarity_sq_sum=float(similarity_sq_sum),
+            similarity_count=int(similarity_count)
+        )
+
+    def _encode_batch(self, batch: List[str], encoder: SentenceEncoder) -> List[SentenceEncoding]:
+        token_embeddings, token_mask, _ = self._forward(batch, encoder)
+        masked = token_embeddings * token_mask[:, :, None]
+        n_tokens = token_mask.sum(axis=1)
+        token_sum = masked.sum(axis=1)
+        token_sq_sum = (masked ** 2).sum(axis=1)
+
+        # Mean pooling over real tokens, then unit length
+        pooled = token_sum / np.maximum(n_tokens, 1)[:, None]
+        vectors = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+        similarity_sum, similarity_sq_sum, similarity_count = self._token_similarity_stats(token_embeddings, token_mask)
+        return [
+            SentenceEncoding(
+                vector=vectors[i].astype(np.float32),
+                token_sum=token_sum[i],
+                token_sq_sum=token_sq_sum[i],
+                n_tokens=int(n_tokens[i]),
+                similarity_sum=float(similarity_sum[i]),
+                similarity_sq_sum=float(similarity_sq_sum[i]),
+                similarity_count=int(similarity_count[i])
+            )
+            for i in range(len(batch))
+        ]
+
+    def _token_similarity_stats(self, token_embeddings: np.ndarray, token_mask: np.ndarray):
+        """Per-row sum, sum of squares and count of token cosine similarities within the window."""
+        n_rows = token_embeddings.shape[0]
+        total = np.zeros(n_rows)
+        sq_total = np.zeros(n_rows)
+        count = np.zeros(n_rows, dtype=np.int64)
+        # One diagonal band of the similarity matrix at a time
+        norms = np.linalg.norm(token_embeddings, axis=2)
+        for offset in range(1, min(self.SIMILARITY_WINDOW, token_embeddings.shape[1])):
+            dots = np.einsum('blh,blh->bl', token_embeddings[:, :-offset], token_embeddings[:, offset:])
+            similarities = dots / (norms[:, :-offset] * norms[:, offset:] + 1e-10)
+            valid = token_mask[:, :-offset] & token_mask[:, offset:]
+            total += (similarities * valid).sum(axis=1)
+            sq_total += (similarities ** 2 * valid).sum(axis=1)
+            count += valid.sum(axis=1)
+        return total, sq_total, count
+
+    def for_request(self, sentences: List[str], model_name: Optional[str] = None,
+                    known: Optional[List[Optional[SentenceEncoding]]] = None, text: Optional[str] = None,
+                    sentence_spans: Optional[Sequence[Tuple[int, int]]] = None,
+                    token_offsets: Optional[Callable[[Any], Sequence[Tuple[int, int]]]] = None) -> "RequestEmbeddings":
+        return RequestEmbeddings(self, sentences, model_name, known, text, sentence_spans, token_offsets)
+
+
+class RequestEmbeddings:
+    """
+    The sentence encodings of one request, computed on first use and then shared.
+
+    Stages running on the same sentences read the same encodings, so each sentence
+    goes through the encoder at most once per request (and not at all on a cache hit).
+    Given the text the sentences come from, the chunk encodings of that same pass are
+    available too (``chunk_encodings``).
+    """
+
+    def __init__(self, service: SentenceEmbeddingService, sentences: List[str], model_name: Optional[str] = None,
+                 known: Optional[List[Optional[SentenceEncoding]]] = None, text: Optional[str] = None,
+                 sentence_spans: Optional[Sequence[Tuple[int, int]]] = None,
+                 token_offsets: Optional[Callable[[Any], Sequence[Tuple[int, int]]]] = None):
+        """
+        Args:
+            service: Service that encodes the sentences
+            sentences: Sentences of the request
+            model_name: Sentence encoder (service default when None)
+            known: Encodings already available (e.g. from a previous document version), aligned with
+                   ``sentences``; only the None entries are encoded
+            text: Text the sentences were taken from; when given, they are encoded in context, one
+                  forward pass per chunk (see SentenceEmbeddingService.encode_document)
+            sentence_spans: (start_char, end_char) of ``sentences`` over ``text``
+            token_offsets: Token offsets of ``text`` per tokenizer, if already available
+        """
+        self.service = service
+        self.sentences = sentences
+        self.model_name = service.resolve_model(model_name)
+        self.text = text
+        self.sentence_spans = sentence_spans
+        self._token_offsets = token_offsets
+        self._known = known
+        self._encodings: Optional[List[SentenceEncoding]] = None
+        self._chunk_encodings: Optional[List[SentenceEncoding]] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._encoded = False
+
+    @property
+    def encodings(self) -> Optional[List[SentenceEncoding]]:
+        """Per-sentence encodings, or None if the encoder could not be loaded."""
+        if not self._encoded:
+            self._encoded = True
+            self._encodings = self._encode() if self.sentences or self.text else []
+        return self._encodings
+
+    @property
+    def chunk_encodings(self) -> Optional[List[SentenceEncoding]]:
+        """Encodings of the text's chunks from the same pass (None without ``text`` or an encoder)."""
+        self.encodings
+        return self._chunk_encodings
+
+    @property
+    def computed(self) -> Optional[List[SentenceEncoding]]:
+        """Encodings if they have been computed already (never triggers encoding)."""
+        return self._encodings if self._encoded else None
+
+    def _encode(self) -> Optional[List[SentenceEncoding]]:
+        if self.text is not None:
+            document = self.service.encode_document(
+                self.text, self.sentence_spans, self.model_name, token_offsets=self._token_offsets, known=self._known
+            )
+            if document is None:
+                return None
+            self._chunk_encodings = document.chunks
+            return document.sentences
+        if self._known is None:
+            return self.service.encode(self.sentences, self.model_name)
+        encodings = list(self._known)
+        missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+        if missing:
+            encoded = self.service.encode([self.sentences[i] for i in missing], self.model_name)
+            if encoded is None:
+                return None
+            for i, encoding in zip(missing, encoded):
+                encodings[i] = encoding
+        return encodings
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        """(n_sentences, dim) matrix of unit-length sentence embeddings, or None."""
+        if self._vectors is None and self.encodings:
+            self._vectors = np.vstack([encoding.vector for encoding in self.encodings])
+        return self._vectors
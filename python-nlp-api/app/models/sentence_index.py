@@ -0,0 +1,135 @@
+import re
+from collections.abc import Sequence
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from spacy.attrs import IDX, IS_SPACE, LENGTH, SENT_START
+
+from models.text_chunker import TokenBudgetChunker
+
+_WORD = re.compile(r'\S+')
+
+
+class Sentence:
+    """One sentence of a SentenceIndex: offsets into the shared text, sliced only on demand."""
+
+    __slots__ = ('index', 'start', 'end', '_text')
+
+    def __init__(self, index: int, start: int, end: int, text: str):
+        self.index = index
+        self.start = start
+        self.end = end
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        return self._text[self.start:self.end]
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def preview(self, max_chars: int) -> str:
+        """The first ``max_chars`` characters, with '...' appended if the sentence is longer."""
+        if self.end - self.start <= max_chars:
+            return self.text
+        return self._text[self.start:self.start + max_chars] + '...'
+
+
+class SentenceIndex(Sequence):
+    """
+    The non-empty sentences of one text, stored as offsets instead of strings.
+
+    Character bounds (whitespace-stripped, like ``sent.text.strip()``) and spaCy token
+    bounds live in int64 arrays over the single processed text, so building the index
+    allocates no per-sentence strings. It is a ``Sequence[str]``: indexing or iterating
+    slices a sentence out of the text at that moment, so code that only needs counts,
+    bounds or ranges (segments, chunking, previews) never materializes the rest.
+    """
+
+    def __init__(self, text: str, starts: np.ndarray, ends: np.ndarray,
+                 token_starts: Optional[np.ndarray] = None, token_ends: Optional[np.ndarray] = None):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.token_starts = token_starts
+        self.token_ends = token_ends
+
+    @classmethod
+    def from_doc(cls, doc) -> "SentenceIndex":
+        """Sentence bounds of a parsed Doc, computed from its token arrays without creating Spans."""
+        n_tokens = len(doc)
+        features = doc.to_array([SENT_START, IS_SPACE, IDX, LENGTH]).astype(np.int64).reshape(n_tokens, 4)
+        sent_start, is_space, idx, length = features.T
+        content = np.flatnonzero(is_space == 0)
+        if not len(content):
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(doc.text, empty, empty, empty, empty)
+
+        token_starts = np.flatnonzero(sent_start == 1)
+        if not len(token_starts) or token_starts[0] != 0:
+            token_starts = np.concatenate([[0], token_starts])
+        token_ends = np.append(token_starts[1:], n_tokens)
+
+        # First and last non-space token of each sentence give the stripped character bounds
+        first = np.searchsorted(content, token_starts)
+        last = np.searchsorted(content, token_ends) - 1
+        # Sentences made only of whitespace tokens are dropped
+        keep = first <= last
+        first_token, last_token = content[first[keep]], content[last[keep]]
+        return cls(
+            doc.text, idx[first_token], idx[last_token] + length[last_token],
+            token_starts[keep], token_ends[keep]
+        )
+
+    @classmethod
+    def from_text(cls, text: str) -> "SentenceIndex":
+        """Regex sentence bounds, for text that has not been parsed."""
+        bounds = []
+        for start, end in TokenBudgetChunker.sentence_spans(text):
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                bounds.append((start, end))
+        array = np.array(bounds, dtype=np.int64).reshape(-1, 2)
+        return cls(text, array[:, 0], array[:, 1])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            return [self.text[start:end] for start, end in zip(self.starts[i].tolist(), self.ends[i].tolist())]
+        return self.text[int(self.starts[i]):int(self.ends[i])]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield text[start:end]
+
+    def sentence(self, i: int) -> Sentence:
+        return Sentence(i, int(self.starts[i]), int(self.ends[i]), self.text)
+
+    def spans(self) -> List[Tuple[int, int]]:
+        """(start_char, end_char) of every sentence."""
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def token_spans(self) -> List[Tuple[int, int]]:
+        """(start, end) token indices of every sentence in the Doc (``from_doc`` only)."""
+        return list(zip(self.token_starts.tolist(), self.token_ends.tolist()))
+
+    def range_text(self, first: int, last: int) -> str:
+        """Text from the start of sentence ``first`` to the end of sentence ``last`` (inclusive)."""
+        return self.text[int(self.starts[first]):int(self.ends[last])]
+
+    def word_counts(self) -> np.ndarray:
+        """Whitespace-separated words per sentence (``len(sentence.split())``), from one pass over the text."""
+        word_starts = np.fromiter((match.start() for match in _WORD.finditer(self.text)), dtype=np.int64)
+        if not len(word_starts):
+            return np.zeros(len(self), dtype=np.int64)
+        first = np.searchsorted(word_starts, self.starts)
+        counts = np.searchsorted(word_starts, self.ends) - first
+        # A sentence can begin inside a whitespace-delimited word ("end.Next"); that piece counts too
+        starts_mid_word = (first >= len(word_starts)) | (word_starts[np.minimum(first, len(word_starts) - 1)] != self.starts)
+        return counts + (starts_mid_word & (self.ends > self.starts))
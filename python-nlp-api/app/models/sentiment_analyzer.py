@@ -1,9 +1,15 @@
 import re
 import statistics
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 from textblob import TextBlob
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from transformers import pipeline
+from models.lexicon_index import LexiconIndex, LexiconMatches
+from models.onnx_backend import load_onnx_pipeline
+from models.inference_cache import InferenceCache
+from models.text_chunker import TokenBudgetChunker
+from models.model_registry import ModelRegistry, ModelUnavailableError
+from models.analysis_context import AnalysisContext
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -24,9 +30,33 @@ class SentimentAnalyzer:
     
     MODEL_WEIGHTS = {'two_models': [0.5, 0.5], 'three_models': [0.3, 0.4, 0.3]}
 
-    def __init__(self, emotion_model="j-hartmann/emotion-english-distilroberta-base"):
+    SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+    # Emotion classifiers that may be selected per request
+    EMOTION_MODELS = ("j-hartmann/emotion-english-distilroberta-base", "bhadresh-savani/distilbert-base-uncased-emotion")
+    BACKENDS = ('torch', 'onnx')
+
+    def __init__(self, emotion_model="j-hartmann/emotion-english-distilroberta-base",
+                 backend: str = 'torch', intra_op_threads: Optional[int] = None,
+                 inference_cache: Optional[InferenceCache] = None,
+                 model_registry: Optional[ModelRegistry] = None):
+        """
+        Args:
+            emotion_model: Hugging Face identifier of the default emotion classifier
+            backend: 'torch' for fp32 PyTorch pipelines, 'onnx' for int8-quantized ONNX Runtime sessions
+            intra_op_threads: Intra-op thread count for the ONNX Runtime sessions (None = runtime default)
+            inference_cache: Cross-request cache of per-sentence model outputs
+            model_registry: Shared registry that loads the pipelines on demand and evicts idle ones
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown sentiment backend '{backend}', expected one of {self.BACKENDS}")
         self.vader_analyzer = SentimentIntensityAnalyzer()
         self.emotion_model = emotion_model
+        self.backend = backend
+        # Backend each loaded model actually runs on (a failed ONNX load falls back to PyTorch for that model only)
+        self._model_backends: Dict[str, str] = {}
+        self.intra_op_threads = intra_op_threads
+        self.inference_cache = inference_cache or InferenceCache()
+        self.model_registry = model_registry or ModelRegistry()
         self._initialize_pipelines()
 
         # Expanded emotion words for better detection
@@ -62,34 +92,92 @@ class SentimentAnalyzer:
             'temporal_markers': {'yesterday', 'today', 'tomorrow', 'recently', 'currently',
                                 'previously', 'subsequently', 'meanwhile', 'thereafter'}
         }
-        
+
+        # Shared phrase index over the lexicons above (other analyzers may register more)
+        self.lexicon_index = LexiconIndex()
+        for category, phrases in self.neutral_indicators.items():
+            self.lexicon_index.add(category, phrases, field='lower')
+        for emotion, words in self.emotion_words.items():
+            # Surface forms catch participles listed as adjectives ('terrified', 'shocked') that lemmatize
+            # to verbs; lemmas catch inflections ('loved', 'hates'). A word matching both counts once.
+            self.lexicon_index.add(f'emotion:{emotion}', words, field='lower')
+            self.lexicon_index.add(f'emotion:{emotion}', words, field='lemma')
+        self.lexicon_index.compile()
+
     def _initialize_pipelines(self):
-        """Initialize transformer pipelines with error handling."""
-        try:
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis", 
-                model="distilbert-base-uncased-finetuned-sst-2-english",
-                tokenizer="distilbert-base-uncased-finetuned-sst-2-english",
-                device=-1
-            )
-            self.emotion_classifier = pipeline(
-                "text-classification", 
-                model=self.emotion_model            
+        """Register the transformer pipelines; they are loaded on first use."""
+        self._chunkers: Dict[str, TokenBudgetChunker] = {}
+        self.model_registry.register(
+            self._pipeline_key(self.SENTIMENT_MODEL),
+            lambda: self._load_pipeline("sentiment-analysis", self.SENTIMENT_MODEL)
+        )
+        for model_name in set(self.EMOTION_MODELS) | {self.emotion_model}:
+            self.model_registry.register(
+                self._pipeline_key(model_name),
+                lambda model_name=model_name: self._load_pipeline("text-classification", model_name)
             )
+
+    def _pipeline_key(self, model_name: str) -> str:
+        return f"sentiment:{model_name}"
+
+    def _load_pipeline(self, task: str, model_name: str):
+        if self.backend == 'onnx':
+            try:
+                classifier = load_onnx_pipeline(task, model_name, self.intra_op_threads)
+                self._model_backends[model_name] = 'onnx'
+                return classifier
+            except Exception as e:
+                print(f"Warning: Could not load ONNX model {model_name}, falling back to PyTorch: {e}")
+
+        classifier = pipeline(task, model=model_name, tokenizer=model_name, device=-1)
+        self._model_backends[model_name] = 'torch'
+        return classifier
+
+    def model_backend(self, model_name: str) -> str:
+        """Backend ``model_name`` runs on once loaded (the configured backend until then)."""
+        return self._model_backends.get(model_name, self.backend)
+
+    def _get_pipeline(self, model_name: str):
+        """Fetch a pipeline from the registry, or None if it cannot be loaded."""
+        try:
+            return self.model_registry.get(self._pipeline_key(model_name))
+        except ModelUnavailableError:
+            # Already reported when the load failed
+            return None
         except Exception as e:
-            print(f"Warning: Could not load transformer models: {e}")
-            self.sentiment_pipeline = None
-            self.emotion_classifier = None
+            print(f"Warning: Could not load transformer model {model_name}: {e}")
+            return None
+
+    def _get_chunker(self, model_name: str, classifier) -> TokenBudgetChunker:
+        # Chunks are packed up to each classifier's real 512-token window; tokenizers outlive evictions
+        if model_name not in self._chunkers:
+            self._chunkers[model_name] = TokenBudgetChunker(classifier.tokenizer, 512)
+        return self._chunkers[model_name]
+
+    @property
+    def sentiment_pipeline(self):
+        return self._get_pipeline(self.SENTIMENT_MODEL)
 
-    def analyze_sentiment(self, text: str, doc, sentences: List[str]) -> Dict[str, Any]:
+    @property
+    def emotion_classifier(self):
+        return self._get_pipeline(self.emotion_model)
+
+    def analyze_sentiment(self, text: str, doc, sentences: List[str], emotion_model: Optional[str] = None,
+                          context: Optional[AnalysisContext] = None, include_sentences: bool = False) -> Dict[str, Any]:
         """Enhanced sentiment analysis with balanced thresholds."""
+        emotion_model = emotion_model or self.emotion_model
+        if emotion_model not in self.EMOTION_MODELS and emotion_model != self.emotion_model:
+            raise ValueError(f"Unknown emotion model '{emotion_model}', expected one of {self.EMOTION_MODELS}")
+        context = context or AnalysisContext(text, doc, sentences, lexicon_index=self.lexicon_index)
+        lexicon_matches = context.lexicon_matches
+
         # Get base sentiment scores
         textblob_score, textblob_subjectivity = self._get_textblob_sentiment(text)
         vader_score = self._get_vader_sentiment(text)
-        transformer_score, transformer_confidence = self._get_transformer_sentiment(text)
+        transformer_score, transformer_confidence = self._get_transformer_sentiment(context)
         
         # Check if text appears to be factual/neutral
-        factual_score = self._assess_factual_content(text)
+        factual_score = self._assess_factual_content(text, lexicon_matches, context.word_count)
         
         # Calculate ensemble sentiment with factual adjustment
         overall_score, final_confidence = self._calculate_ensemble_sentiment(
@@ -102,10 +190,14 @@ class SentimentAnalyzer:
         if (abs(overall_score) >= self.EMOTION_CONFIDENCE_THRESHOLDS['minimum_sentiment_magnitude'] 
             and textblob_subjectivity >= self.EMOTION_CONFIDENCE_THRESHOLDS['minimum_subjectivity']
             and factual_score < 0.6):  # Not too factual
-            emotional_tone = self._get_filtered_emotional_tone(doc, overall_score, textblob_subjectivity)
+            emotional_tone = self._get_filtered_emotional_tone(
+                context, overall_score, textblob_subjectivity, emotion_model
+            )
         
         # Analyze individual sentences with conservative thresholds
-        sentence_analysis = self._analyze_sentences_conservative(sentences)
+        sentence_analysis = context.read("sentence_sentiment", lambda: self._analyze_sentences_conservative(
+            sentences, context.sentence_word_counts
+        ))
         sentiment_distribution = self._calculate_distribution(sentence_analysis)
         
         # Generate description
@@ -114,7 +206,7 @@ class SentimentAnalyzer:
             sentiment_distribution, factual_score, textblob_subjectivity
         )
         
-        return {
+        result = {
             "overall_sentiment": {
                 "score": round(overall_score, 3),
                 "label": self._get_sentiment_label_conservative(overall_score, final_confidence),
@@ -125,11 +217,12 @@ class SentimentAnalyzer:
             "emotional_tone": emotional_tone,
             "description": description
         }
+        if include_sentences:
+            result["sentences"] = sentence_analysis
+        return result
     
-    def _assess_factual_content(self, text: str) -> float:
+    def _assess_factual_content(self, text: str, lexicon_matches: LexiconMatches, word_count: int) -> float:
         """Assess how factual/objective the content appears to be."""
-        text_lower = text.lower()
-        word_count = len(text.split())
         
         if word_count == 0:
             return 0.0
@@ -137,16 +230,13 @@ class SentimentAnalyzer:
         factual_indicators = 0
         
         # Count factual words
-        for word in self.neutral_indicators['factual_words']:
-            factual_indicators += text_lower.count(word)
+        factual_indicators += lexicon_matches.count('factual_words')
         
         # Count academic phrases (weighted more heavily)
-        for phrase in self.neutral_indicators['academic_phrases']:
-            factual_indicators += text_lower.count(phrase) * 2
+        factual_indicators += lexicon_matches.count('academic_phrases') * 2
         
         # Count temporal markers
-        for marker in self.neutral_indicators['temporal_markers']:
-            factual_indicators += text_lower.count(marker) * 0.5
+        factual_indicators += lexicon_matches.count('temporal_markers') * 0.5
         
         # Check for numerical data, dates, percentages
         factual_indicators += len(re.findall(r'\b\d+%\b|\b\d{4}\b|\b\d+\.\d+\b', text))
@@ -165,17 +255,50 @@ class SentimentAnalyzer:
         """Get VADER sentiment score."""
         return self.vader_analyzer.polarity_scores(text)['compound']
     
-    def _get_transformer_sentiment(self, text: str) -> Tuple[float, float]:
+    def _cache_namespace(self, model_name: str) -> str:
+        return f"{model_name}:{self.model_backend(model_name)}"
+
+    def _classify_sentiment(self, text: str, classifier=None) -> Dict[str, Any]:
+        """Run the sentiment pipeline on one input, consulting the cross-request cache."""
+        namespace = self._cache_namespace(self.SENTIMENT_MODEL)
+        result = self.inference_cache.get(namespace, text)
+        if result is None:
+            classifier = classifier or self.sentiment_pipeline
+            result = classifier(text, truncation=True)[0]
+            self.inference_cache.put(namespace, text, result)
+        return result
+
+    def _classify_emotions(self, text: str, classifier, emotion_model: str) -> List[Dict[str, Any]]:
+        """Run the emotion classifier on one input, consulting the cross-request cache."""
+        namespace = self._cache_namespace(emotion_model)
+        results = self.inference_cache.get(namespace, text)
+        if results is None:
+            results = classifier(text, truncation=True)
+            self.inference_cache.put(namespace, text, results)
+        return results
+
+    def _get_lexical_sentence_scores(self, sentence: str) -> Tuple[float, float]:
+        """TextBlob polarity and VADER compound score for one sentence, cached across requests."""
+        scores = self.inference_cache.get('textblob+vader', sentence)
+        if scores is None:
+            scores = (TextBlob(sentence).sentiment.polarity,
+                      self.vader_analyzer.polarity_scores(sentence)['compound'])
+            self.inference_cache.put('textblob+vader', sentence, scores)
+        return scores
+
+    def _get_transformer_sentiment(self, context: AnalysisContext) -> Tuple[float, float]:
         """Get transformer sentiment score with confidence."""
-        if not self.sentiment_pipeline:
+        classifier = self.sentiment_pipeline
+        if not classifier:
             return 0, 0
             
         try:
-            chunks = self._split_text_for_transformer(text)
+            chunker = self._get_chunker(self.SENTIMENT_MODEL, classifier)
+            chunks = self._split_text_for_transformer(context, chunker)
             results = []
             
             for chunk in chunks:
-                result = self.sentiment_pipeline(chunk)[0]
+                result = self._classify_sentiment(chunk, classifier)
                 score = result['score'] if result['label'] == 'POSITIVE' else -result['score']
                 results.append((score, result['score']))
             
@@ -189,18 +312,22 @@ class SentimentAnalyzer:
             
         return 0, 0
     
-    def _get_filtered_emotional_tone(self, doc, overall_sentiment: float, subjectivity: float) -> Dict[str, float]:
+    def _get_filtered_emotional_tone(self, context: AnalysisContext, overall_sentiment: float, subjectivity: float,
+                                     emotion_model: Optional[str] = None) -> Dict[str, float]:
         """Get emotional tone analysis with confidence filtering."""
-        if not self.emotion_classifier:
+        emotion_model = emotion_model or self.emotion_model
+        classifier = self._get_pipeline(emotion_model)
+        if not classifier:
             return {}
             
         try:
             # Split text into chunks to handle token limit
-            chunks = self._split_text_for_transformer(doc.text, max_length=400)
+            chunker = self._get_chunker(emotion_model, classifier)
+            chunks = self._split_text_for_transformer(context, chunker)
             all_emotions = {}
             
             for chunk in chunks:
-                chunk_results = self.emotion_classifier(chunk)
+                chunk_results = self._classify_emotions(chunk, classifier, emotion_model)
                 for item in chunk_results:
                     emotion = item['label'].lower()
                     score = item['score']
@@ -219,7 +346,7 @@ class SentimentAnalyzer:
             # Further filter based on lexical presence and sentiment alignment
             filtered_emotions = {}
             for emotion, score in averaged_emotions.items():
-                if self._validate_emotion_presence(doc.text, emotion, overall_sentiment):
+                if self._validate_emotion_presence(context.lexicon_matches, emotion, overall_sentiment):
                     filtered_emotions[emotion] = round(score, 3)
             
             return filtered_emotions
@@ -228,15 +355,10 @@ class SentimentAnalyzer:
             print(f"Emotion analysis failed: {e}")
             return {}
     
-    def _validate_emotion_presence(self, text: str, emotion: str, sentiment_score: float) -> bool:
+    def _validate_emotion_presence(self, lexicon_matches: LexiconMatches, emotion: str, sentiment_score: float) -> bool:
         """Validate that detected emotion aligns with text content and sentiment."""
-        text_lower = text.lower()
-        
-        # Check if emotion words are actually present in the text
-        if emotion in self.emotion_words:
-            emotion_word_present = any(word in text_lower for word in self.emotion_words[emotion])
-        else:
-            emotion_word_present = False
+        # Check if emotion words are actually present in the text (whole-word surface or lemma matches)
+        emotion_word_present = lexicon_matches.count(f'emotion:{emotion}') > 0
         
         # Check sentiment-emotion alignment
         positive_emotions = {'joy', 'happiness', 'love', 'excitement'}
@@ -294,24 +416,28 @@ class SentimentAnalyzer:
         else:
             return 'Neutral'
     
-    def _analyze_sentences_conservative(self, sentences: List[str]) -> List[Dict[str, Any]]:
+    def analyze_sentences(self, sentences: List[str], word_counts: List[int]) -> List[Dict[str, Any]]:
+        """Per-sentence sentiment entries, as returned under 'sentences' (e.g. for one paragraph at a time)."""
+        return self._analyze_sentences_conservative(sentences, word_counts)
+
+    def _analyze_sentences_conservative(self, sentences: List[str], word_counts: List[int]) -> List[Dict[str, Any]]:
         """Analyze sentiment for individual sentences with conservative thresholds."""
         sentence_analysis = []
+        classifier = self.sentiment_pipeline
         
-        for sentence in sentences:
+        for sentence, word_count in zip(sentences, word_counts):
             # Skip very short sentences that are likely neutral
-            if len(sentence.split()) < 4:
+            if word_count < 4:
                 sentiment_label = 'neutral'
                 avg_score = 0.0
             else:
-                textblob_score = TextBlob(sentence).sentiment.polarity
-                vader_score = self.vader_analyzer.polarity_scores(sentence)['compound']
+                textblob_score, vader_score = self._get_lexical_sentence_scores(sentence)
                 scores = [textblob_score, vader_score]
                 
                 # Add transformer score if available
-                if self.sentiment_pipeline:
+                if classifier:
                     try:
-                        transformer_result = self.sentiment_pipeline(sentence)[0]
+                        transformer_result = self._classify_sentiment(sentence, classifier)
                         trans_score = (transformer_result['score'] 
                                       if transformer_result['label'] == 'POSITIVE' 
                                       else -transformer_result['score'])
@@ -385,28 +511,10 @@ class SentimentAnalyzer:
                 f"Factual content score: {factual_score:.2f}, "
                 f"Subjectivity: {subjectivity:.2f}.")
     
-    def _split_text_for_transformer(self, text: str, max_length: int = 400) -> List[str]:
-        """Split text into chunks for transformer processing."""
-        sentences = re.split(r'[.!?]+', text)
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            if len(current_chunk + " " + sentence) <= max_length:
-                current_chunk += " " + sentence if current_chunk else sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-            
-        return chunks or [text[:max_length]]
+    def _split_text_for_transformer(self, context: AnalysisContext, chunker: TokenBudgetChunker) -> List[str]:
+        """Split text into sentence-aligned chunks that fill the classifier's token window."""
+        offsets = context.token_offsets(chunker.tokenizer)
+        return chunker.chunk(context.text, context.sentence_spans, offsets=offsets) or [context.text]
     
     def _calculate_model_agreement(self, scores: List[float]) -> float:
         """Calculate agreement between different models."""
@@ -0,0 +1,129 @@
+import re
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+from transformers import AutoTokenizer
+
+_SENTENCE_PATTERN = re.compile(r'[^.!?]+(?:[.!?]+|$)')
+
+
+class TokenBudgetChunker:
+    """
+    Packs sentence-aligned chunks up to a model's token budget.
+
+    The whole text is tokenized once with a fast (Rust) tokenizer and the token
+    offsets are swept alongside the sentence spans, so chunking is linear in the
+    length of the text instead of re-encoding every growing chunk.
+    """
+
+    def __init__(self, tokenizer, max_tokens: Optional[int] = None):
+        """
+        Args:
+            tokenizer: Hugging Face tokenizer of the target model (a fast one is loaded if it is slow)
+            max_tokens: Token window of the target model, special tokens included
+                        (defaults to the tokenizer's model_max_length, capped at 512)
+        """
+        if not getattr(tokenizer, 'is_fast', False):
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer.name_or_path, use_fast=True)
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens or min(512, tokenizer.model_max_length)
+        # Room left for content once [CLS]/[SEP] (or </s>) are added by the model call
+        self.budget = self.max_tokens - tokenizer.num_special_tokens_to_add(pair=False)
+
+    @staticmethod
+    def sentence_spans(text: str) -> List[Tuple[int, int]]:
+        """Regex sentence boundaries, used when no spaCy sentence spans are available."""
+        return [match.span() for match in _SENTENCE_PATTERN.finditer(text) if match.group().strip()]
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens ``text`` occupies in the model window, special tokens included."""
+        encoding = self.tokenizer(text, add_special_tokens=True, return_attention_mask=False, verbose=False)
+        return len(encoding['input_ids'])
+
+    def chunk(self, text: str, sentence_spans: Optional[Sequence[Tuple[int, int]]] = None,
+              content_defined: bool = False, min_fill: float = 0.5, anchor_modulus: int = 4,
+              offsets: Optional[Sequence[Tuple[int, int]]] = None) -> List[str]:
+        """
+        Split text into chunks that each fit the model's token window.
+
+        Args:
+            text: Text to split
+            sentence_spans: Optional (start_char, end_char) sentence spans over ``text``,
+                            e.g. from ``doc.sents``; regex boundaries are used otherwise
+            content_defined: Also cut after "anchor" sentences (chosen by a hash of their text) once a
+                             chunk is ``min_fill`` full. Boundaries then depend on local content only,
+                             so an edit re-chunks the surrounding chunks instead of everything after it.
+            offsets: Token character offsets of ``text`` from this tokenizer (no special tokens), if
+                     already computed, e.g. by AnalysisContext.token_offsets
+
+        Returns:
+            List of chunk strings, sliced from ``text``
+        """
+        return [text[start:end] for start, end in self.chunk_spans(
+            text, sentence_spans, content_defined, min_fill, anchor_modulus, offsets
+        )]
+
+    def chunk_spans(self, text: str, sentence_spans: Optional[Sequence[Tuple[int, int]]] = None,
+                    content_defined: bool = False, min_fill: float = 0.5, anchor_modulus: int = 4,
+                    offsets: Optional[Sequence[Tuple[int, int]]] = None) -> List[Tuple[int, int]]:
+        """(start_char, end_char) of the chunks ``chunk`` returns (same arguments), whitespace-stripped."""
+        if not text.strip():
+            return []
+
+        if offsets is None:
+            offsets = self.tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True,
+                return_attention_mask=False, verbose=False
+            )['offset_mapping']
+        n_tokens = len(offsets)
+        spans = sentence_spans if sentence_spans is not None else self.sentence_spans(text)
+
+        chunks = []
+        chunk_start = chunk_end = None
+        chunk_tokens = 0
+        token_index = 0
+
+        def add(start: int, end: int):
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                chunks.append((start, end))
+
+        def flush():
+            nonlocal chunk_start, chunk_end, chunk_tokens
+            if chunk_start is not None:
+                add(chunk_start, chunk_end)
+            chunk_start = chunk_end = None
+            chunk_tokens = 0
+
+        for sent_start, sent_end in spans:
+            first_token = token_index
+            while token_index < n_tokens and offsets[token_index][0] < sent_end:
+                token_index += 1
+            sent_tokens = token_index - first_token
+            if sent_tokens == 0:
+                continue
+
+            if sent_tokens > self.budget:
+                # A single over-long sentence is cut at token boundaries
+                flush()
+                for piece_first in range(first_token, token_index, self.budget):
+                    piece_last = min(piece_first + self.budget, token_index) - 1
+                    add(offsets[piece_first][0], offsets[piece_last][1])
+                continue
+
+            if chunk_tokens + sent_tokens > self.budget:
+                flush()
+            if chunk_start is None:
+                chunk_start = min(sent_start, offsets[first_token][0])
+            chunk_end = sent_end
+            chunk_tokens += sent_tokens
+
+            if (content_defined and chunk_tokens >= self.budget * min_fill
+                    and zlib.crc32(text[sent_start:sent_end].strip().encode('utf-8')) % anchor_modulus == 0):
+                flush()
+
+        flush()
+        return chunks
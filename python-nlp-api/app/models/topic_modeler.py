@@ -1,11 +1,66 @@
-from typing import List, Dict, Any
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.preprocessing import normalize
+from threadpoolctl import threadpool_limits
 import numpy as np
+from scipy import sparse
+from models.corpus_idf import CorpusIDFIndex
+from models.global_topic_model import GlobalTopicModel
+from models.analysis_context import AnalysisContext, is_content_token
 
 class TopicModeler:
-    def __init__(self, nlp_model):
+    # k-means++ restarts per fit (was 10 random restarts)
+    KMEANS_N_INIT = 1
+    # Sentence counts above which clustering switches to mini-batch k-means
+    MINIBATCH_THRESHOLD = 2000
+    MINIBATCH_SIZE = 1024
+
+    TOPIC_COUNT_MODES = ('fixed', 'adaptive')
+    # Sentences are clustered by their TF-IDF rows, or (opt-in) by their shared sentence embeddings
+    TOPIC_REPRESENTATIONS = ('tfidf', 'embedding')
+    # Adaptive mode tries k in this range, in waves of parallel fits scored by silhouette
+    ADAPTIVE_MIN_TOPICS = 2
+    ADAPTIVE_MAX_TOPICS = 8
+    # Sentences sampled for each silhouette estimate
+    ADAPTIVE_SILHOUETTE_SAMPLE = 1000
+    # Stop once this many fitted candidates followed the best one, or once selection has taken this long
+    ADAPTIVE_PATIENCE = 2
+    ADAPTIVE_MAX_SELECTION_MS = 1500
+
+    # With a global model, report the document's strongest topics above this share (at least one)
+    GLOBAL_MAX_TOPICS = 5
+    GLOBAL_MIN_TOPIC_WEIGHT = 0.05
+
+    def __init__(self, nlp_model, corpus_idf: Optional[CorpusIDFIndex] = None, core_budget: Optional[int] = None,
+                 global_model: Optional[GlobalTopicModel] = None):
+        """
+        Args:
+            nlp_model: spaCy pipeline used to lemmatize sentences
+            corpus_idf: Document frequencies of previously analyzed documents, used to down-weight
+                        terms that are common across the corpus (no weighting when omitted)
+            core_budget: Cores shared by the parallel k-means fits of adaptive mode
+            global_model: Pretrained corpus topic model; when given, documents are assigned its topics
+                          (stable ids across documents) instead of being clustered on their own
+        """
         self.nlp = nlp_model
+        self.corpus_idf = corpus_idf
+        self.core_budget = core_budget or min(4, os.cpu_count() or 1)
+        self.global_model = global_model
+
+    @staticmethod
+    def content_lemmas(tokens) -> List[str]:
+        """Lowercase lemmas of the content words (alphabetic, not stop words, longer than two characters)."""
+        return [token.lemma_.lower() for token in tokens if is_content_token(token)]
+
+    def lemmatize_sentences(self, sentences: List[str]) -> List[List[str]]:
+        return [self.content_lemmas(self.nlp(sent)) for sent in sentences]
     
     def _create_document_segments(self, sentences: List[str], segment_size: int = 5) -> List[Dict[str, Any]]:
         """Create overlapping segments of the document for evolution tracking."""
@@ -18,9 +73,7 @@ class TopicModeler:
         for i in range(0, total_sentences, segment_size - overlap):
             end_idx = min(i + segment_size, total_sentences)
             if end_idx - i >= 2:  # Ensure minimum segment size
-                segment_sentences = sentences[i:end_idx]
                 segments.append({
-                    'sentences': segment_sentences,
                     'start_idx': i,
                     'end_idx': end_idx - 1,
                     'range': f"{i+1}-{end_idx}"
@@ -31,45 +84,71 @@ class TopicModeler:
         
         return segments
     
-    def _calculate_topic_intensity(self, segment_sentences: List[str], topic_keywords: List[str]) -> float:
-        """Calculate how strongly a topic is represented in a document segment."""
-        if not segment_sentences or not topic_keywords:
-            return 0.0
-        
-        # Process segment text
-        processed_segment = []
-        for sent in segment_sentences:
-            sent_doc = self.nlp(sent)
-            words = [token.lemma_.lower() for token in sent_doc
-                    if not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2]
-            processed_segment.extend(words)
-        
-        if not processed_segment:
-            return 0.0
-        
-        # Calculate keyword presence intensity
-        total_words = len(processed_segment)
-        keyword_matches = 0
-        
-        for word in processed_segment:
-            for keyword in topic_keywords:
-                # Handle both single words and phrases
+    def _sentence_term_matrix(self, sentence_lemmas: List[List[str]]):
+        """Sparse sentence x lemma count matrix, plus the lemma -> column vocabulary."""
+        vocabulary: Dict[str, int] = {}
+        indices = []
+        indptr = [0]
+        for lemmas in sentence_lemmas:
+            indices.extend(vocabulary.setdefault(lemma, len(vocabulary)) for lemma in lemmas)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float64), indices, indptr),
+            shape=(len(sentence_lemmas), len(vocabulary))
+        )
+        matrix.sum_duplicates()
+        return matrix, vocabulary
+
+    def _calculate_topic_intensities(self, segment_counts, vocabulary: Dict[str, int],
+                                     topics: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Calculate how strongly each topic is represented in each document segment.
+
+        A segment word counts towards a topic when it equals one of the topic's keywords, or
+        (for '_'-joined phrase keywords) when every part of the phrase occurs in the segment.
+        Intensity is the share of matching words scaled by 10 and capped at 1.
+
+        Returns:
+            (n_segments, n_topics) array of intensities
+        """
+        n_terms = len(vocabulary)
+        total_words = np.asarray(segment_counts.sum(axis=1)).ravel()
+
+        # Topic x term indicators of single-word keywords and of each topic's phrase parts
+        keyword_rows, keyword_cols = [], []
+        phrases = []  # (topic index, term columns of the parts, or None if a part never occurs)
+        for topic_index, topic in enumerate(topics):
+            for keyword in set(topic['keywords']):
                 if '_' in keyword:
-                    # For phrases, check if all parts are present nearby
-                    keyword_parts = keyword.split('_')
-                    if all(part in processed_segment for part in keyword_parts):
-                        keyword_matches += 1
-                        break
-                else:
-                    if word == keyword:
-                        keyword_matches += 1
-                        break
-        
+                    parts = set(keyword.split('_'))
+                    columns = [vocabulary.get(part) for part in parts]
+                    phrases.append((topic_index, None if None in columns else columns))
+                elif keyword in vocabulary:
+                    keyword_rows.append(topic_index)
+                    keyword_cols.append(vocabulary[keyword])
+        keyword_matrix = sparse.csr_matrix(
+            (np.ones(len(keyword_rows)), (keyword_rows, keyword_cols)), shape=(len(topics), n_terms)
+        )
+
+        # Matching words per segment and topic, in one product
+        matches = np.asarray((segment_counts @ keyword_matrix.T).todense())
+
+        if phrases:
+            present = (segment_counts > 0).astype(np.float64)
+            for topic_index, columns in phrases:
+                if columns is None:
+                    continue
+                # A complete phrase makes every word of the segment match
+                complete = np.asarray(present[:, columns].sum(axis=1)).ravel() == len(columns)
+                matches[complete, topic_index] = total_words[complete]
+
         # Normalize intensity (0-1 scale)
-        intensity = min(1.0, keyword_matches / max(1, total_words) * 10)  # Scale factor of 10
-        return intensity
+        intensities = np.minimum(1.0, matches / np.maximum(1, total_words)[:, None] * 10)  # Scale factor of 10
+        intensities[total_words == 0] = 0.0
+        return intensities
     
-    def _track_topic_evolution(self, sentences: List[str], topics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _track_topic_evolution(self, sentences: List[str], topics: List[Dict[str, Any]],
+                               sentence_lemmas: List[List[str]]) -> List[Dict[str, Any]]:
         """Track how topics evolve across the document."""
         if len(sentences) < 5:  # Not enough content for meaningful evolution
             return []
@@ -79,65 +158,252 @@ class TopicModeler:
         
         if len(segments) < 2:  # Need at least 2 segments for evolution
             return []
+
+        # Segment x term counts = segment x sentence membership @ sentence x term counts
+        sentence_counts, vocabulary = self._sentence_term_matrix(sentence_lemmas)
+        rows = np.concatenate([np.full(segment['end_idx'] - segment['start_idx'] + 1, i)
+                               for i, segment in enumerate(segments)])
+        cols = np.concatenate([np.arange(segment['start_idx'], segment['end_idx'] + 1) for segment in segments])
+        membership = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(segments), len(sentences)))
+        intensities = self._calculate_topic_intensities(membership @ sentence_counts, vocabulary, topics)
         
         evolution_data = []
         
-        for topic in topics:
-            topic_name = topic['name']
-            topic_keywords = topic['keywords']
-            
-            for segment in segments:
-                intensity = self._calculate_topic_intensity(segment['sentences'], topic_keywords)
-                
+        for topic_index, topic in enumerate(topics):
+            for segment_index, segment in enumerate(segments):
                 evolution_data.append({
-                    'topic': topic_name,
+                    'topic': topic['name'],
                     'paragraph_range': segment['range'],
-                    'intensity': round(intensity, 3)
+                    'intensity': round(float(intensities[segment_index, topic_index]), 3)
                 })
         
         return evolution_data
     
     def _calculate_coherence_score(self, kmeans, tfidf_matrix, cluster_labels) -> float:
         """Calculate a more sophisticated coherence score."""
+        n_samples = tfidf_matrix.shape[0]
+        # Also accepts dense rows (sentence embeddings)
+        tfidf_matrix = sparse.csr_matrix(tfidf_matrix)
         try:
             # Silhouette-like score based on intra-cluster vs inter-cluster distances
-            n_samples = tfidf_matrix.shape[0]
-            n_clusters = len(set(cluster_labels))
+            centers = kmeans.cluster_centers_
+            cluster_sizes = np.bincount(cluster_labels, minlength=len(centers))
+            n_clusters = int(np.count_nonzero(cluster_sizes))
             
             if n_clusters <= 1:
                 return 0.1
             
-            # Calculate average intra-cluster distance
-            intra_cluster_distances = []
-            for i in range(n_clusters):
-                cluster_points = tfidf_matrix[cluster_labels == i]
-                if cluster_points.shape[0] > 1:
-                    center = kmeans.cluster_centers_[i]
-                    distances = [np.linalg.norm(point.toarray() - center) for point in cluster_points]
-                    intra_cluster_distances.extend(distances)
-            
-            avg_intra_distance = np.mean(intra_cluster_distances) if intra_cluster_distances else 1.0
-            
-            # Calculate average inter-cluster distance
-            inter_cluster_distances = []
-            centers = kmeans.cluster_centers_
-            for i in range(len(centers)):
-                for j in range(i + 1, len(centers)):
-                    dist = np.linalg.norm(centers[i] - centers[j])
-                    inter_cluster_distances.append(dist)
+            # Distance of every point to its own center in one sparse pass:
+            # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2
+            point_sq_norms = np.asarray(tfidf_matrix.multiply(tfidf_matrix).sum(axis=1)).ravel()
+            assigned_centers = centers[cluster_labels]
+            point_center_dots = np.asarray(tfidf_matrix.multiply(assigned_centers).sum(axis=1)).ravel()
+            center_sq_norms = np.einsum('ij,ij->i', centers, centers)[cluster_labels]
+            distances = np.sqrt(np.maximum(point_sq_norms - 2 * point_center_dots + center_sq_norms, 0.0))
+
+            # Singleton clusters are left out, as their distance is trivially zero
+            in_shared_cluster = cluster_sizes[cluster_labels] > 1
+            avg_intra_distance = distances[in_shared_cluster].mean() if in_shared_cluster.any() else 1.0
             
-            avg_inter_distance = np.mean(inter_cluster_distances) if inter_cluster_distances else 0.1
+            # Average distance over all pairs of centers
+            upper = np.triu_indices(len(centers), k=1)
+            avg_inter_distance = euclidean_distances(centers)[upper].mean() if len(upper[0]) else 0.1
             
             # Coherence score: higher when clusters are tight (low intra) and well-separated (high inter)
             coherence = min(0.95, max(0.1, avg_inter_distance / (avg_intra_distance + 0.01)))
             
-            return round(coherence, 3)
+            return round(float(coherence), 3)
             
         except Exception:
             # Fallback to original method
             return round(max(0.1, min(0.9, 1 - (kmeans.inertia_ / (n_samples * 1000)))), 3)
 
-    def model_topics(self, text: str, sentences: List[str], doc) -> Dict[str, Any]:
+    def _model_topics_global(self, sentences: List[str], sentence_lemmas: List[List[str]]) -> Dict[str, Any]:
+        """
+        Topics of the document under the pretrained global model.
+
+        The whole document and its evolution segments are inferred in a single
+        ``transform`` call; the document row picks the reported topics and the segment
+        rows give their intensity over the document. Coherence is the mean weight of
+        the dominant topic per segment (how clearly each part sits in one topic).
+        """
+        model = self.global_model
+        document = ' '.join(lemma for lemmas in sentence_lemmas for lemma in lemmas)
+        segments = self._create_document_segments(sentences, segment_size=max(5, len(sentences) // 4)) \
+            if len(sentences) >= 5 else []
+        segment_passages = [' '.join(lemma for lemmas in sentence_lemmas[segment['start_idx']:segment['end_idx'] + 1]
+                                     for lemma in lemmas) for segment in segments]
+        distributions = model.transform([document] + segment_passages)
+        document_weights, segment_weights = distributions[0], distributions[1:]
+
+        ranked = np.argsort(document_weights)[::-1][:self.GLOBAL_MAX_TOPICS]
+        selected = [int(t) for t in ranked if document_weights[t] >= self.GLOBAL_MIN_TOPIC_WEIGHT] or [int(ranked[0])]
+
+        topics, topic_ids = [], []
+        for topic_id in selected:
+            topic_words = model.topic_terms(topic_id)
+            if not topic_words:
+                continue
+            topic_ids.append(topic_id)
+            key_terms = topic_words[:3]
+            topics.append({
+                "id": f"global_topic_{topic_id}",
+                "name": topic_words[0].title(),
+                "percentage": round(float(document_weights[topic_id]) * 100, 1),
+                "keywords": topic_words[:6],
+                "description": f"This topic focuses on {', '.join(key_terms)} and related concepts."
+            })
+
+        coherence_rows = segment_weights if len(segment_weights) else distributions[:1]
+        coherence_score = round(float(coherence_rows.max(axis=1).mean()), 3)
+
+        topic_evolution = []
+        if len(segments) >= 2:
+            for topic_id, topic in zip(topic_ids, topics):
+                for segment_index, segment in enumerate(segments):
+                    topic_evolution.append({
+                        'topic': topic['name'],
+                        'paragraph_range': segment['range'],
+                        'intensity': round(float(segment_weights[segment_index, topic_id]), 3)
+                    })
+
+        # Folded into the model in the background once enough passages have been seen
+        model.observe(model.passages(sentence_lemmas))
+        return {
+            "primary_topics": topics,
+            "topic_coherence_score": coherence_score,
+            "topic_evolution": topic_evolution,
+            "topic_selection": {"mode": "global", **model.stats()}
+        }
+
+    def _cluster(self, tfidf_matrix, n_topics: int):
+        """
+        Spherical k-means over the L2-normalized TF-IDF (or sentence embedding) rows.
+
+        k-means++ seeding makes a single run stable enough to replace the ten random
+        restarts, and long documents switch to mini-batch updates. Both work on the
+        sparse matrix directly.
+        """
+        if tfidf_matrix.shape[0] > self.MINIBATCH_THRESHOLD:
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_topics, init='k-means++', n_init=self.KMEANS_N_INIT,
+                batch_size=self.MINIBATCH_SIZE, random_state=42
+            )
+        else:
+            kmeans = KMeans(n_clusters=n_topics, init='k-means++', n_init=self.KMEANS_N_INIT, random_state=42)
+        # Unit-length rows make Euclidean k-means rank by cosine similarity
+        cluster_labels = kmeans.fit_predict(normalize(tfidf_matrix))
+        return kmeans, cluster_labels
+
+    @staticmethod
+    def _fixed_topic_count(n_sentences: int) -> int:
+        """Number of topics of 'fixed' mode."""
+        return min(5, max(2, n_sentences // 3))  # Allow up to 5 topics
+
+    def _select_topic_count(self, tfidf_matrix):
+        """
+        Fit candidate topic counts in parallel over the shared TF-IDF matrix and keep the best.
+
+        The fixed-mode topic count is fitted first, alone and with the whole core budget,
+        as 'fixed' mode would: that fit is the baseline the extra latency is measured
+        against, and it is scored as a candidate. The other candidates are fitted
+        ``core_budget`` at a time (each fit gets an equal share of the OpenMP threads) and
+        scored by the cosine silhouette on a fixed sample of sentences. Selection stops
+        once ADAPTIVE_PATIENCE candidates above the best one brought no improvement, or
+        before a wave that is not expected to finish within ADAPTIVE_MAX_SELECTION_MS.
+
+        Returns:
+            (kmeans, cluster_labels, selection report), or None if there is no candidate
+        """
+        start = time.perf_counter()
+        n_rows = tfidf_matrix.shape[0]
+        max_topics = min(self.ADAPTIVE_MAX_TOPICS, n_rows - 1)
+        candidates = list(range(self.ADAPTIVE_MIN_TOPICS, max_topics + 1))
+        if not candidates:
+            return None
+        sample_size = min(self.ADAPTIVE_SILHOUETTE_SAMPLE, n_rows)
+
+        def fit(n_topics: int, threads: Optional[int] = None):
+            fit_start = time.perf_counter()
+            # No limit keeps the process-wide one (one request's budget), exactly as a 'fixed' mode fit
+            with threadpool_limits(limits=threads, user_api='openmp') if threads else nullcontext():
+                kmeans, cluster_labels = self._cluster(tfidf_matrix, n_topics)
+            fit_seconds = time.perf_counter() - fit_start
+            if len(np.unique(cluster_labels)) < 2:
+                return kmeans, cluster_labels, -1.0, fit_seconds
+            score = silhouette_score(tfidf_matrix, cluster_labels, metric='cosine',
+                                     sample_size=sample_size, random_state=42)
+            return kmeans, cluster_labels, float(score), fit_seconds
+
+        fixed_topics = self._fixed_topic_count(n_rows)
+        baseline_start = time.perf_counter()
+        baseline = fit(fixed_topics)
+        baseline_ms = (time.perf_counter() - baseline_start) * 1000
+        scores = {}
+        best = None
+        if fixed_topics in candidates:
+            scores[fixed_topics] = round(baseline[2], 3)
+            best = (fixed_topics, baseline)
+
+        remaining = [n_topics for n_topics in candidates if n_topics not in scores]
+        workers = max(1, min(self.core_budget, len(remaining)))
+        threads_per_fit = max(1, self.core_budget // workers)
+        # Expected wave time per topic of its largest candidate (fits grow about linearly with k), first
+        # from the baseline slowed down to a wave's thread share, then from the previous wave
+        ms_per_topic = baseline_ms * (self.core_budget / threads_per_fit) / fixed_topics
+        stopped = "exhausted"
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for wave_start in range(0, len(remaining), workers):
+                if best is not None and sum(1 for n_topics in scores if n_topics > best[0]) >= self.ADAPTIVE_PATIENCE:
+                    stopped = "patience"
+                    break
+                wave = remaining[wave_start:wave_start + workers]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if elapsed_ms + ms_per_topic * max(wave) > self.ADAPTIVE_MAX_SELECTION_MS:
+                    stopped = "time_budget"
+                    break
+                wave_begin = time.perf_counter()
+                results = list(executor.map(lambda n_topics: fit(n_topics, threads_per_fit), wave))
+                ms_per_topic = (time.perf_counter() - wave_begin) * 1000 / max(wave)
+                for n_topics, result in zip(wave, results):
+                    scores[n_topics] = round(result[2], 3)
+                    if best is None or result[2] > best[1][2]:
+                        best = (n_topics, result)
+
+        selected, (kmeans, cluster_labels, _, _) = best if best is not None else (fixed_topics, baseline)
+        selection_ms = (time.perf_counter() - start) * 1000
+        return kmeans, cluster_labels, {
+            "mode": "adaptive",
+            "selected_topics": selected,
+            "silhouette_by_topic_count": dict(sorted(scores.items())),
+            "stopped": stopped,
+            "selection_ms": round(selection_ms, 1),
+            # Standalone fit at the fixed-mode topic count, i.e. what 'fixed' mode costs
+            "baseline_fit_ms": round(baseline[3] * 1000, 1),
+            "extra_latency_ms": round(max(0.0, selection_ms - baseline[3] * 1000), 1)
+        }
+
+    def model_topics(self, text: str, sentences: List[str], doc, topic_count: str = 'fixed',
+                     context: Optional[AnalysisContext] = None, representation: str = 'tfidf') -> Dict[str, Any]:
+        """
+        Args:
+            text: Processed document text
+            sentences: Sentence strings of the document
+            doc: spaCy Doc of ``text``
+            topic_count: 'fixed' derives the number of topics from the sentence count; 'adaptive'
+                         picks it by silhouette from parallel fits (see _select_topic_count);
+                         ignored when a global model is set
+            context: The request's AnalysisContext. Sentence lemmas are then read from the document
+                     parse instead of re-parsing each sentence
+            representation: 'tfidf' clusters sentences by their TF-IDF rows; 'embedding' clusters them
+                            by meaning, using the context's sentence embeddings when available (topic
+                            keywords stay the strongest TF-IDF terms of each cluster)
+        """
+        if topic_count not in self.TOPIC_COUNT_MODES:
+            raise ValueError(f"Unknown topic count mode '{topic_count}', expected one of {self.TOPIC_COUNT_MODES}")
+        if representation not in self.TOPIC_REPRESENTATIONS:
+            raise ValueError(f"Unknown topic representation '{representation}', "
+                             f"expected one of {self.TOPIC_REPRESENTATIONS}")
         if len(sentences) < 2:
             return {
                 "primary_topics": [],
@@ -145,37 +411,66 @@ class TopicModeler:
                 "topic_evolution": []
             }
 
-        # Process sentences
-        processed_sentences = []
-        for sent in sentences:
-            sent_doc = self.nlp(sent)
-            words = [token.lemma_.lower() for token in sent_doc
-                    if not token.is_stop and not token.is_punct and token.is_alpha and len(token.text) > 2]
-            if words:
-                processed_sentences.append(' '.join(words))
+        # Process sentences once; the lemmas feed both clustering and evolution tracking
+        sentence_lemmas = context.sentence_lemmas if context is not None else self.lemmatize_sentences(sentences)
+        kept = [i for i, words in enumerate(sentence_lemmas) if words]
+        processed_sentences = [' '.join(sentence_lemmas[i]) for i in kept]
 
         if not processed_sentences:
             return {"primary_topics": [], "topic_coherence_score": 0.0, "topic_evolution": []}
 
+        if self.global_model is not None:
+            try:
+                return self._model_topics_global(sentences, sentence_lemmas)
+            except Exception as e:
+                print(f"Warning: Global topic model failed, clustering the document instead: {e}")
+
         # Vectorization
         vectorizer = TfidfVectorizer(max_features=50, ngram_range=(1, 2))
         try:
             tfidf_matrix = vectorizer.fit_transform(processed_sentences)
             feature_names = vectorizer.get_feature_names_out()
+            if self.corpus_idf is not None and self.corpus_idf.n_documents:
+                # Sentence-level IDF says what is rare within this document; the corpus IDF says what is
+                # generic across documents. Scale each term column by the latter and re-normalize rows.
+                tfidf_matrix = normalize(tfidf_matrix.multiply(self.corpus_idf.idf_vector(feature_names)).tocsr())
+
+            embeddings = context.sentence_vectors if context is not None and representation == 'embedding' else None
+            use_embeddings = embeddings is not None and len(embeddings) == len(sentences)
+            features = embeddings[kept] if use_embeddings else tfidf_matrix
 
             # Clustering
-            n_topics = min(5, max(2, len(processed_sentences) // 3))  # Allow up to 5 topics
-            kmeans = KMeans(n_clusters=n_topics, random_state=42, n_init=10)
-            cluster_labels = kmeans.fit_predict(tfidf_matrix)
+            selection = self._select_topic_count(features) if topic_count == 'adaptive' else None
+            if selection is not None:
+                kmeans, cluster_labels, topic_selection = selection
+                n_topics = kmeans.n_clusters
+            else:
+                n_topics = self._fixed_topic_count(len(processed_sentences))
+                kmeans, cluster_labels = self._cluster(features, n_topics)
+                topic_selection = {"mode": topic_count, "selected_topics": n_topics, "extra_latency_ms": 0.0}
+                if topic_count == 'adaptive':
+                    topic_selection["fallback"] = "too few sentences to compare topic counts"
+            topic_selection["representation"] = "embedding" if use_embeddings else "tfidf"
+            cluster_sizes = np.bincount(cluster_labels, minlength=n_topics)
+
+            if use_embeddings:
+                # Term profile of each cluster: mean TF-IDF row of its sentences
+                membership = sparse.csr_matrix(
+                    (np.ones(len(cluster_labels)), (cluster_labels, np.arange(len(cluster_labels)))),
+                    shape=(n_topics, len(cluster_labels))
+                )
+                term_centers = (membership @ tfidf_matrix).toarray() / np.maximum(cluster_sizes, 1)[:, None]
+            else:
+                term_centers = kmeans.cluster_centers_
 
             # Extract topics
             topics = []
             for i in range(n_topics):
-                cluster_center = kmeans.cluster_centers_[i]
+                cluster_center = term_centers[i]
                 top_indices = cluster_center.argsort()[-8:][::-1]
                 topic_words = [feature_names[idx] for idx in top_indices]
                 
-                cluster_size = sum(1 for label in cluster_labels if label == i)
+                cluster_size = int(cluster_sizes[i])
                 percentage = round((cluster_size / len(sentences)) * 100, 1)
                 
                 # Generate more descriptive topic names
@@ -195,15 +490,16 @@ class TopicModeler:
                 })
 
             # Calculate coherence score
-            coherence_score = self._calculate_coherence_score(kmeans, tfidf_matrix, cluster_labels)
+            coherence_score = self._calculate_coherence_score(kmeans, features, cluster_labels)
             
             # Track topic evolution
-            topic_evolution = self._track_topic_evolution(sentences, topics)
+            topic_evolution = self._track_topic_evolution(sentences, topics, sentence_lemmas)
 
             return {
                 "primary_topics": topics,
                 "topic_coherence_score": coherence_score,
-                "topic_evolution": topic_evolution
+                "topic_evolution": topic_evolution,
+                "topic_selection": topic_selection
             }
 
         except Exception as e:
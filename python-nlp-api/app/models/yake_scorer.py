@@ -0,0 +1,218 @@
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+# Occurrence tags, as in YAKE: digit, unusual (mixed or no letters), acronym, capitalized noun, plain
+_DIGIT, _UNUSUAL, _ACRONYM, _CAPITALIZED, _PLAIN = range(5)
+_PUNCTUATION = set('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~')
+
+
+@lru_cache(maxsize=65536)
+def _tag(word: str, sentence_start: bool) -> int:
+    try:
+        float(word.replace(',', ''))
+        return _DIGIT
+    except ValueError:
+        pass
+    digits = sum(c.isdigit() for c in word)
+    letters = sum(c.isalpha() for c in word)
+    if (digits and letters) or (not digits and not letters) or sum(c in _PUNCTUATION for c in word) > 1:
+        return _UNUSUAL
+    uppers = sum(c.isupper() for c in word)
+    if uppers == len(word):
+        return _ACRONYM
+    if uppers == 1 and len(word) > 1 and word[0].isupper() and not sentence_start:
+        return _CAPITALIZED
+    return _PLAIN
+
+
+class YakeKeywordScorer:
+    """
+    YAKE keyword extraction on an existing spaCy Doc.
+
+    Implements YAKE's term features (casing, position, normalized frequency,
+    relatedness to context, sentence spread) and its n-gram candidate score, but reads
+    tokens and sentence boundaries from the Doc instead of re-tokenizing the raw text.
+    Occurrences, co-occurrence edges and candidates live in NumPy arrays, so apart
+    from one pass over the tokens every statistic is a vectorized count.
+    """
+
+    def __init__(self, n: int = 3, window_size: int = 1, dedup_lim: float = 0.7, top: int = 20):
+        """
+        Args:
+            n: Maximum number of words per keyword
+            window_size: Co-occurrence window (in words) used for the relatedness feature
+            dedup_lim: Candidates more similar than this to a better-ranked keyword are dropped
+            top: Number of keywords to return
+        """
+        self.n = n
+        self.window_size = window_size
+        self.dedup_lim = dedup_lim
+        self.top = top
+
+    def extract_keywords(self, doc) -> List[Tuple[str, float]]:
+        """
+        Returns:
+            (keyword, score) pairs, best first; lower scores are better, as in YAKE
+        """
+        term_index = {}
+        term_stop = []
+        term_ids, tags, sentence_ids, block_ids, surfaces = [], [], [], [], []
+        block = 0
+        n_sentences = 0
+        for sentence_id, sent in enumerate(doc.sents):
+            n_sentences += 1
+            block += 1
+            for token in sent:
+                if token.is_space:
+                    continue
+                word = token.text
+                if token.is_punct or all(c in _PUNCTUATION for c in word):
+                    # Punctuation splits a sentence into blocks; candidates never cross it
+                    block += 1
+                    continue
+                lower = token.lower_
+                # YAKE folds a trailing plural 's' into the singular term
+                key = lower[:-1] if len(lower) > 3 and lower.endswith('s') else lower
+                term_id = term_index.get(key)
+                if term_id is None:
+                    term_id = term_index[key] = len(term_stop)
+                    letters = ''.join(c for c in lower if c not in _PUNCTUATION)
+                    term_stop.append(token.is_stop or len(letters) < 3)
+                term_ids.append(term_id)
+                tags.append(_tag(word, token.i == sent.start))
+                sentence_ids.append(sentence_id)
+                block_ids.append(block)
+                surfaces.append(lower)
+
+        if not term_ids:
+            return []
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        tags = np.array(tags, dtype=np.int8)
+        sentence_ids = np.array(sentence_ids, dtype=np.int64)
+        block_ids = np.array(block_ids, dtype=np.int64)
+        stop = np.array(term_stop, dtype=bool)
+
+        edge_keys, edge_weights, H = self._score_terms(term_ids, tags, sentence_ids, block_ids, stop, n_sentences)
+        candidates = self._score_candidates(term_ids, tags, block_ids, stop, H, edge_keys, edge_weights)
+        return self._deduplicate(candidates, surfaces)
+
+    def _score_terms(self, term_ids: np.ndarray, tags: np.ndarray, sentence_ids: np.ndarray,
+                     block_ids: np.ndarray, stop: np.ndarray, n_sentences: int):
+        """Per-term YAKE weight H (lower = more important) plus the co-occurrence edges."""
+        n_terms = len(stop)
+        tf = np.bincount(term_ids, minlength=n_terms).astype(np.float64)
+        tf_acronym = np.bincount(term_ids, weights=tags == _ACRONYM, minlength=n_terms)
+        tf_capitalized = np.bincount(term_ids, weights=tags == _CAPITALIZED, minlength=n_terms)
+
+        valid_tf = tf[~stop]
+        mean_plus_std = (valid_tf.mean() + valid_tf.std()) if len(valid_tf) else 1.0
+        max_tf = tf.max()
+
+        # Directed edges left word -> right word within the window, both words usable (not digits/unusual)
+        usable = (tags != _DIGIT) & (tags != _UNUSUAL)
+        lefts, rights = [], []
+        for offset in range(1, self.window_size + 1):
+            pairs = (block_ids[:-offset] == block_ids[offset:]) & usable[:-offset] & usable[offset:]
+            lefts.append(term_ids[:-offset][pairs])
+            rights.append(term_ids[offset:][pairs])
+        edge_keys, edge_weights = np.unique(np.concatenate(lefts) * n_terms + np.concatenate(rights),
+                                            return_counts=True)
+        edge_left, edge_right = edge_keys // n_terms, edge_keys % n_terms
+
+        distinct_right = np.bincount(edge_left, minlength=n_terms)
+        weight_right = np.bincount(edge_left, weights=edge_weights, minlength=n_terms)
+        distinct_left = np.bincount(edge_right, minlength=n_terms)
+        weight_left = np.bincount(edge_right, weights=edge_weights, minlength=n_terms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pwr = np.where(weight_right > 0, distinct_right / weight_right, 0.0)
+            pwl = np.where(weight_left > 0, distinct_left / weight_left, 0.0)
+        relatedness = (0.5 + pwl * tf / max_tf) + (0.5 + pwr * tf / max_tf)
+
+        frequency = tf / mean_plus_std
+        casing = np.maximum(tf_acronym, tf_capitalized) / (1.0 + np.log(tf))
+
+        # Distinct sentences per term, sorted by (term, sentence): spread and median sentence index
+        term_sentences = np.unique(term_ids * n_sentences + sentence_ids)
+        pair_terms, pair_sentences = term_sentences // n_sentences, term_sentences % n_sentences
+        sentence_counts = np.bincount(pair_terms, minlength=n_terms)
+        starts = np.cumsum(sentence_counts) - sentence_counts
+        median_sentence = (pair_sentences[starts + (sentence_counts - 1) // 2]
+                           + pair_sentences[starts + sentence_counts // 2]) / 2.0
+        spread = sentence_counts / n_sentences
+        position = np.log(np.log(3.0 + median_sentence))
+
+        H = (position * relatedness) / (casing + frequency / relatedness + spread / relatedness)
+        return edge_keys, edge_weights, H
+
+    def _score_candidates(self, term_ids: np.ndarray, tags: np.ndarray, block_ids: np.ndarray,
+                          stop: np.ndarray, H: np.ndarray, edge_keys: np.ndarray, edge_weights: np.ndarray):
+        """(score, first occurrence, length) of every valid 1..n-gram candidate."""
+        n_terms = len(stop)
+        n_tokens = len(term_ids)
+        tf = np.bincount(term_ids, minlength=n_terms).astype(np.float64)
+        usable = (tags != _DIGIT) & (tags != _UNUSUAL)
+
+        def edge_weight(left, right):
+            keys = left * n_terms + right
+            if not len(edge_keys):
+                return np.zeros(len(keys))
+            found = np.minimum(np.searchsorted(edge_keys, keys), len(edge_keys) - 1)
+            return np.where(edge_keys[found] == keys, edge_weights[found], 0)
+
+        results = []
+        for length in range(1, self.n + 1):
+            if n_tokens < length:
+                break
+            starts = np.flatnonzero(block_ids[:n_tokens - length + 1] == block_ids[length - 1:])
+            if not len(starts):
+                continue
+            grams = np.stack([term_ids[starts + j] for j in range(length)], axis=1)
+            occurrence_ok = np.all(np.stack([usable[starts + j] for j in range(length)], axis=1), axis=1)
+
+            keys = np.zeros(len(starts), dtype=np.int64)
+            for j in range(length):
+                keys = keys * n_terms + grams[:, j]
+            _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+            # A candidate is valid if at least one occurrence has no digit/unusual word
+            valid = np.bincount(inverse, weights=occurrence_ok) > 0
+            unique_grams = grams[first]
+            valid &= ~stop[unique_grams[:, 0]] & ~stop[unique_grams[:, -1]]
+            if not valid.any():
+                continue
+            unique_grams, first, counts = unique_grams[valid], first[valid], counts[valid]
+
+            product = np.ones(len(first))
+            total = np.zeros(len(first))
+            for j in range(length):
+                terms = unique_grams[:, j]
+                is_stop = stop[terms]
+                if 0 < j < length - 1 and is_stop.any():
+                    # Stop words inside a phrase are weighted by how strongly they bind their neighbours
+                    previous, following = unique_grams[:, j - 1], unique_grams[:, j + 1]
+                    probability = (edge_weight(previous, terms) / tf[previous]) * (edge_weight(terms, following) / tf[following])
+                    product *= np.where(is_stop, 2.0 - probability, H[terms])
+                    total += np.where(is_stop, -(1.0 - probability), H[terms])
+                else:
+                    product *= H[terms]
+                    total += H[terms]
+
+            scores = product / ((total + 1.0) * counts)
+            results.extend(zip(scores.tolist(), starts[first].tolist(), [length] * len(first)))
+
+        results.sort()
+        return results
+
+    def _deduplicate(self, candidates, surfaces: List[str]) -> List[Tuple[str, float]]:
+        keywords = []
+        for score, start, length in candidates:
+            keyword = ' '.join(surfaces[start:start + length])
+            if any(SequenceMatcher(None, keyword, kept).ratio() > self.dedup_lim for kept, _ in keywords):
+                continue
+            keywords.append((keyword, score))
+            if len(keywords) >= self.top:
+                break
+        return keywords
@@ -0,0 +1,108 @@
+"""
+Throughput and tail latency with and without the CPU core scheduler.
+
+Each mode runs in its own process, since torch and BLAS thread pools are process-wide:
+'default' leaves every runtime at its own thread count, 'scheduled' uses CoreScheduler.
+Both are driven at 1, 4 and 16 concurrent requests.
+
+Usage (from python-nlp-api/):
+    python benchmarks/cpu_scheduler.py [--requests-per-client 4] [--cores-per-request N] [--affinity]
+                                       [--summary-mode extractive] [--file sample.txt]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+CONCURRENCY_LEVELS = (1, 4, 16)
+
+SAMPLE_TEXT = (
+    "The quarterly report shows that revenue grew steadily while operating costs remained flat. "
+    "Analysts were surprised by the strength of international sales, especially in emerging markets. "
+    "However, several executives warned that supply chain disruptions could slow growth next year. "
+    "The board approved a modest dividend increase and announced a new share buyback program. "
+    "Employees welcomed the news, although some expressed concern about planned restructuring. "
+) * 12
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_mode(args):
+    """Benchmark one mode in this process and print the results as JSON."""
+    from analysis import NLPAnalyzer
+    from models.cpu_scheduler import CoreScheduler
+
+    scheduler = None
+    if args.mode == "scheduled":
+        scheduler = CoreScheduler(cores_per_request=args.cores_per_request, pin_affinity=args.affinity)
+    analyzer = NLPAnalyzer(cpu_scheduler=scheduler)
+
+    text = SAMPLE_TEXT
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+
+    def request(index):
+        # A distinct prefix per request keeps the inference cache from short-circuiting the models
+        start = time.perf_counter()
+        analyzer.analyze_text(f"Report {index}. {text}", summary_mode=args.summary_mode)
+        return time.perf_counter() - start
+
+    request(-1)  # Warm-up: loads every model used below
+    results = {}
+    for concurrency in CONCURRENCY_LEVELS:
+        analyzer.inference_cache.clear()
+        total = concurrency * args.requests_per_client
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(request, range(concurrency * 1000, concurrency * 1000 + total)))
+        elapsed = time.perf_counter() - start
+        results[concurrency] = {
+            "throughput": total / elapsed,
+            "p50": statistics.median(latencies),
+            "p95": _percentile(latencies, 0.95)
+        }
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["default", "scheduled"], help=argparse.SUPPRESS)
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--cores-per-request", type=int, default=None)
+    parser.add_argument("--affinity", action="store_true", help="Pin request threads to their leased cores")
+    parser.add_argument("--summary-mode", choices=["auto", "abstractive", "extractive"], default="extractive")
+    parser.add_argument("--file", help="Text file to analyze (a built-in sample otherwise)")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    results = {}
+    for mode in ("default", "scheduled"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode] + sys.argv[1:],
+            check=True, capture_output=True, text=True
+        ).stdout
+        # Analysis code may print along the way; the results are the last line
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<10} {'clients':>7} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for concurrency in CONCURRENCY_LEVELS:
+        for mode in ("default", "scheduled"):
+            row = results[mode][str(concurrency)]
+            print(f"{mode:<10} {concurrency:>7} {row['throughput']:>8.2f} {row['p50']:>8.2f} {row['p95']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the native YAKE scorer with the yake package on the same documents.
+
+Reports the latency of each (the spaCy parse is shared and not timed) and how close
+the rankings are: overlap of the top 15 keywords and Spearman correlation over the
+keywords both return.
+
+Usage (from python-nlp-api/):
+    python benchmarks/keyword_scorer.py [--repeats 3] doc1.txt doc2.txt ...
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import spacy
+import yake
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models.yake_scorer import YakeKeywordScorer  # noqa: E402
+
+TOP = 15
+
+SAMPLE_PARAGRAPH = (
+    "Machine learning systems learn statistical patterns from large collections of training data. "
+    "Deep neural networks, in particular, have transformed computer vision and natural language processing. "
+    "Researchers at several universities study how model size, data quality and training time interact. "
+    "The European Commission has proposed rules for high-risk artificial intelligence applications. "
+    "Critics argue that regulation could slow innovation, while supporters point to safety and transparency. "
+)
+
+
+def _timed(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return result, statistics.median(runs)
+
+
+def _spearman(native, library):
+    shared = [keyword for keyword in native if keyword in library]
+    if len(shared) < 2:
+        return float('nan')
+    # Re-rank within the shared keywords, then 1 - 6 * sum(d^2) / (n (n^2 - 1))
+    library_order = sorted(shared, key=library.index)
+    n = len(shared)
+    squared = sum((rank - library_order.index(keyword)) ** 2 for rank, keyword in enumerate(shared))
+    return 1 - 6 * squared / (n * (n * n - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("files", nargs="*", help="Text files, ideally 50-100 KB (a ~75 KB sample otherwise)")
+    args = parser.parse_args()
+
+    documents = {"sample": SAMPLE_PARAGRAPH * 150}
+    if args.files:
+        documents = {}
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                documents[os.path.basename(path)] = f.read()
+
+    nlp = spacy.load("en_core_web_md")
+    nlp.max_length = max(nlp.max_length, max(len(text) for text in documents.values()) + 1)
+    native = YakeKeywordScorer(n=3, dedup_lim=0.7, top=20)
+    library = yake.KeywordExtractor(lan="en", n=3, dedupLim=0.7, top=20)
+
+    print(f"{'document':<20} {'KB':>6} {'native (s)':>11} {'yake (s)':>9} {'speedup':>8} {'top-15 overlap':>15} {'spearman':>9}")
+    for name, text in documents.items():
+        doc = nlp(text)
+        native_result, native_time = _timed(lambda: native.extract_keywords(doc), args.repeats)
+        library_result, library_time = _timed(lambda: library.extract_keywords(text), args.repeats)
+
+        native_keywords = [keyword.lower() for keyword, _ in native_result[:TOP]]
+        library_keywords = [keyword.lower() for keyword, _ in library_result[:TOP]]
+        overlap = len(set(native_keywords) & set(library_keywords)) / max(1, len(library_keywords))
+        print(f"{name:<20} {len(text) / 1024:>6.1f} {native_time:>11.3f} {library_time:>9.3f} "
+              f"{library_time / native_time:>7.1f}x {overlap:>15.2f} {_spearman(native_keywords, library_keywords):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
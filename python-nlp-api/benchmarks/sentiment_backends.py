@@ -0,0 +1,107 @@
+"""
+Compare the PyTorch and quantized ONNX Runtime sentiment backends.
+
+Checks label agreement and score deviation between the two backends on the same
+inputs, then reports per-call latency and the speedup.
+
+Usage (from python-nlp-api/):
+    python benchmarks/sentiment_backends.py [--threads 4] [--repeats 5] [--file sample.txt]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models.sentiment_analyzer import SentimentAnalyzer  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "I absolutely loved the new design, it made the whole experience wonderful.",
+    "The report was delayed again and the team is frustrated with the lack of progress.",
+    "According to the data, revenue increased by 4.2% in 2023.",
+    "This is the worst customer service I have ever dealt with.",
+    "The meeting has been moved to Thursday afternoon.",
+    "We were thrilled to see so many people at the opening night.",
+    "I am worried that the budget will not cover the additional costs.",
+    "The findings indicate a moderate correlation between sleep and memory.",
+]
+
+# Maximum tolerated difference in classifier scores between backends
+SCORE_TOLERANCE = 0.05
+
+
+def _time_calls(classifier, inputs, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in inputs:
+            classifier(text)
+        timings.append((time.perf_counter() - start) / len(inputs))
+    return statistics.median(timings)
+
+
+def _compare(name, reference, candidate, inputs):
+    agreements = 0
+    deviations = []
+    for text in inputs:
+        ref = reference(text)[0]
+        cand = candidate(text)[0]
+        agreements += ref['label'] == cand['label']
+        deviations.append(abs(ref['score'] - cand['score']))
+
+    agreement = agreements / len(inputs)
+    max_deviation = max(deviations)
+    passed = agreement == 1.0 and max_deviation <= SCORE_TOLERANCE
+    print(f"{name}: label agreement {agreement:.0%}, "
+          f"mean score deviation {statistics.mean(deviations):.4f}, max {max_deviation:.4f} "
+          f"-> {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--file", help="Optional text file; one input per non-empty line")
+    args = parser.parse_args()
+
+    inputs = SAMPLE_SENTENCES
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            inputs = [line.strip() for line in f if line.strip()]
+
+    torch_analyzer = SentimentAnalyzer(backend='torch')
+    onnx_analyzer = SentimentAnalyzer(backend='onnx', intra_op_threads=args.threads)
+    # Pipelines load lazily: load the ONNX sentiment pipeline now, since only a load reveals a
+    # fallback to PyTorch, and exit before benchmarking PyTorch against itself
+    onnx_sentiment = onnx_analyzer.sentiment_pipeline
+    if onnx_analyzer.model_backend(SentimentAnalyzer.SENTIMENT_MODEL) != 'onnx':
+        sys.exit("ONNX backend unavailable (install optimum[onnxruntime])")
+
+    pairs = [
+        ("sentiment", torch_analyzer.sentiment_pipeline, onnx_sentiment),
+        ("emotion", torch_analyzer.emotion_classifier, onnx_analyzer.emotion_classifier),
+    ]
+
+    print("== Parity ==")
+    # Every pair is compared (and reported) even if an earlier one fails
+    results = [_compare(name, ref, cand, inputs) for name, ref, cand in pairs]
+    all_passed = all(results)
+
+    print("\n== Latency (median per input) ==")
+    for name, ref, cand in pairs:
+        # Warm up both sessions before timing
+        ref(inputs[0])
+        cand(inputs[0])
+        torch_time = _time_calls(ref, inputs, args.repeats)
+        onnx_time = _time_calls(cand, inputs, args.repeats)
+        print(f"{name}: torch {torch_time * 1000:.1f} ms, onnx-int8 {onnx_time * 1000:.1f} ms, "
+              f"speedup {torch_time / onnx_time:.2f}x")
+
+    sys.exit(0 if all_passed else 1)
+
+
+if __name__ == "__main__":
+    main()
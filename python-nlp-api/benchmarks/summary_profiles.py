@@ -0,0 +1,108 @@
+"""
+Latency and ROUGE of each abstractive decoding profile, relative to 'quality'.
+
+Every profile summarizes the same documents with a cold chunk-summary cache. ROUGE
+F1 is computed against the 'quality' profile's output for the same document.
+
+Usage (from python-nlp-api/):
+    python benchmarks/summary_profiles.py [--model alt|main] [--repeats 3] doc1.txt doc2.txt ...
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models.decoding_profiles import DECODING_PROFILES  # noqa: E402
+from models.document_summarizer import DocumentSummarizerAlt, DocumentSummarizerMain  # noqa: E402
+
+SAMPLE_DOCUMENT = (
+    "The city council approved a new transit plan on Tuesday after months of public hearings. "
+    "The plan adds three bus rapid transit lines and extends the light rail to the airport. "
+    "Supporters say the changes will cut commute times and reduce traffic downtown. "
+    "Critics argue the project is too expensive and that ridership estimates are optimistic. "
+    "Construction is expected to begin next spring and last roughly four years. "
+    "Funding will come from a mix of federal grants, a regional sales tax and bond sales. "
+    "The council also asked staff to report back on fare discounts for students and seniors. "
+    "Several residents urged the council to prioritize bike lanes and sidewalk repairs as well. "
+)
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def _f1(overlap, candidate_total, reference_total):
+    if not overlap or not candidate_total or not reference_total:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate, reference, n):
+    cand = _ngrams(candidate.lower().split(), n)
+    ref = _ngrams(reference.lower().split(), n)
+    return _f1(sum((cand & ref).values()), sum(cand.values()), sum(ref.values()))
+
+
+def rouge_l(candidate, reference):
+    cand = candidate.lower().split()
+    ref = reference.lower().split()
+    # Longest common subsequence, one row at a time
+    previous = [0] * (len(ref) + 1)
+    for word in cand:
+        current = [0]
+        for j, ref_word in enumerate(ref):
+            current.append(previous[j] + 1 if word == ref_word else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(cand), len(ref))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["alt", "main"], default="alt")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("files", nargs="*", help="Text files to summarize (a built-in sample otherwise)")
+    args = parser.parse_args()
+
+    documents = [SAMPLE_DOCUMENT * 3]
+    if args.files:
+        documents = []
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                documents.append(f.read())
+
+    summarizer = DocumentSummarizerAlt() if args.model == "alt" else DocumentSummarizerMain()
+    cache = summarizer.map_reducer.inference_cache
+
+    outputs = {}
+    latencies = {}
+    for name in DECODING_PROFILES:
+        outputs[name] = []
+        timings = []
+        for document in documents:
+            runs = []
+            for _ in range(args.repeats):
+                cache.clear()
+                start = time.perf_counter()
+                result = summarizer.summarize_document(document, decoding_profile=name)
+                runs.append(time.perf_counter() - start)
+            timings.append(statistics.median(runs))
+            outputs[name].append(result['summary'])
+        latencies[name] = statistics.mean(timings)
+
+    print(f"{'profile':<12} {'latency (s)':>12} {'ROUGE-1':>8} {'ROUGE-2':>8} {'ROUGE-L':>8}")
+    for name in DECODING_PROFILES:
+        pairs = list(zip(outputs[name], outputs['quality']))
+        r1 = statistics.mean(rouge_n(c, r, 1) for c, r in pairs)
+        r2 = statistics.mean(rouge_n(c, r, 2) for c, r in pairs)
+        rl = statistics.mean(rouge_l(c, r) for c, r in pairs)
+        print(f"{name:<12} {latencies[name]:>12.2f} {r1:>8.3f} {r2:>8.3f} {rl:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
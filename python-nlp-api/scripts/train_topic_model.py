@@ -0,0 +1,65 @@
+"""
+Train the global topic model served when NLP_TOPIC_MODEL_DIR is set.
+
+Reads every .txt file under a directory, lemmatizes it with the same filter the API
+uses (TopicModeler.content_lemmas), cuts it into passages of a few sentences, and fits
+online LDA over hashed lemma counts one batch at a time. The output directory can be
+copied to the servers as is; the model is memory-mapped at startup.
+
+Usage (from python-nlp-api/):
+    python scripts/train_topic_model.py corpus_dir/ --out models/global_topics [--topics 20] [--passes 2]
+"""
+import argparse
+import os
+import sys
+import time
+
+import spacy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models.global_topic_model import GlobalTopicModel  # noqa: E402
+from models.topic_modeler import TopicModeler  # noqa: E402
+
+
+def _read_documents(corpus_dir):
+    for root, _, files in os.walk(corpus_dir):
+        for name in sorted(files):
+            if name.endswith(".txt"):
+                with open(os.path.join(root, name), encoding="utf-8", errors="ignore") as f:
+                    yield f.read()
+
+
+def _passages(nlp, documents, sentences_per_passage):
+    for doc in nlp.pipe(documents, batch_size=16):
+        sentence_lemmas = [TopicModeler.content_lemmas(sent) for sent in doc.sents]
+        yield from GlobalTopicModel.split_passages(sentence_lemmas, sentences_per_passage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", help="Directory of .txt documents (searched recursively)")
+    parser.add_argument("--out", required=True, help="Model directory to write")
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--features", type=int, default=2 ** 18, help="Hashed vocabulary size")
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--sentences-per-passage", type=int, default=5)
+    args = parser.parse_args()
+
+    # Only the tagger, lemmatizer and sentence boundaries are needed
+    nlp = spacy.load("en_core_web_md", disable=["ner"])
+    start = time.perf_counter()
+    model = GlobalTopicModel.train(
+        _passages(nlp, _read_documents(args.corpus_dir), args.sentences_per_passage), args.out,
+        n_topics=args.topics, n_features=args.features, batch_size=args.batch_size, passes=args.passes,
+        sentences_per_passage=args.sentences_per_passage
+    )
+    print(f"Trained {model.n_topics} topics on {model.meta['documents']} passages "
+          f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+    for topic_id in range(model.n_topics):
+        print(f"{topic_id:>3}: {', '.join(model.topic_terms(topic_id))}")
+
+
+if __name__ == "__main__":
+    main()
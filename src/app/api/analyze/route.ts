@@ -9,7 +9,7 @@ import { createTempFile,
         safeCleanup, 
         config } 
 from '@/lib/file-processing/processFileContent';
-import { AnalyticsSummary, DocumentInfo, ReadabilityMetrics } from '../../../../types/basicAnalytics';
+import { AnalyticsSummary, DocumentInfo } from '../../../../types/basicAnalytics';
 
 export async function POST(request: NextRequest) {
     // set temporary file path as null for now
@@ -37,26 +37,18 @@ export async function POST(request: NextRequest) {
         // Get document basic doc information (metadata) 
         const documentInfo = getDocumentInfo(file)
 
-        // Perform basic analysis
-        const {basic_analytics, visual_analytics} = await analyzeText(parsedDocument);
-
         // Extract full document text for NLP analysis
         const fullText = parsedDocument.textData.fullText;
 
-        // Readability metrics transformed for NLP analysis
-        const readabilityScores: Record<keyof ReadabilityMetrics, number> = 
-            Object.entries(basic_analytics.readability).reduce((accumulator, [metricName, metricData]) => {
-                if (metricData) accumulator[metricName as keyof ReadabilityMetrics] = metricData.score
-                return accumulator;
-            }, {} as Record<keyof ReadabilityMetrics, number>); 
-
-        console.log(readabilityScores);
-        // Perform NLP analysis --> Text pre-processing and application of models
-        const nlpAnalysisData = await getNLPAnalysis({
-            nlpAnalysisUrl: config.nlpServiceUrl,
-            fullText,
-            readabilityScores
-        });  
+        // The NLP service computes the classical readability metrics itself,
+        // so basic and NLP analysis run concurrently instead of one after the other
+        const [{basic_analytics, visual_analytics}, nlpAnalysisData] = await Promise.all([
+            analyzeText(parsedDocument),
+            getNLPAnalysis({
+                nlpAnalysisUrl: config.nlpServiceUrl,
+                fullText
+            })
+        ]);
 
         // Calculate summary fields from existing data
         const totalWords = basic_analytics.overview.total_words;
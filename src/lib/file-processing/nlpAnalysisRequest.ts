@@ -4,6 +4,9 @@ import { AdvancedFeatures } from '../../../types/advancedAnalytics';
 import { ReadabilityMetrics } from '../../../types/basicAnalytics';
 
 
+// Key the NLP service uses for a list of records sent as one array per field (response_layout: 'columnar')
+const COLUMNAR_KEY = '$columnar';
+
 type NLPReqestProps = {
     nlpAnalysisUrl: string;
     fullText: string;
@@ -17,11 +20,17 @@ export const getNLPAnalysis = async ({nlpAnalysisUrl, fullText, readabilityScore
     try {
         const response = await fetch(nlpAnalysisUrl, {
             method: 'POST',
+            // The service can also send MessagePack (Accept: application/x-msgpack), but JSON.parse is native
+            // and faster here than a JS msgpack decoder. Compression (br/gzip) is negotiated and decoded by fetch.
             headers: {
                 'Content-Type': 'application/json',
                 'Accept': 'application/json',
             },
-            body: JSON.stringify({text: fullText, standard_readability_metrics : readabilityScores}),
+            body: JSON.stringify({
+                text: fullText,
+                standard_readability_metrics : readabilityScores,
+                response_layout: 'columnar',
+            }),
             signal: controller.signal,
         });
 
@@ -35,7 +44,12 @@ export const getNLPAnalysis = async ({nlpAnalysisUrl, fullText, readabilityScore
             );
         }
 
-        const nlpAnalysis = await response.json()
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('application/json')) {
+            throw new NLPServiceError(`Unsupported response format from NLP service: ${contentType}`);
+        }
+
+        const nlpAnalysis = expandNLPResponse(await response.json());
 
         if (!isValidNLPResponse(nlpAnalysis)){
             throw new NLPServiceError('Invalid response format from NLP service');
@@ -58,6 +72,33 @@ export const getNLPAnalysis = async ({nlpAnalysisUrl, fullText, readabilityScore
 
 }
 
+// Turns columnar blocks back into lists of records and restores subtrees the service sends only once.
+const expandNLPResponse = (response: any): any => {
+    const analysis = expandColumnar(response);
+    if (analysis?.text_stats && analysis.preprocessing_report && !analysis.text_stats.processing_report) {
+        analysis.text_stats.processing_report = analysis.preprocessing_report;
+    }
+    return analysis;
+};
+
+const expandColumnar = (value: any): any => {
+    if (Array.isArray(value)) {
+        return value.map(expandColumnar);
+    }
+    if (!value || typeof value !== 'object') {
+        return value;
+    }
+    const columns = value[COLUMNAR_KEY];
+    if (columns && typeof columns === 'object' && Object.keys(value).length === 1) {
+        const fields = Object.keys(columns);
+        const rowCount = fields.length ? columns[fields[0]].length : 0;
+        return Array.from({ length: rowCount }, (_, row) =>
+            Object.fromEntries(fields.map(field => [field, expandColumnar(columns[field][row])]))
+        );
+    }
+    return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, expandColumnar(item)]));
+};
+
 // Adding this to ensure the response structure remains consistent in the future.
 const isValidNLPResponse = (response: any): response is AdvancedFeatures => {
     return (